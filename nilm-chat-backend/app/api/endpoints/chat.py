@@ -1,72 +1,155 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-import uuid
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import json
+import logging
+from typing import Optional
+from app.database import get_async_db, AsyncSessionLocal
 from app.api.schemas import ChatRequest, ChatResponse
-from app.models.chat import ChatSession, ChatMessage
-from app.services.llm_service import llm_service
+from app.models.chat import ChatMessage
+from app.services.llm_service import llm_service, FALLBACK_RESPONSE
+from app.services.response_cache import response_cache
+from app.services.chat_store import chat_store
+from app.services.chat_retention import chat_retention
 from app.api.schemas import MessageResponse
-from app.config import settings
+from app.api.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+def _sse(data: dict, event: str = None) -> str:
+    """Format one Server-Sent Events frame"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
 @router.post("/", response_model=ChatResponse)
-async def chat_with_assistant(
-    request: ChatRequest,
-    db: Session = Depends(get_db)
-):
-    # Get or create session
-    session_id = request.session_id or str(uuid.uuid4())
-    db_session = db.query(ChatSession).filter(ChatSession.session_id == session_id).first()
-    
-    if not db_session:
-        db_session = ChatSession(session_id=session_id)
-        db.add(db_session)
-        db.commit()
-        db.refresh(db_session)
-    
-    # Save user message
-    user_message = ChatMessage(
-        session_id=session_id,
-        role="user",
-        content=request.message
-    )
-    db.add(user_message)
-    db.commit()
-    
-    # Get chat history for context, limited by MAX_CONVERSATION_HISTORY
-    history = db.query(ChatMessage).filter(
-        ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.timestamp.desc()).limit(settings.MAX_CONVERSATION_HISTORY).all()
-    
-    # Reverse to maintain chronological order
-    conversation_history = [(msg.role, msg.content) for msg in history[::-1]]
+async def chat_with_assistant(request: ChatRequest):
+    # Recent history comes from the chat store's cache; nothing is written yet
+    turn, conversation_history = await chat_store.start_turn(request.session_id, request.message)
     
     # Get response from LLM service
-    response_dict = await llm_service.generate_response(request.message, conversation_history)
+    try:
+        response_dict = await llm_service.generate_response(
+            request.message, conversation_history, use_cache=request.use_cache
+        )
+    except HTTPException:
+        await chat_store.finish_turn(turn, None)
+        raise
     assistant_response = response_dict["response"]
     
-    # Save assistant response
-    assistant_message = ChatMessage(
-        session_id=session_id,
-        role="assistant",
-        content=assistant_response
-    )
-    db.add(assistant_message)
-    db.commit()
+    # Save both messages of the turn in one transaction
+    await chat_store.finish_turn(turn, assistant_response)
     
-    return ChatResponse(message=assistant_response, session_id=session_id)
+    return ChatResponse(message=assistant_response, session_id=turn.session_id)
 
-@router.get("/history/{session_id}", response_model=list[MessageResponse])
-async def get_chat_history(session_id: str, db: Session = Depends(get_db)):
-    messages = db.query(ChatMessage).filter(
+@router.post("/stream")
+async def stream_chat_with_assistant(request: ChatRequest):
+    """Stream the assistant reply as Server-Sent Events while it is generated"""
+    turn, conversation_history = await chat_store.start_turn(request.session_id, request.message)
+
+    async def event_stream():
+        chunks = []
+        finished = False
+        try:
+            async for chunk in llm_service.stream_response(request.message, conversation_history):
+                chunks.append(chunk)
+                yield _sse({"token": chunk})
+
+            # Persist the finished reply once, not per token
+            assistant_response = "".join(chunks).strip()
+            await chat_store.finish_turn(turn, assistant_response)
+            finished = True
+            yield _sse({"message": assistant_response, "session_id": turn.session_id}, event="done")
+        except HTTPException as e:
+            await chat_store.finish_turn(turn, None)
+            finished = True
+            yield _sse({"detail": e.detail, "status_code": e.status_code}, event="error")
+        except Exception as e:
+            # Same outcome as the non-streaming endpoint's fallback, but as an error event
+            logger.error(f"Streaming generation failed: {str(e)}")
+            await chat_store.finish_turn(turn, None)
+            finished = True
+            yield _sse({"detail": FALLBACK_RESPONSE, "status_code": status.HTTP_500_INTERNAL_SERVER_ERROR}, event="error")
+        finally:
+            if not finished:
+                # Client went away mid-stream: still keep the user message
+                asyncio.ensure_future(chat_store.finish_turn(turn, None))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stats")
+async def get_inference_stats():
+    """Inference backend load cost, throughput and queue statistics"""
+    return {
+        **llm_service.get_stats(),
+        "chat_store": chat_store.get_stats(),
+        "retention": chat_retention.get_stats()
+    }
+
+@router.delete("/cache", status_code=status.HTTP_204_NO_CONTENT)
+async def invalidate_response_cache():
+    """Drop all cached chat answers"""
+    response_cache.invalidate()
+
+def _history_query(session_id: str):
+    # Served in order by ix_chat_messages_session_timestamp_id
+    return select(ChatMessage).where(
         ChatMessage.session_id == session_id
-    ).order_by(ChatMessage.timestamp).all()
+    ).order_by(ChatMessage.timestamp, ChatMessage.id)
+
+@router.get("/history/{session_id}", response_model=list[MessageResponse])
+async def get_chat_history(
+    session_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Oldest messages first; pass X-Next-Cursor back as `cursor` for the next page"""
+    # Turns written behind the response must be visible here
+    await chat_store.flush()
+    query = _history_query(session_id)
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.where(tuple_(ChatMessage.timestamp, ChatMessage.id) > position)
+    messages = (await db.scalars(query.limit(limit + 1))).all()
     
-    if not messages:
+    if not messages and position is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"No chat history found for session {session_id}"
         )
     
-    return messages
\ No newline at end of file
+    if len(messages) > limit:
+        messages = messages[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(messages[-1].timestamp, messages[-1].id)
+    return messages
+
+@router.get("/history/{session_id}/stream")
+async def stream_chat_history(session_id: str, batch_size: int = Query(500, ge=1, le=10000)):
+    """Whole session as NDJSON, read batch_size messages at a time"""
+    await chat_store.flush()
+
+    async def lines():
+        # Own session: the response outlives request-scoped dependencies
+        async with AsyncSessionLocal() as db:
+            result = await db.stream_scalars(
+                _history_query(session_id).execution_options(yield_per=batch_size)
+            )
+            async for messages in result.partitions():
+                yield "".join(
+                    json.dumps({
+                        "id": message.id, "role": message.role, "content": message.content,
+                        "timestamp": message.timestamp.isoformat()
+                    }) + "\n"
+                    for message in messages
+                )
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
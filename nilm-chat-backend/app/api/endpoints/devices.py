@@ -1,13 +1,103 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
+from app.models.device_event import DeviceEvent
 from app.services.device_service import get_cluster_summaries
+from app.services.columnar_store import columnar_store
+from app.services.event_detector import event_detector
+from app.services.energy_service import PERIODS, energy_service
+from app.api.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
+from app.utils.clock import to_naive_utc
 
 router = APIRouter()
 
 @router.get("/")
-def fetch_devices(db: Session = Depends(get_db)):
+async def fetch_devices(db: AsyncSession = Depends(get_async_db)):
     try:
-        return get_cluster_summaries(db)
+        if columnar_store is not None:
+            # File scans run off the event loop
+            return await asyncio.to_thread(get_cluster_summaries, None)
+        return await db.run_sync(get_cluster_summaries)
     except Exception as e:
         return {"detail": f"Failed to fetch devices: {str(e)}"}
+
+@router.get("/events")
+async def fetch_device_events(
+    response: Response,
+    cluster: Optional[int] = Query(None, description="Only events of this cluster"),
+    start: Optional[datetime] = Query(None, description="Events that started at or after this time"),
+    end: Optional[datetime] = Query(None, description="Events that started before this time"),
+    is_open: Optional[bool] = Query(None, description="Only running (true) or finished (false) events"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description=f"Value of the {NEXT_CURSOR_HEADER} header of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Detected on/off events, newest first, paged with a keyset cursor"""
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    query = select(DeviceEvent)
+    if cluster is not None:
+        query = query.where(DeviceEvent.cluster == cluster)
+    if start is not None:
+        query = query.where(DeviceEvent.started_at >= start)
+    if end is not None:
+        query = query.where(DeviceEvent.started_at < end)
+    if is_open is not None:
+        query = query.where(DeviceEvent.is_open.is_(is_open))
+    after = decode_cursor(cursor)
+    if after is not None:
+        query = query.where(tuple_(DeviceEvent.started_at, DeviceEvent.id) < after)
+    query = query.order_by(DeviceEvent.started_at.desc(), DeviceEvent.id.desc()).limit(limit + 1)
+
+    events = (await db.execute(query)).scalars().all()
+    if len(events) > limit:
+        events = events[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(events[-1].started_at, events[-1].id)
+    return [
+        {
+            "id": event.id,
+            "cluster_id": event.cluster,
+            "name": event.device_state,
+            "started_at": event.started_at,
+            "ended_at": event.ended_at,
+            "duration_seconds": event.duration_seconds,
+            "energy_wh": round(event.energy_wh, 3),
+            "avg_power": round(event.avg_power_watt, 2),
+            "peak_power": round(event.peak_power_watt, 2),
+            "sample_count": event.sample_count,
+            "is_open": event.is_open,
+        }
+        for event in events
+    ]
+
+@router.get("/energy")
+async def fetch_device_energy(
+    period: str = Query("day", description=f"One of {', '.join(PERIODS)}"),
+    start: Optional[datetime] = Query(None, description="First period to include (default: a year of months, 30 days, ...)"),
+    end: Optional[datetime] = Query(None, description="End of the range, exclusive (default: now)"),
+    cluster: Optional[List[int]] = Query(None, description="Only these clusters; repeat for several"),
+):
+    """Energy in kWh per cluster and calendar period; only the period in progress is computed from samples"""
+    if period not in PERIODS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"period must be one of {', '.join(PERIODS)}"
+        )
+    # Stored samples are naive UTC
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    if start is not None and end is not None and start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must be before end")
+    return await asyncio.to_thread(energy_service.totals, period, start, end, cluster)
+
+@router.get("/energy/stats")
+async def get_energy_stats():
+    """Cached and computed period counters of this worker's energy service"""
+    return energy_service.get_stats()
+
+@router.get("/events/stats")
+async def get_event_detector_stats():
+    """Runs, processed samples and detected events of this worker's event detector"""
+    return event_detector.get_stats()
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from datetime import datetime
+from app.services.export_service import EXPORT_FORMATS, export_columns, export_rows
+
+router = APIRouter()
+
+@router.get("/")
+async def export_electrical_data(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cluster: Optional[List[str]] = Query(None),
+    columns: Optional[List[str]] = Query(None),
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow)$"),
+    batch_size: int = Query(10000, ge=100, le=100000)
+):
+    """
+    Stream raw measurements in a time range as NDJSON, CSV or Arrow IPC
+    `cluster` and `columns` may be repeated or comma separated.
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start must not be after end")
+
+    try:
+        clusters = [int(value) for values in cluster or [] for value in values.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="cluster must be integers")
+
+    selected = [column.strip() for value in columns or [] for column in value.split(",") if column.strip()]
+    unknown = sorted(set(selected) - set(export_columns()))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown columns: {unknown}. Available: {export_columns()}"
+        )
+
+    try:
+        rows = export_rows(format, start, end, clusters or None, selected or None, batch_size)
+    except ImportError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        rows,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="electrical_data.{extension}"'}
+    )
@@ -0,0 +1,89 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from typing import List, Tuple
+import asyncio
+import pandas as pd
+from pydantic import TypeAdapter, ValidationError
+from app.config import settings
+from app.api.schemas import ElectricalDataCreate
+from app.services.ingest_service import INSERT_COLUMNS, prepare_frame
+from app.services.ingest_buffer import ingest_buffer
+from app.services.cluster_model import cluster_engine
+
+router = APIRouter()
+
+# Validates a whole request body in one call into pydantic-core
+_samples_adapter = TypeAdapter(List[ElectricalDataCreate])
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+def _body_too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request body exceeds {settings.INGEST_MAX_REQUEST_BYTES} bytes")
+
+def parse_samples(body: bytes, ndjson: bool) -> Tuple[pd.DataFrame, int]:
+    """
+    Validate a JSON array or NDJSON body of samples into a prepared frame
+    Returns:
+        (frame, number of samples received)
+    Raises:
+        HTTPException 422 with the first validation errors,
+        409 when samples lack a cluster and no cluster model is trained
+    """
+    if ndjson:
+        # One JSON array lets a single validate_json call check every line
+        body = b"[" + b",".join(line for line in body.splitlines() if line.strip()) + b"]"
+    try:
+        samples = _samples_adapter.validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=422,
+            detail=e.errors(include_url=False, include_context=False, include_input=False)[:20]
+        )
+
+    df = pd.DataFrame({column: [getattr(sample, column) for sample in samples] for column in INSERT_COLUMNS})
+    # Store naive UTC like the CSV imports; offsets in the payload are honoured
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True).dt.tz_localize(None)
+    try:
+        df = cluster_engine.label(df)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return prepare_frame(df), len(samples)
+
+@router.post("/", status_code=status.HTTP_202_ACCEPTED)
+async def ingest_samples(
+    request: Request,
+    response: Response,
+    wait: bool = Query(False, description="Return only after the samples are written")
+):
+    """
+    Accept a batch of electrical samples as a JSON array or NDJSON
+    Samples are buffered and written in batches; a full buffer answers 503 with Retry-After,
+    as does wait=true when the write failed (the samples stay buffered and are retried).
+    """
+    # Refuse oversized bodies before reading them when the client declares the length
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > settings.INGEST_MAX_REQUEST_BYTES:
+        raise _body_too_large()
+    body = await request.body()
+    if len(body) > settings.INGEST_MAX_REQUEST_BYTES:
+        raise _body_too_large()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    # Validation is CPU bound; keep the event loop serving other requests meanwhile
+    df, received = await asyncio.to_thread(parse_samples, body, content_type in NDJSON_TYPES)
+    # Samples with missing values or repeated (timestamp, cluster) are dropped, as in CSV imports
+    result = {"accepted": len(df), "dropped": received - len(df)}
+    if df.empty:
+        # Nothing is pending, so there is nothing left to accept
+        response.status_code = status.HTTP_200_OK
+        return result
+
+    inserted = await ingest_buffer.submit(df, wait=wait)
+    if wait:
+        response.status_code = status.HTTP_200_OK
+        result["inserted_in_batch"] = inserted
+    return result
+
+@router.get("/stats")
+async def get_ingest_stats():
+    """Buffer fill level, flush counters and cluster labelling of this worker"""
+    return {**ingest_buffer.get_stats(), "cluster_model": cluster_engine.get_stats()}
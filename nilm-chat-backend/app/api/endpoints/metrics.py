@@ -1,19 +1,58 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from fastapi import APIRouter, Depends, Query, HTTPException, Response, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, tuple_
+from typing import List, Optional
+import asyncio
+import json
 from datetime import datetime, timedelta
-from app.database import get_db
+from app.database import get_async_db
 from app.models.electrical_data import ElectricalData
+from app.models.rollup import RollupCoverage
+from app.services.rollup_service import pick_resolution, sums_query
+from app.services.live_metrics import live_metrics
+from app.services.metrics_push import metrics_broadcaster
+from app.services.columnar_store import columnar_store
+from app.config import settings
 from app.api.schemas import MetricsSummary, ElectricalDataResponse
+from app.api.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor
 
 router = APIRouter()
 
+def _columnar_summary() -> MetricsSummary:
+    """Summary of the 5 seconds before the latest sample in the columnar store"""
+    latest_timestamp = columnar_store.latest_timestamp()
+    if latest_timestamp is None:
+        return MetricsSummary(
+            total_devices=0,
+            total_power=0.0,
+            avg_power_factor=0.0,
+            avg_thd=0.0,
+            timestamp=datetime.now()
+        )
+
+    grouped = columnar_store.aggregate(start=latest_timestamp - timedelta(seconds=5), by=("cluster",))
+    count = grouped["sample_count"].sum()
+    return MetricsSummary(
+        total_devices=len(grouped),
+        total_power=grouped["power_sum"].sum() / count if count else 0,
+        avg_power_factor=grouped["pf_sum"].sum() / count if count else 0,
+        avg_thd=grouped["thd_sum"].sum() / count if count else 0,
+        timestamp=latest_timestamp
+    )
+
 @router.get("/summary", response_model=MetricsSummary)
-async def get_metrics_summary(db: Session = Depends(get_db)):
+async def get_metrics_summary(db: AsyncSession = Depends(get_async_db)):
     """Get summary of current electrical metrics"""
+    # Served from memory once the live state has been loaded on startup
+    live_summary = live_metrics.summary()
+    if live_summary is not None:
+        return MetricsSummary(**live_summary)
+    if columnar_store is not None:
+        return await asyncio.to_thread(_columnar_summary)
+
     # Get latest timestamp
-    latest_timestamp = db.query(func.max(ElectricalData.timestamp)).scalar()
+    latest_timestamp = await db.scalar(select(func.max(ElectricalData.timestamp)))
     
     if not latest_timestamp:
         return MetricsSummary(
@@ -24,50 +63,134 @@ async def get_metrics_summary(db: Session = Depends(get_db)):
             timestamp=datetime.now()
         )
     
-    # Get metrics from around the latest timestamp (within 5 seconds)
+    # Get metrics from around the latest timestamp (within 5 seconds), from whole
+    # 1s rollup buckets where they cover the window and raw rows otherwise
     time_window = latest_timestamp - timedelta(seconds=5)
-    
-    recent_data = db.query(ElectricalData).filter(
-        ElectricalData.timestamp >= time_window
-    ).all()
-    
+    covered_from = await db.scalar(select(RollupCoverage.covered_from))
+    rows = (await db.execute(
+        sums_query(("cluster",), time_window, covered_from, pick_resolution(timedelta(seconds=5)))
+    )).all()
+    clusters = len(rows)
+    count, power_sum, thd_sum, pf_sum = (sum(row[column] for row in rows) for column in range(1, 5))
+
     # Calculate summary metrics
-    unique_clusters = set(data.cluster for data in recent_data)
-    total_power = sum(data.real_power_watt for data in recent_data) / len(recent_data) if recent_data else 0
-    avg_pf = sum(data.power_factor for data in recent_data) / len(recent_data) if recent_data else 0
-    avg_thd = sum(data.thd for data in recent_data) / len(recent_data) if recent_data else 0
-    
     return MetricsSummary(
-        total_devices=len(unique_clusters),
-        total_power=total_power,
-        avg_power_factor=avg_pf,
-        avg_thd=avg_thd,
+        total_devices=clusters,
+        total_power=power_sum / count if count else 0,
+        avg_power_factor=pf_sum / count if count else 0,
+        avg_thd=thd_sum / count if count else 0,
         timestamp=latest_timestamp
     )
 
+async def _page(db: AsyncSession, query, limit: int, cursor: Optional[str], response: Response):
+    """Newest-first keyset page: rows strictly older than the cursor, never an OFFSET"""
+    position = decode_cursor(cursor)
+    if position is not None:
+        query = query.where(tuple_(ElectricalData.timestamp, ElectricalData.id) < position)
+    rows = (await db.scalars(
+        query.order_by(ElectricalData.timestamp.desc(), ElectricalData.id.desc()).limit(limit + 1)
+    )).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].timestamp, rows[-1].id)
+    return rows
+
+def _columnar_page(limit: int, cursor: Optional[str], response: Response, cluster: Optional[int] = None):
+    """Same pages from the columnar store; its samples have no id, so the cursor holds (timestamp, cluster)"""
+    df = columnar_store.latest(limit + 1, before=decode_cursor(cursor), cluster=cluster)
+    if len(df) > limit:
+        df = df.iloc[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(df["timestamp"].iloc[-1].to_pydatetime(), int(df["cluster"].iloc[-1]))
+    records = df.astype(object).where(df.notna(), None).to_dict("records")
+    return [{**record, "id": None} for record in records]
+
 @router.get("/recent", response_model=List[ElectricalDataResponse])
 async def get_recent_metrics(
-    limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(10, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get recent electrical measurements"""
-    recent_data = db.query(ElectricalData).order_by(
-        ElectricalData.timestamp.desc()
-    ).limit(limit).all()
-    
-    return recent_data
+    """Get recent electrical measurements; pass X-Next-Cursor back as `cursor` for older pages"""
+    if columnar_store is not None:
+        return await asyncio.to_thread(_columnar_page, limit, cursor, response)
+    return await _page(db, select(ElectricalData), limit, cursor, response)
 
 @router.get("/by-cluster/{cluster_id}", response_model=List[ElectricalDataResponse])
 async def get_metrics_by_cluster(
     cluster_id: int,
-    limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(10, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get recent measurements for a specific cluster/device type"""
-    cluster_data = db.query(ElectricalData).filter(
-        ElectricalData.cluster == cluster_id
-    ).order_by(
-        ElectricalData.timestamp.desc()
-    ).limit(limit).all()
-    
-    return cluster_data
\ No newline at end of file
+    if columnar_store is not None:
+        return await asyncio.to_thread(_columnar_page, limit, cursor, response, cluster_id)
+    # Served by ix_cluster_timestamp_id without a sort
+    query = select(ElectricalData).where(ElectricalData.cluster == cluster_id)
+    return await _page(db, query, limit, cursor, response)
+
+@router.websocket("/ws")
+async def stream_metrics_websocket(
+    websocket: WebSocket,
+    cluster: Optional[int] = None,
+    interval: Optional[float] = None
+):
+    """
+    Push summary deltas and new samples (optionally for one cluster)
+    At most one message per `interval` seconds; updates in between are coalesced.
+    """
+    await websocket.accept()
+    try:
+        subscriber = metrics_broadcaster.subscribe(cluster, interval)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=e.detail)
+        return
+
+    try:
+        while True:
+            update = await subscriber.next_update(settings.METRICS_PUSH_HEARTBEAT)
+            if update is None:
+                await websocket.send_json({"heartbeat": True})
+                continue
+            if update:
+                await websocket.send_json(update)
+            await asyncio.sleep(subscriber.min_interval)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        metrics_broadcaster.unsubscribe(subscriber)
+
+@router.get("/stream")
+async def stream_metrics_sse(
+    cluster: Optional[int] = None,
+    interval: Optional[float] = Query(None, gt=0)
+):
+    """Server-Sent Events variant of /ws for clients that cannot open a WebSocket"""
+    subscriber = metrics_broadcaster.subscribe(cluster, interval)
+
+    async def event_stream():
+        try:
+            while True:
+                update = await subscriber.next_update(settings.METRICS_PUSH_HEARTBEAT)
+                if update is None:
+                    yield ": keepalive\n\n"
+                    continue
+                if update:
+                    yield f"event: update\ndata: {json.dumps(update)}\n\n"
+                await asyncio.sleep(subscriber.min_interval)
+        finally:
+            metrics_broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/stream/stats")
+async def get_stream_stats():
+    """Live metrics fan-out counters for this worker"""
+    return metrics_broadcaster.get_stats()
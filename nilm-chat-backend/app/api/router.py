@@ -1,9 +1,11 @@
 from fastapi import APIRouter
-from app.api.endpoints import chat, metrics, devices, data
+from app.api.endpoints import chat, metrics, devices, data, export, ingest
 
 api_router = APIRouter()
 
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 api_router.include_router(devices.router, prefix="/devices", tags=["devices"])
-api_router.include_router(data.router, prefix="/sample-data",tags=["sample data"])
\ No newline at end of file
+api_router.include_router(data.router, prefix="/sample-data",tags=["sample data"])
+api_router.include_router(export.router, prefix="/export", tags=["export"])
+api_router.include_router(ingest.router, prefix="/ingest", tags=["ingest"])
\ No newline at end of file
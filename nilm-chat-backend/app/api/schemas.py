@@ -19,9 +19,12 @@ class ElectricalDataBase(BaseModel):
 
 class ElectricalDataCreate(ElectricalDataBase):
     timestamp: datetime = Field(default_factory=datetime.now)
+    # Assigned by the cluster model when omitted
+    cluster: Optional[int] = None
+    device_state: Optional[str] = None
 
 class ElectricalDataResponse(ElectricalDataBase):
-    id: int
+    id: Optional[int] = None  # None for samples from the columnar store
     timestamp: datetime
 
     class Config:
@@ -45,6 +48,7 @@ class MessageResponse(MessageBase):
 class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
+    use_cache: bool = True
 
 class ChatResponse(BaseModel):
     message: str
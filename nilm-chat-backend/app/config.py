@@ -13,6 +13,20 @@ class Settings(BaseSettings):
     
     # Database settings
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./nilm_chat.db")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))  # Ignored for SQLite
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Seconds
+    SQLITE_BUSY_TIMEOUT: float = float(os.getenv("SQLITE_BUSY_TIMEOUT", "30"))  # Seconds to wait for a write lock
+    SQLITE_WAL: bool = os.getenv("SQLITE_WAL", "true").lower() == "true"  # WAL journal with synchronous=NORMAL
+    
+    # Sample storage: 'sql' keeps samples in electrical_data, 'parquet' in partitioned columnar files
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "sql")
+    COLUMNAR_DATA_DIR: str = os.getenv("COLUMNAR_DATA_DIR", "./data/electrical")
+    COLUMNAR_PARTITION: str = os.getenv("COLUMNAR_PARTITION", "day")  # 'day' or 'hour' per partition directory
+    COLUMNAR_COMPACT_FILES: int = int(os.getenv("COLUMNAR_COMPACT_FILES", "32"))  # Compact a partition above this many files, 0 disables
+    COLUMNAR_COMPACT_MIN_AGE: float = float(os.getenv("COLUMNAR_COMPACT_MIN_AGE", "60"))  # Seconds a file is left for live tailers
+    DEVICE_SUMMARY_CACHE_TTL: float = float(os.getenv("DEVICE_SUMMARY_CACHE_TTL", "300"))  # Seconds; ingest invalidates sooner
     
     # LLM settings
     LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "flan-t5")  # Default to flan-t5
@@ -22,12 +36,79 @@ class Settings(BaseSettings):
     DEVICE: str = os.getenv("DEVICE", "cpu")  # 'cpu' or 'cuda' for GPU
     MAX_NEW_TOKENS: int = int(os.getenv("MAX_NEW_TOKENS", "512"))
     TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.7"))
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch")  # 'torch', 'torch-int8', 'onnx' or 'stub' (no model)
+    STUB_TOKEN_LATENCY_MS: float = float(os.getenv("STUB_TOKEN_LATENCY_MS", "5"))  # Cost per token of the stub backend
+    TORCH_NUM_THREADS: int = int(os.getenv("TORCH_NUM_THREADS", "0"))  # 0 keeps the library default
+    
+    # Grounding context: active devices are queried once per bucket, not per message
+    GROUNDING_BUCKET_SECONDS: float = float(os.getenv("GROUNDING_BUCKET_SECONDS", "30"))  # 0 queries every message
+    GROUNDING_WINDOW_HOURS: int = int(os.getenv("GROUNDING_WINDOW_HOURS", "24"))  # Devices seen in this window
     
     # Conversation history settings
     MAX_CONVERSATION_HISTORY: int = int(os.getenv("MAX_CONVERSATION_HISTORY", "10"))  # Default to 10
+    CHAT_HISTORY_CACHE_SESSIONS: int = int(os.getenv("CHAT_HISTORY_CACHE_SESSIONS", "10000"))  # Sessions with cached history, 0 disables
+    CHAT_WRITE_BEHIND: bool = os.getenv("CHAT_WRITE_BEHIND", "false").lower() == "true"  # Persist turns after responding
+    CHAT_WRITE_QUEUE_SIZE: int = int(os.getenv("CHAT_WRITE_QUEUE_SIZE", "1000"))  # Queued turns before writing inline
+    
+    # Chat retention: inactive sessions are archived and deleted, long sessions trimmed
+    CHAT_RETENTION_DAYS: float = float(os.getenv("CHAT_RETENTION_DAYS", "90"))  # Days since last_active, 0 keeps sessions forever
+    CHAT_MAX_MESSAGES_PER_SESSION: int = int(os.getenv("CHAT_MAX_MESSAGES_PER_SESSION", "1000"))  # Older messages are trimmed, 0 disables
+    CHAT_ARCHIVE_DIR: str = os.getenv("CHAT_ARCHIVE_DIR", "./data/chat_archive")  # Empty deletes without archiving
+    CHAT_RETENTION_INTERVAL: float = float(os.getenv("CHAT_RETENTION_INTERVAL", "0"))  # Seconds between in-app runs; 0 (default) leaves it to the script
+    CHAT_RETENTION_BATCH: int = int(os.getenv("CHAT_RETENTION_BATCH", "500"))  # Sessions per transaction
+    
+    # Model cache timeout (in seconds): the model is reloaded in the background and hot-swapped
+    MODEL_CACHE_TIMEOUT: int = int(os.getenv("MODEL_CACHE_TIMEOUT", "3600"))  # Default to 1 hour, 0 disables
+    MODEL_IDLE_TIMEOUT: int = int(os.getenv("MODEL_IDLE_TIMEOUT", "0"))  # Unload after this many idle seconds, 0 disables
+    
+    # Inference worker pool settings
+    INFERENCE_WORKERS: int = int(os.getenv("INFERENCE_WORKERS", "1"))  # Threads running model.generate
+    INFERENCE_QUEUE_SIZE: int = int(os.getenv("INFERENCE_QUEUE_SIZE", "8"))  # Waiting jobs before returning 503
+    INFERENCE_TIMEOUT: float = float(os.getenv("INFERENCE_TIMEOUT", "120"))  # Seconds per request
+    
+    # Micro-batching of concurrent chat requests
+    BATCH_WINDOW_MS: float = float(os.getenv("BATCH_WINDOW_MS", "20"))  # How long to wait for more prompts
+    MAX_BATCH_SIZE: int = int(os.getenv("MAX_BATCH_SIZE", "8"))  # 1 disables batching
+    
+    # Chat response cache
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+    RESPONSE_CACHE_TTL: float = float(os.getenv("RESPONSE_CACHE_TTL", "300"))  # Seconds
+    RESPONSE_CACHE_HISTORY: int = int(os.getenv("RESPONSE_CACHE_HISTORY", "4"))  # Earlier messages in the key
+    
+    # Live ingest API: samples are buffered per worker and flushed in batches
+    INGEST_FLUSH_ROWS: int = int(os.getenv("INGEST_FLUSH_ROWS", "5000"))  # Flush once this many rows are buffered
+    INGEST_FLUSH_INTERVAL: float = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.5"))  # Seconds; flush at least this often
+    INGEST_MAX_PENDING_ROWS: int = int(os.getenv("INGEST_MAX_PENDING_ROWS", "100000"))  # Buffered rows before answering 503
+    CLUSTER_MODEL_PATH: str = os.getenv("CLUSTER_MODEL_PATH", "./data/cluster_model.npz")  # Labels samples sent without cluster
+    CLUSTER_ONLINE_UPDATES: bool = os.getenv("CLUSTER_ONLINE_UPDATES", "false").lower() == "true"  # Move centroids with live data
+    INGEST_MAX_REQUEST_BYTES: int = int(os.getenv("INGEST_MAX_REQUEST_BYTES", str(16 * 1024 * 1024)))  # Larger bodies get 413
+    
+    # On/off event detection over real_power_watt per cluster
+    EVENT_ON_WATTS: float = float(os.getenv("EVENT_ON_WATTS", "10"))  # A cluster switches on at or above this power
+    EVENT_OFF_WATTS: float = float(os.getenv("EVENT_OFF_WATTS", "5"))  # ...and off below this one (hysteresis)
+    EVENT_MAX_GAP_SECONDS: float = float(os.getenv("EVENT_MAX_GAP_SECONDS", "60"))  # Silence that ends an event
+    EVENT_MIN_SECONDS: float = float(os.getenv("EVENT_MIN_SECONDS", "2"))  # Shorter on periods are discarded
+    EVENT_DETECTION_INTERVAL: float = float(os.getenv("EVENT_DETECTION_INTERVAL", "10"))  # Seconds between runs, 0 disables
+    EVENT_DETECTION_BATCH: int = int(os.getenv("EVENT_DETECTION_BATCH", "200000"))  # Samples per transaction
+    
+    # Energy (kWh) totals per calendar period
+    ENERGY_MAX_GAP_SECONDS: float = float(os.getenv("ENERGY_MAX_GAP_SECONDS", "300"))  # Longer silences are not integrated
+    ENERGY_READ_HOURS: int = int(os.getenv("ENERGY_READ_HOURS", "24"))  # Hours of samples read at a time when filling the cache
+    
+    # Live metrics state served by /metrics/summary
+    LIVE_METRICS_MODE: str = os.getenv("LIVE_METRICS_MODE", "poll")  # 'poll' (tail the DB, multi-worker safe) or 'local'
+    LIVE_METRICS_WINDOW: float = float(os.getenv("LIVE_METRICS_WINDOW", "5"))  # Seconds before the latest sample
+    LIVE_METRICS_MAX_SAMPLES: int = int(os.getenv("LIVE_METRICS_MAX_SAMPLES", "10000"))  # Ring buffer size per cluster
+    LIVE_METRICS_POLL_INTERVAL: float = float(os.getenv("LIVE_METRICS_POLL_INTERVAL", "1"))  # Seconds
+    SAMPLE_TAIL_LOOKBACK: int = int(os.getenv("SAMPLE_TAIL_LOOKBACK", "10000"))  # Ids below the newest read that may still commit late
     
-    # Model cache timeout (in seconds)
-    MODEL_CACHE_TIMEOUT: int = int(os.getenv("MODEL_CACHE_TIMEOUT", "3600"))  # Default to 1 hour
+    # Live metrics push (WebSocket/SSE)
+    METRICS_PUSH_INTERVAL: float = float(os.getenv("METRICS_PUSH_INTERVAL", "1"))  # Seconds between fan-out ticks
+    METRICS_PUSH_MIN_INTERVAL: float = float(os.getenv("METRICS_PUSH_MIN_INTERVAL", "0.5"))  # Fastest rate a client may request
+    METRICS_PUSH_MAX_SUBSCRIBERS: int = int(os.getenv("METRICS_PUSH_MAX_SUBSCRIBERS", "1000"))  # Per worker
+    METRICS_PUSH_MAX_PENDING: int = int(os.getenv("METRICS_PUSH_MAX_PENDING", "1000"))  # Samples buffered per subscriber
+    METRICS_PUSH_HEARTBEAT: float = float(os.getenv("METRICS_PUSH_HEARTBEAT", "15"))  # Keepalive when idle
     
     # CORS settings
     CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:5173"]
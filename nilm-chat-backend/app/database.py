@@ -1,21 +1,82 @@
-from sqlalchemy import create_engine
+from typing import Optional, Sequence
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
+def _async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its asyncio driver"""
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    return url
+
+def _pool_options(url: str) -> dict:
+    """Connection pool tuning; SQLite keeps SQLAlchemy's default pool"""
+    if url.startswith("sqlite"):
+        # Wait for concurrent writers (e.g. parallel ingest workers) instead of failing
+        return {"connect_args": {"timeout": settings.SQLITE_BUSY_TIMEOUT}}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+
 # Create SQLAlchemy engine
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(settings.DATABASE_URL, **_pool_options(settings.DATABASE_URL))
+
+# Async engine used by the async endpoints so DB I/O doesn't block the event loop
+async_engine = create_async_engine(
+    _async_database_url(settings.DATABASE_URL),
+    **_pool_options(settings.DATABASE_URL)
+)
+
+def _enable_sqlite_wal(sync_engine) -> None:
+    """WAL lets readers run during writes, and synchronous=NORMAL fsyncs at checkpoints instead of every commit"""
+    @event.listens_for(sync_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+if settings.DATABASE_URL.startswith("sqlite") and settings.SQLITE_WAL:
+    _enable_sqlite_wal(engine)
+    _enable_sqlite_wal(async_engine.sync_engine)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Create base class for models
 Base = declarative_base()
 
+def insert_ignore(dialect: str, table, index_elements: Optional[Sequence[str]] = None):
+    """
+    INSERT that silently skips rows conflicting with stored ones (e.g. written by a
+    concurrent request); None on dialects without ON CONFLICT, so callers pick a fallback
+    """
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing(index_elements=index_elements)
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing(index_elements=index_elements)
+    return None
+
 # Dependency to get DB session
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
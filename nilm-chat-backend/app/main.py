@@ -1,11 +1,23 @@
 from fastapi import FastAPI, Depends, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
+import logging
 import uvicorn
 from app.api.router import api_router
 from app.config import settings
 from app.database import engine, Base
 from app.services.llm_service import llm_service
+from app.services.inference_executor import inference_executor
+from app.services.model_manager import model_manager
+from app.services.live_metrics import live_metrics
+from app.services.metrics_push import metrics_broadcaster
+from app.services.chat_store import chat_store
+from app.services.chat_retention import chat_retention
+from app.services.ingest_buffer import ingest_buffer
+from app.services.cluster_model import cluster_engine
+from app.services.event_detector import event_detector
+from app.services.ingest_service import check_indexes
 
+logger = logging.getLogger(__name__)
 
 # Create all tables in the database
 Base.metadata.create_all(bind=engine)
@@ -23,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor
 )
 
 # Include API routes
@@ -39,11 +52,34 @@ async def root():
 
 @app.on_event("startup")
 async def startup_event():
+    # create_all skips existing tables; adding indexes to them is a migration step
+    outdated = check_indexes(engine)
+    if outdated:
+        logger.warning(f"electrical_data indexes {outdated} are missing or stale: run python create_tables.py to migrate them")
+    # Rebuild the in-memory metrics window before serving requests
+    await live_metrics.start()
+    chat_retention.start()
+    event_detector.start()
+
     # Initialize the Flan-T5 model on startup
     if settings.LLM_PROVIDER == "flan-t5":
         print(f"Initializing Flan-T5 model: {settings.MODEL_NAME}")
         await llm_service.initialize_model()
         print("Model initialization complete")
+        model_manager.start_maintenance()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    live_metrics.stop()
+    metrics_broadcaster.stop()
+    model_manager.stop_maintenance()
+    chat_retention.stop()
+    event_detector.stop()
+    inference_executor.shutdown()
+    # Write samples and chat turns still buffered
+    await ingest_buffer.stop()
+    cluster_engine.save()
+    await chat_store.stop()
         
 
 
@@ -1,6 +1,6 @@
 # app/api/models/chat.py
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -10,7 +10,7 @@ class ChatSession(Base):
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String, unique=True, index=True)
     created_at = Column(DateTime, default=func.now())
-    last_active = Column(DateTime, default=func.now(), onupdate=func.now())
+    last_active = Column(DateTime, default=func.now(), onupdate=func.now(), index=True)  # Retention scans by age
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -19,4 +19,9 @@ class ChatMessage(Base):
     session_id = Column(String, ForeignKey("chat_sessions.session_id"))
     role = Column(String, nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
-    timestamp = Column(DateTime, default=func.now())
\ No newline at end of file
+    timestamp = Column(DateTime, default=func.now())
+
+    # Recent history and keyset paging of one session
+    __table_args__ = (
+        Index('ix_chat_messages_session_timestamp_id', 'session_id', 'timestamp', 'id'),
+    )
\ No newline at end of file
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, Index
+from app.database import Base
+
+class DeviceEvent(Base):
+    """One on period of a cluster, detected from real_power_watt steps"""
+    __tablename__ = "device_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cluster = Column(Integer, nullable=False)
+    device_state = Column(String, nullable=False)
+    started_at = Column(DateTime, nullable=False)  # First sample above the on threshold
+    ended_at = Column(DateTime, nullable=False)  # Last sample before switching off (latest sample while open)
+    duration_seconds = Column(Float, nullable=False)
+    energy_wh = Column(Float, nullable=False)  # Trapezoidal integral of real_power_watt
+    avg_power_watt = Column(Float, nullable=False)
+    peak_power_watt = Column(Float, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    is_open = Column(Boolean, nullable=False, default=False)  # Still on at the latest processed sample
+    last_power_watt = Column(Float, nullable=True)  # Power at ended_at, to continue the integral
+
+    __table_args__ = (
+        Index('ix_device_events_cluster_started_id', 'cluster', 'started_at', 'id'),
+        Index('ix_device_events_started_id', 'started_at', 'id'),
+    )
+
+class EventDetectorCheckpoint(Base):
+    """Position in the sample stream up to which events have been detected"""
+    __tablename__ = "event_detector_checkpoints"
+
+    name = Column(String, primary_key=True)
+    position = Column(String, nullable=False)  # SampleTail position (last ElectricalData.id and late ids), or last columnar file
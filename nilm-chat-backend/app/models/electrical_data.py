@@ -21,7 +21,10 @@ class ElectricalData(Base):
 
     # Indexes for performance
     __table_args__ = (
-        Index('ix_timestamp', 'timestamp'),
-        Index('ix_cluster', 'cluster'),
-        Index('ix_device_state', 'device_state')
+        # Keyset order for recent and per-cluster pages; id breaks timestamp ties
+        Index('ix_timestamp_id', 'timestamp', 'id'),
+        Index('ix_cluster_timestamp_id', 'cluster', 'timestamp', 'id'),
+        Index('ix_device_state', 'device_state'),
+        # One sample per cluster per timestamp; lets re-imports skip rows already stored
+        Index('ux_timestamp_cluster', 'timestamp', 'cluster', unique=True)
     )
\ No newline at end of file
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+class EnergyPeriod(Base):
+    """Energy per cluster over one closed calendar period, cached by the energy service"""
+    __tablename__ = "energy_periods"
+
+    period = Column(String, primary_key=True)  # 'hour', 'day', 'week' or 'month'
+    period_start = Column(DateTime, primary_key=True)
+    totals = Column(JSON, nullable=False)  # {"<cluster>": [energy_wh, sample_count]}; {} without samples
+    computed_at = Column(DateTime, default=func.now())
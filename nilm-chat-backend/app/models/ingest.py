@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class IngestFile(Base):
+    """One capture file seen by the ingest command, identified by path and size/mtime"""
+    __tablename__ = "ingest_files"
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=False)  # "<size>:<mtime_ns>"
+    status = Column(String, nullable=False, default="running")  # 'running' or 'complete'
+    chunk_size = Column(Integer, nullable=False)
+    rows_inserted = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=func.now())
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ux_ingest_files_path_fingerprint', 'path', 'fingerprint', unique=True),
+    )
+
+class IngestChunk(Base):
+    """A chunk of a capture file committed together with its rows"""
+    __tablename__ = "ingest_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    file_id = Column(Integer, ForeignKey("ingest_files.id"), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    rows_read = Column(Integer, nullable=False)
+    rows_inserted = Column(Integer, nullable=False)
+    committed_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index('ux_ingest_chunks_file_chunk', 'file_id', 'chunk_index', unique=True),
+    )
@@ -0,0 +1,45 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, Float, String, DateTime, Index, event, inspect, select
+from app.database import Base
+from app.models.electrical_data import ElectricalData
+
+# covered_from of a database that has kept rollups since its first sample
+ALL_SAMPLES = datetime(1970, 1, 1)
+
+class ElectricalDataRollup(Base):
+    """Downsampled ElectricalData per cluster and device_state at a fixed resolution"""
+    __tablename__ = "electrical_data_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    resolution = Column(Integer, nullable=False)  # Bucket width in seconds
+    bucket_start = Column(DateTime, nullable=False)
+    cluster = Column(Integer, nullable=False)
+    device_state = Column(String, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    power_sum = Column(Float, nullable=False)  # real_power_watt
+    power_min = Column(Float, nullable=False)
+    power_max = Column(Float, nullable=False)
+    thd_sum = Column(Float, nullable=False)
+    thd_min = Column(Float, nullable=False)
+    thd_max = Column(Float, nullable=False)
+    pf_sum = Column(Float, nullable=False)
+    pf_min = Column(Float, nullable=False)
+    pf_max = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index('ux_rollup_bucket', 'resolution', 'bucket_start', 'cluster', 'device_state', unique=True),
+    )
+
+class RollupCoverage(Base):
+    """Single row: rollups hold every sample stored from covered_from on; absent until they do"""
+    __tablename__ = "rollup_coverage"
+
+    id = Column(Integer, primary_key=True)
+    covered_from = Column(DateTime, nullable=False)  # Start of a coarsest rollup bucket
+
+@event.listens_for(RollupCoverage.__table__, "after_create")
+def _cover_new_databases(table, connection, **kw):
+    # Ingest keeps rollups from the first sample of a new database on; samples stored
+    # before the table existed are only covered once scripts/rebuild_rollups.py has run
+    if not inspect(connection).has_table(ElectricalData.__tablename__) or connection.execute(select(ElectricalData.id).limit(1)).first() is None:
+        connection.execute(table.insert().values(id=1, covered_from=ALL_SAMPLES))
@@ -0,0 +1,159 @@
+import os
+import gzip
+import json
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, delete, func, tuple_
+from app.config import settings
+from app.database import engine
+from app.services.chat_store import chat_store
+from app.models.chat import ChatSession, ChatMessage
+from app.utils.clock import utcnow
+
+logger = logging.getLogger(__name__)
+
+def _archive(archive_dir: Optional[str], conn, condition, reason: str) -> int:
+    """
+    Append the messages matching condition to a gzipped NDJSON file before they are deleted
+    Returns:
+        Number of messages archived
+    """
+    if not archive_dir:
+        return 0
+    rows = conn.execute(
+        select(ChatMessage.session_id, ChatMessage.role, ChatMessage.content, ChatMessage.timestamp)
+        .where(condition)
+        .order_by(ChatMessage.session_id, ChatMessage.timestamp, ChatMessage.id)
+    ).all()
+    if not rows:
+        return 0
+
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"chat-{utcnow():%Y%m%d}.ndjson.gz")
+    # Each append is a complete gzip member, which gzip readers concatenate
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        for session_id, role, content, timestamp in rows:
+            f.write(json.dumps({
+                "session_id": session_id, "role": role, "content": content,
+                "timestamp": timestamp.isoformat() if timestamp else None, "reason": reason
+            }) + "\n")
+    return len(rows)
+
+def purge_inactive_sessions(bind, cutoff: datetime, archive_dir: Optional[str], batch_size: int) -> List[str]:
+    """
+    Archive and delete sessions whose last activity is before cutoff, batch_size sessions per transaction
+    Returns:
+        The deleted session ids
+    """
+    last_active = func.coalesce(ChatSession.last_active, ChatSession.created_at)
+    purged = []
+    while True:
+        with bind.begin() as conn:
+            session_ids = conn.scalars(
+                select(ChatSession.session_id).where(last_active < cutoff).limit(batch_size)
+            ).all()
+            if not session_ids:
+                return purged
+            condition = ChatMessage.session_id.in_(session_ids)
+            _archive(archive_dir, conn, condition, "inactive")
+            conn.execute(delete(ChatMessage).where(condition))
+            conn.execute(delete(ChatSession).where(ChatSession.session_id.in_(session_ids)))
+        purged.extend(session_ids)
+
+def trim_long_sessions(bind, max_messages: int, archive_dir: Optional[str]) -> int:
+    """
+    Archive and delete all but the newest max_messages messages of each session
+    Returns:
+        Number of messages deleted
+    """
+    with bind.connect() as conn:
+        session_ids = conn.scalars(
+            select(ChatMessage.session_id)
+            .group_by(ChatMessage.session_id)
+            .having(func.count() > max_messages)
+        ).all()
+
+    trimmed = 0
+    for session_id in session_ids:
+        with bind.begin() as conn:
+            # (timestamp, id) of the newest message to drop
+            boundary = conn.execute(
+                select(ChatMessage.timestamp, ChatMessage.id)
+                .where(ChatMessage.session_id == session_id)
+                .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+                .offset(max_messages)
+                .limit(1)
+            ).first()
+            if boundary is None:
+                continue
+            condition = (ChatMessage.session_id == session_id) & (
+                tuple_(ChatMessage.timestamp, ChatMessage.id) <= tuple(boundary)
+            )
+            _archive(archive_dir, conn, condition, "trimmed")
+            trimmed += conn.execute(delete(ChatMessage).where(condition)).rowcount
+    return trimmed
+
+def run_retention(bind, now: Optional[datetime] = None) -> Dict[str, object]:
+    """One retention pass with the configured limits"""
+    now = now or utcnow()
+    result = {"purged_sessions": [], "trimmed_messages": 0}
+    if settings.CHAT_RETENTION_DAYS > 0:
+        result["purged_sessions"] = purge_inactive_sessions(
+            bind,
+            cutoff=now - timedelta(days=settings.CHAT_RETENTION_DAYS),
+            archive_dir=settings.CHAT_ARCHIVE_DIR,
+            batch_size=settings.CHAT_RETENTION_BATCH
+        )
+    if settings.CHAT_MAX_MESSAGES_PER_SESSION > 0:
+        result["trimmed_messages"] = trim_long_sessions(
+            bind, settings.CHAT_MAX_MESSAGES_PER_SESSION, settings.CHAT_ARCHIVE_DIR
+        )
+    return result
+
+class ChatRetentionJob:
+    """Runs retention every interval seconds off the event loop and evicts purged sessions from the chat cache"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"runs": 0, "purged_sessions": 0, "trimmed_messages": 0, "failures": 0}
+
+    async def run_once(self) -> Dict[str, object]:
+        # Queued turns must reach the database before their sessions are judged inactive
+        await chat_store.flush()
+        result = await asyncio.to_thread(run_retention, engine)
+        chat_store.forget(result["purged_sessions"])
+        self._stats["runs"] += 1
+        self._stats["purged_sessions"] += len(result["purged_sessions"])
+        self._stats["trimmed_messages"] += result["trimmed_messages"]
+        return result
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                result = await self.run_once()
+                logger.info(
+                    f"Chat retention purged {len(result['purged_sessions'])} sessions, "
+                    f"trimmed {result['trimmed_messages']} messages"
+                )
+            except Exception as e:
+                self._stats["failures"] += 1
+                logger.error(f"Chat retention failed: {str(e)}")
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> Dict[str, object]:
+        return {"interval": self.interval, **self._stats}
+
+# Periodic retention started by the app
+chat_retention = ChatRetentionJob(interval=settings.CHAT_RETENTION_INTERVAL)
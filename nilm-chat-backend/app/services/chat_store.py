@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, update, insert, or_
+from app.config import settings
+from app.database import AsyncSessionLocal, insert_ignore
+from app.models.chat import ChatSession, ChatMessage
+from app.utils.clock import utcnow
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ChatTurn:
+    session_id: str
+    user_message: str
+    user_timestamp: datetime
+
+class ChatStore:
+    """
+    Chat persistence with a per-session cache of recent messages
+    A turn costs one transaction: the user and assistant messages are written
+    together when the reply is ready, optionally behind the response through a
+    queue. The history cache is per worker, so multiple workers need sticky
+    sessions (or CHAT_HISTORY_CACHE_SESSIONS=0) to see each other's turns.
+    A failed write-behind batch is retried with exponential backoff up to
+    max_retry_delay seconds; new turns are written inline once the queue is full.
+    """
+
+    def __init__(self, history_size: int, max_sessions: int, write_behind: bool, queue_size: int, max_retry_delay: float = 30.0):
+        self.history_size = history_size
+        self.max_sessions = max_sessions
+        self.write_behind = write_behind
+        self.max_retry_delay = max_retry_delay
+        self._retry_delay = 0.0  # Backoff after failed write-behind batches, 0 while writes succeed
+        self._histories: "OrderedDict[str, Deque[Tuple[str, str]]]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._queue_size = queue_size
+        self._writer: Optional[asyncio.Task] = None
+        self._stats = {"cache_hits": 0, "cache_misses": 0, "turns_written": 0, "transactions": 0, "queued": 0, "write_failures": 0}
+
+    async def _load_history(self, session_id: str) -> Deque[Tuple[str, str]]:
+        async with AsyncSessionLocal() as db:
+            messages = (await db.execute(
+                select(ChatMessage.role, ChatMessage.content)
+                .where(ChatMessage.session_id == session_id)
+                .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+                .limit(self.history_size)
+            )).all()
+        return deque(((role, content) for role, content in reversed(messages)), maxlen=self.history_size)
+
+    def _remember(self, session_id: str, history: Deque[Tuple[str, str]]) -> None:
+        if self.max_sessions <= 0:
+            return
+        self._histories[session_id] = history
+        self._histories.move_to_end(session_id)
+        while len(self._histories) > self.max_sessions:
+            self._histories.popitem(last=False)
+
+    async def start_turn(self, session_id: Optional[str], message: str) -> Tuple[ChatTurn, List[Tuple[str, str]]]:
+        """
+        Begin a turn without touching the database when the session is cached
+        Returns:
+            (turn, recent history ending with the new user message)
+        """
+        session_id = session_id or str(uuid.uuid4())
+        history = self._histories.get(session_id)
+        if history is None:
+            self._stats["cache_misses"] += 1
+            history = await self._load_history(session_id)
+        else:
+            self._stats["cache_hits"] += 1
+            self._histories.move_to_end(session_id)
+
+        self._remember(session_id, history)
+        # The cache only gets the message once the turn is written, see finish_turn
+        return ChatTurn(session_id, message, utcnow()), list(history) + [("user", message)]
+
+    def _cache_turn(self, turn: ChatTurn, assistant_message: Optional[str]) -> None:
+        history = self._histories.get(turn.session_id)
+        if history is not None:
+            history.append(("user", turn.user_message))
+            if assistant_message is not None:
+                history.append(("assistant", assistant_message))
+
+    async def finish_turn(self, turn: ChatTurn, assistant_message: Optional[str]) -> None:
+        """
+        Persist the turn; without an assistant message (failed generation) only the user message is stored
+        The cached history gets the turn once it is written, or once it is queued
+        with write-behind (queued turns are retried until written).
+        """
+        record = (turn, assistant_message, utcnow())
+        if self.write_behind:
+            self._ensure_writer()
+            try:
+                self._queue.put_nowait(record)
+                self._stats["queued"] += 1
+                self._cache_turn(turn, assistant_message)
+                return
+            except asyncio.QueueFull:
+                pass  # Backpressure: write this turn inline
+        await self._write([record])
+        self._cache_turn(turn, assistant_message)
+
+    async def _write(self, records: List[Tuple[ChatTurn, Optional[str], datetime]]) -> None:
+        """Write any number of turns in a single transaction"""
+        last_active: Dict[str, datetime] = {}
+        messages = []
+        for turn, assistant_message, finished_at in records:
+            last_active[turn.session_id] = finished_at
+            messages.append({
+                "session_id": turn.session_id, "role": "user",
+                "content": turn.user_message, "timestamp": turn.user_timestamp
+            })
+            if assistant_message is not None:
+                messages.append({
+                    "session_id": turn.session_id, "role": "assistant",
+                    "content": assistant_message, "timestamp": finished_at
+                })
+
+        async with AsyncSessionLocal() as db:
+            sessions = [
+                {"session_id": session_id, "created_at": active, "last_active": active}
+                for session_id, active in last_active.items()
+            ]
+            statement = insert_ignore(db.get_bind().dialect.name, ChatSession.__table__, ['session_id'])
+            if statement is not None:
+                # Concurrent first turns of one session must not both fail on the unique session_id
+                await db.execute(statement, sessions)
+            else:
+                existing = set((await db.scalars(
+                    select(ChatSession.session_id).where(ChatSession.session_id.in_(list(last_active)))
+                )).all())
+                new_sessions = [session for session in sessions if session["session_id"] not in existing]
+                if new_sessions:
+                    await db.execute(insert(ChatSession), new_sessions)
+            for session_id, active in last_active.items():
+                await db.execute(
+                    update(ChatSession)
+                    .where(
+                        ChatSession.session_id == session_id,
+                        or_(ChatSession.last_active.is_(None), ChatSession.last_active < active)
+                    )
+                    .values(last_active=active)
+                )
+            await db.execute(insert(ChatMessage), messages)
+            await db.commit()
+
+        self._stats["turns_written"] += len(records)
+        self._stats["transactions"] += 1
+
+    def _ensure_writer(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self._queue_size)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+
+    async def _write_loop(self) -> None:
+        records: List[Tuple[ChatTurn, Optional[str], datetime]] = []
+        while True:
+            if not records:
+                records = [await self._queue.get()]
+                # Everything queued meanwhile goes into the same transaction
+                while not self._queue.empty():
+                    records.append(self._queue.get_nowait())
+            try:
+                await self._write(records)
+            except Exception as e:
+                # Keep the batch for the next attempt; turns queued meanwhile wait behind it,
+                # and once the queue is full finish_turn writes inline and reports failures
+                self._stats["write_failures"] += 1
+                self._retry_delay = min(self.max_retry_delay, max(0.5, self._retry_delay * 2))
+                logger.error(f"Write-behind of {len(records)} chat turns failed, retrying in {self._retry_delay:.1f}s: {str(e)}")
+                await asyncio.sleep(self._retry_delay)
+                continue
+            self._retry_delay = 0.0
+            for _ in records:
+                self._queue.task_done()
+            records = []
+
+    async def flush(self) -> None:
+        """Wait until queued turns are written"""
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        try:
+            # Failing writes are retried until written, but don't hold up shutdown forever
+            await asyncio.wait_for(self.flush(), timeout=self.max_retry_delay)
+        except asyncio.TimeoutError:
+            logger.error(f"Stopping with chat turns not written: {self._queue.qsize()} queued and a failing batch")
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    def forget(self, session_ids: Iterable[str]) -> None:
+        """Drop cached history, e.g. for sessions removed by retention"""
+        for session_id in session_ids:
+            self._histories.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            "cached_sessions": len(self._histories),
+            "write_behind": self.write_behind,
+            "pending_writes": self._queue.qsize() if self._queue is not None else 0,
+            "retry_delay": self._retry_delay,
+            **self._stats
+        }
+
+# Shared chat store for the chat endpoints
+chat_store = ChatStore(
+    history_size=settings.MAX_CONVERSATION_HISTORY,
+    max_sessions=settings.CHAT_HISTORY_CACHE_SESSIONS,
+    write_behind=settings.CHAT_WRITE_BEHIND,
+    queue_size=settings.CHAT_WRITE_QUEUE_SIZE
+)
@@ -0,0 +1,270 @@
+import os
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from app.config import settings
+from app.models.electrical_data import ElectricalData
+from app.services.columnar_store import columnar_store
+
+logger = logging.getLogger(__name__)
+
+# Features a sample is clustered on
+FEATURES = ["real_power_watt", "reactive_power", "power_factor", "thd"]
+
+class ClusterModel:
+    """
+    Nearest-centroid model over standardized FEATURES
+    Centroids are the per-cluster means of labelled history, so assigned ids
+    match the clusters already stored. assign() labels a whole batch with one
+    matrix product; partial_fit() moves centroids towards new samples like
+    mini-batch k-means, with a per-centroid learning rate of 1/count.
+    """
+
+    def __init__(
+        self,
+        clusters: np.ndarray,
+        device_states: List[str],
+        centroids: np.ndarray,
+        counts: np.ndarray,
+        mean: np.ndarray,
+        scale: np.ndarray
+    ):
+        self.clusters = clusters.astype(np.int64)
+        self.device_states = list(device_states)
+        self.centroids = centroids.astype(np.float64)  # In standardized units
+        self.counts = counts.astype(np.float64)
+        self.mean = mean.astype(np.float64)
+        self.scale = scale.astype(np.float64)
+        self._centroid_norms = (self.centroids ** 2).sum(axis=1)
+
+    @classmethod
+    def fit(cls, chunks: Iterable[pd.DataFrame]) -> "ClusterModel":
+        """
+        Learn centroids from labelled history in one pass over chunks with FEATURES, cluster and device_state
+        Only running sums are kept, so history of any size fits in memory.
+        """
+        sums = sumsq = counts = states = None
+        total = 0
+        for chunk in chunks:
+            chunk = chunk.dropna(subset=FEATURES + ["cluster"])
+            if chunk.empty:
+                continue
+            values = chunk[FEATURES].to_numpy(np.float64)
+            grouped = chunk.groupby("cluster")[FEATURES].agg(["sum", "count"])
+            chunk_sums = grouped.xs("sum", axis=1, level=1)
+            chunk_counts = grouped[(FEATURES[0], "count")].rename("count")
+            chunk_states = chunk.groupby(["cluster", "device_state"]).size()
+
+            sums = chunk_sums if sums is None else sums.add(chunk_sums, fill_value=0)
+            counts = chunk_counts if counts is None else counts.add(chunk_counts, fill_value=0)
+            states = chunk_states if states is None else states.add(chunk_states, fill_value=0)
+            column_sumsq = (values ** 2).sum(axis=0)
+            sumsq = column_sumsq if sumsq is None else sumsq + column_sumsq
+            total += len(values)
+
+        if not total:
+            raise ValueError("No labelled samples to learn cluster centroids from")
+
+        mean = sums.sum().to_numpy() / total
+        variance = sumsq / total - mean ** 2
+        scale = np.sqrt(np.maximum(variance, 0))
+        scale[scale < 1e-9] = 1.0  # Constant features carry no distance
+
+        centroids = (sums.div(counts, axis=0).to_numpy() - mean) / scale
+        # Most common device_state per cluster
+        device_states = (
+            states.sort_values(ascending=False).reset_index()
+            .drop_duplicates("cluster").set_index("cluster")["device_state"]
+        )
+        return cls(
+            clusters=sums.index.to_numpy(),
+            device_states=[device_states.get(cluster, "") for cluster in sums.index],
+            centroids=centroids,
+            counts=counts.to_numpy(),
+            mean=mean,
+            scale=scale
+        )
+
+    def _standardize(self, features: np.ndarray) -> np.ndarray:
+        return (np.asarray(features, dtype=np.float64) - self.mean) / self.scale
+
+    def assign(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest centroid for each row of an (n, len(FEATURES)) array
+        Returns:
+            (centroid index per row, squared distance in standardized units)
+        """
+        x = self._standardize(features)
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, for all rows and centroids at once
+        distances = (x ** 2).sum(axis=1)[:, None] - 2 * x @ self.centroids.T + self._centroid_norms[None, :]
+        nearest = distances.argmin(axis=1)
+        return nearest, np.maximum(distances[np.arange(len(x)), nearest], 0)
+
+    def partial_fit(self, features: np.ndarray, nearest: np.ndarray) -> None:
+        """Move each centroid towards the mean of the samples just assigned to it"""
+        x = self._standardize(features)
+        k = len(self.centroids)
+        batch_counts = np.bincount(nearest, minlength=k).astype(np.float64)
+        batch_sums = np.zeros_like(self.centroids)
+        np.add.at(batch_sums, nearest, x)
+
+        updated = batch_counts > 0
+        self.counts[updated] += batch_counts[updated]
+        # Running mean: c += (sum - n * c) / count
+        self.centroids[updated] += (
+            batch_sums[updated] - batch_counts[updated, None] * self.centroids[updated]
+        ) / self.counts[updated, None]
+        self._centroid_norms = (self.centroids ** 2).sum(axis=1)
+
+    def save(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            clusters=self.clusters,
+            device_states=np.array(self.device_states, dtype=str),
+            centroids=self.centroids,
+            counts=self.counts,
+            mean=self.mean,
+            scale=self.scale,
+            features=np.array(FEATURES, dtype=str)
+        )
+        os.replace(tmp_path, path)  # Readers never see a partial file
+
+    @classmethod
+    def load(cls, path: str) -> "ClusterModel":
+        with np.load(path) as data:
+            if list(data["features"]) != FEATURES:
+                raise ValueError(f"{path} was trained on {list(data['features'])}, expected {FEATURES}")
+            return cls(
+                clusters=data["clusters"],
+                device_states=list(data["device_states"]),
+                centroids=data["centroids"],
+                counts=data["counts"],
+                mean=data["mean"],
+                scale=data["scale"]
+            )
+
+def history_chunks(conn=None, chunk_size: int = 500000) -> Iterable[pd.DataFrame]:
+    """Labelled samples for ClusterModel.fit, from electrical_data or the columnar store"""
+    columns = FEATURES + ["cluster", "device_state"]
+    if columnar_store is not None:
+        for batch in columnar_store.iter_batches(None, None, None, columns, chunk_size):
+            yield batch.to_pandas()
+        return
+
+    last_id = 0
+    while True:
+        chunk = pd.read_sql(
+            select(ElectricalData.id, *(getattr(ElectricalData, column) for column in columns))
+            .where(ElectricalData.id > last_id)
+            .order_by(ElectricalData.id)
+            .limit(chunk_size),
+            conn
+        )
+        if chunk.empty:
+            return
+        last_id = int(chunk["id"].iloc[-1])
+        yield chunk.drop(columns="id")
+
+class ClusterEngine:
+    """Loads the persisted model once and labels frames of incoming samples"""
+
+    def __init__(self, path: str, online_updates: bool):
+        self.path = path
+        self.online_updates = online_updates
+        self._model: Optional[ClusterModel] = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._stats = {"labelled": 0, "batches": 0}
+
+    @property
+    def model(self) -> Optional[ClusterModel]:
+        if self._model is None and os.path.exists(self.path):
+            with self._lock:
+                if self._model is None:
+                    self._model = ClusterModel.load(self.path)
+                    logger.info(f"Loaded cluster model with {len(self._model.clusters)} centroids from {self.path}")
+        return self._model
+
+    def set_model(self, model: ClusterModel, save: bool = True) -> None:
+        with self._lock:
+            if save:
+                model.save(self.path)
+            self._model = model
+            self._dirty = False
+
+    def label(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fill in missing cluster and device_state values, leaving given ones alone
+        A missing cluster is the nearest centroid's. A missing device_state is the
+        given cluster's, or the nearest centroid's when the model doesn't know that
+        cluster. Rows with non-finite features are left unlabelled.
+        Raises:
+            ValueError when samples need labels and no model has been trained
+        """
+        # NaN or infinite readings would pull a centroid to NaN for good; prepare_frame drops them unlabelled
+        finite = np.isfinite(df[FEATURES].to_numpy(np.float64)).all(axis=1)
+        no_cluster = df["cluster"].isna().to_numpy() & finite
+        no_state = df["device_state"].isna().to_numpy() & finite
+        if not (no_cluster | no_state).any():
+            return df
+        model = self.model
+        if model is None:
+            raise ValueError(
+                "Samples without cluster or device_state need a trained model: run python scripts/train_cluster_model.py"
+            )
+
+        df = df.copy()
+        df["cluster"] = df["cluster"].astype("Int64")
+        df["device_state"] = df["device_state"].astype(object)
+        states = np.asarray(model.device_states, dtype=object)
+
+        # Given clusters the model knows name their own device_state
+        given = no_state & ~no_cluster
+        derived = df.loc[given, "cluster"].astype(object).map(dict(zip(model.clusters.tolist(), states)))
+        df.loc[given, "device_state"] = derived.to_numpy(object)
+        unknown = given.copy()
+        unknown[given] = derived.isna().to_numpy()
+
+        search = no_cluster | unknown
+        if search.any():
+            features = df.loc[search, FEATURES].to_numpy(np.float64)
+            assigned = no_cluster[search]  # Rows whose cluster comes from the centroid
+            with self._lock:
+                nearest, _ = model.assign(features)
+                if self.online_updates and assigned.any():
+                    # Samples of clusters the model doesn't know must not move its centroids
+                    model.partial_fit(features[assigned], nearest[assigned])
+                    self._dirty = True
+            df.loc[no_cluster, "cluster"] = model.clusters[nearest[assigned]]
+            df.loc[search & no_state, "device_state"] = states[nearest[no_state[search]]]
+
+        self._stats["labelled"] += int((no_cluster | no_state).sum())
+        self._stats["batches"] += 1
+        return df
+
+    def save(self) -> None:
+        """Persist centroids moved by online updates"""
+        with self._lock:
+            if self._model is not None and self._dirty:
+                self._model.save(self.path)
+                self._dirty = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        model = self._model
+        return {
+            "loaded": model is not None,
+            "centroids": len(model.clusters) if model is not None else 0,
+            "online_updates": self.online_updates,
+            **self._stats
+        }
+
+# Shared cluster engine for the ingest API
+cluster_engine = ClusterEngine(
+    path=settings.CLUSTER_MODEL_PATH,
+    online_updates=settings.CLUSTER_ONLINE_UPDATES
+)
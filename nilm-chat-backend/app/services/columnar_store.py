@@ -0,0 +1,432 @@
+import os
+import glob
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import pandas as pd
+from app.config import settings
+from app.services.ingest_service import DEDUP_COLUMNS, INSERT_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover this process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Partition directory name per granularity; lexicographic order is time order
+PARTITION_FORMATS = {
+    "day": "%Y-%m-%d",
+    "hour": "%Y-%m-%dT%H",
+}
+
+# Aggregates returned by ColumnarStore.aggregate, named like the rollup columns
+_AGGREGATES = [
+    ("real_power_watt", "count", "sample_count"),
+    ("real_power_watt", "sum", "power_sum"),
+    ("real_power_watt", "min", "power_min"),
+    ("real_power_watt", "max", "power_max"),
+    ("thd", "sum", "thd_sum"),
+    ("power_factor", "sum", "pf_sum"),
+]
+
+@contextmanager
+def _file_lock(path: str, blocking: bool = True) -> Iterator[Optional[Any]]:
+    """Exclusive lock shared by processes; yields the open lock file, or None if non-blocking and taken"""
+    with open(path, "a+") as handle:
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield None
+                return
+        try:
+            yield handle
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+def _schema():
+    return pa.schema([
+        ("timestamp", pa.timestamp("us")),
+        ("voltage", pa.float32()),
+        ("current", pa.float32()),
+        ("real_power", pa.float32()),
+        ("reactive_power", pa.float32()),
+        ("apparent_power", pa.float32()),
+        ("power_factor", pa.float32()),
+        ("frequency", pa.float32()),
+        ("thd", pa.float32()),
+        ("real_power_watt", pa.float32()),
+        ("cluster", pa.int32()),
+        ("device_state", pa.dictionary(pa.int32(), pa.string())),
+    ])
+
+class ColumnarStore:
+    """
+    ElectricalData samples in time-partitioned Parquet files
+    Layout: <root>/<partition>/part-<seq>-<pid>-<rand>.parquet, one file per write.
+    Files are sorted by timestamp with zstd compression and a dictionary-encoded
+    device_state, so range scans read only the partitions and row groups they need.
+    Sequence numbers are taken as files are published, so names sort in the order
+    readers can see them. Partitions holding more than compact_files files older
+    than compact_min_age seconds are compacted by the writer; younger files are
+    left for live tailers.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        partition: str = "day",
+        row_group_size: int = 131072,
+        compact_files: int = 32,
+        compact_min_age: float = 60.0
+    ):
+        if pa is None:
+            raise ImportError("parquet storage backend requires pyarrow: pip install pyarrow")
+        if partition not in PARTITION_FORMATS:
+            raise ValueError(f"Unknown partition granularity: {partition}")
+        self.root = root
+        self.partition = partition
+        self.row_group_size = row_group_size
+        self.compact_files = compact_files
+        self.compact_min_age = compact_min_age
+        self.schema = _schema()
+        self._compact_checked: Dict[str, float] = {}  # partition -> last check in this process
+        os.makedirs(root, exist_ok=True)
+
+    def _partition_key(self, value: datetime) -> str:
+        return value.strftime(PARTITION_FORMATS[self.partition])
+
+    def partitions(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+        """Partition names overlapping [start, end], oldest first"""
+        names = sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        )
+        if start is not None:
+            names = [name for name in names if name >= self._partition_key(start)]
+        if end is not None:
+            names = [name for name in names if name <= self._partition_key(end)]
+        return names
+
+    def files(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+        paths = []
+        for name in self.partitions(start, end):
+            paths.extend(sorted(glob.glob(os.path.join(self.root, name, "*.parquet"))))
+        return paths
+
+    def _to_table(self, df: pd.DataFrame) -> "pa.Table":
+        df = df[INSERT_COLUMNS].sort_values("timestamp", kind="stable")
+        return pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+
+    def _write_table(self, table: "pa.Table", directory: str, prefix: str = "part") -> str:
+        os.makedirs(directory, exist_ok=True)
+        suffix = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.parquet"
+        # Write under a temporary name so readers never see a partial file
+        temporary = os.path.join(directory, f".{suffix}.tmp")
+        pq.write_table(
+            table,
+            temporary,
+            row_group_size=self.row_group_size,
+            compression="zstd",
+            use_dictionary=["device_state"],
+            write_statistics=True
+        )
+        # Number and publish under one lock, so no file appears with a name sorting
+        # before one a tailer has already read
+        with _file_lock(os.path.join(self.root, ".sequence")) as sequence:
+            sequence.seek(0)
+            last = sequence.read().strip()
+            number = max(time.time_ns(), int(last) + 1 if last else 0)
+            path = os.path.join(directory, f"{prefix}-{number:020d}-{suffix}")
+            os.replace(temporary, path)
+            sequence.truncate(0)
+            sequence.write(str(number))
+            sequence.flush()
+        return path
+
+    def _read_table(self, list_paths, **kwargs) -> Optional["pa.Table"]:
+        """Read the listed files, listing again if a concurrent compaction removed one"""
+        for attempt in range(3):
+            paths = list_paths()
+            if not paths:
+                return None
+            try:
+                return pq.read_table(paths, memory_map=True, **kwargs)
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+
+    def _existing_keys(self, partition: str, start: datetime, end: datetime) -> pd.DataFrame:
+        table = self._read_table(
+            lambda: sorted(glob.glob(os.path.join(self.root, partition, "*.parquet"))),
+            columns=DEDUP_COLUMNS,
+            filters=[("timestamp", ">=", start), ("timestamp", "<=", end)]
+        )
+        if table is None:
+            return pd.DataFrame(columns=DEDUP_COLUMNS)
+        return table.to_pandas()
+
+    def write_frame(self, df: pd.DataFrame, dedup: bool = True) -> int:
+        """
+        Append a prepared frame (see ingest_service.prepare_frame), one file per partition
+        With dedup, samples whose (timestamp, cluster) is already stored are skipped.
+        Returns:
+            Number of rows written
+        """
+        if df.empty:
+            return 0
+
+        written = 0
+        keys = df["timestamp"].dt.strftime(PARTITION_FORMATS[self.partition])
+        for partition, part in df.groupby(keys, sort=True):
+            directory = os.path.join(self.root, partition)
+            os.makedirs(directory, exist_ok=True)
+            # Check and write under one lock, so concurrent writers of a partition
+            # each see the other's samples and can't both store the same one
+            with _file_lock(os.path.join(directory, ".write")):
+                if dedup:
+                    existing = self._existing_keys(partition, part["timestamp"].min(), part["timestamp"].max())
+                    if not existing.empty:
+                        existing["cluster"] = existing["cluster"].astype(part["cluster"].dtype)
+                        merged = part.merge(existing, on=DEDUP_COLUMNS, how="left", indicator=True)
+                        part = part[(merged["_merge"] == "left_only").to_numpy()]
+                    if part.empty:
+                        continue
+                self._write_table(self._to_table(part), directory)
+            written += len(part)
+            self._maybe_compact(partition)
+        return written
+
+    def _maybe_compact(self, partition: str) -> None:
+        """Compact a partition once it holds too many settled files; checked at most every compact_min_age"""
+        if self.compact_files <= 0:
+            return
+        now = time.time()
+        if now - self._compact_checked.get(partition, 0.0) < self.compact_min_age:
+            return
+        self._compact_checked[partition] = now
+        if len(self._settled_files(partition, now)) > self.compact_files:
+            try:
+                merged, rows = self.compact(partition, min_age=self.compact_min_age)
+            except Exception as e:
+                # The written files stay in place; the next check tries again
+                logger.error(f"Compacting {partition} failed: {str(e)}")
+                return
+            if merged:
+                logger.info(f"Compacted {partition}: merged {merged} files, {rows} rows")
+
+    def _filter(self, start: Optional[datetime], end: Optional[datetime], clusters: Optional[Sequence[int]]):
+        expression = None
+        conditions = []
+        if start is not None:
+            conditions.append(pc.field("timestamp") >= pa.scalar(start, pa.timestamp("us")))
+        if end is not None:
+            conditions.append(pc.field("timestamp") <= pa.scalar(end, pa.timestamp("us")))
+        if clusters:
+            conditions.append(pc.field("cluster").isin(list(clusters)))
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def scan(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        clusters: Optional[Sequence[int]] = None,
+        columns: Optional[Sequence[str]] = None
+    ) -> "pa.Table":
+        """Samples in [start, end], optionally for some clusters and columns only"""
+        table = self._read_table(
+            lambda: self.files(start, end),
+            columns=list(columns) if columns else None,
+            filters=self._filter(start, end, clusters)
+        )
+        if table is None:
+            return self.schema.empty_table().select(list(columns or self.schema.names))
+        return table
+
+    def iter_batches(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        clusters: Optional[Sequence[int]] = None,
+        columns: Optional[Sequence[str]] = None,
+        batch_size: int = 65536
+    ) -> Iterator["pa.RecordBatch"]:
+        """Stream matching samples file by file with bounded memory; partitions come in time order"""
+        columns = list(columns or self.schema.names)
+        # Filter columns have to be read even when they are not returned
+        read_columns = list(dict.fromkeys(columns + ["timestamp", "cluster"]))
+        expression = self._filter(start, end, clusters)
+        for path in self.files(start, end):
+            parquet_file = pq.ParquetFile(path, memory_map=True)
+            for batch in parquet_file.iter_batches(batch_size=batch_size, columns=read_columns):
+                table = pa.Table.from_batches([batch])
+                if expression is not None:
+                    table = table.filter(expression)
+                for filtered in table.select(columns).to_batches():
+                    if filtered.num_rows:
+                        yield filtered
+
+    def aggregate(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        by: Sequence[str] = ("cluster", "device_state")
+    ) -> pd.DataFrame:
+        """
+        Group-by over a range in one columnar pass
+        Returns:
+            DataFrame with the `by` columns plus sample_count, power_sum/min/max, thd_sum and pf_sum
+        """
+        columns = list(dict.fromkeys(list(by) + [column for column, _, _ in _AGGREGATES]))
+        table = self.scan(start, end, columns=columns)
+        if "device_state" in by:
+            table = table.set_column(
+                table.schema.get_field_index("device_state"),
+                "device_state",
+                table.column("device_state").cast(pa.string())
+            )
+        result = table.group_by(list(by)).aggregate(
+            [(column, function) for column, function, _ in _AGGREGATES]
+        )
+        df = result.to_pandas()
+        return df.rename(columns={f"{column}_{function}": name for column, function, name in _AGGREGATES})
+
+    def latest(
+        self,
+        limit: int,
+        before: Optional[Tuple[datetime, int]] = None,
+        cluster: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Newest samples first, reading partitions back from the newest until limit rows are found
+        Args:
+            before: only samples whose (timestamp, cluster) sorts before this key, for keyset pages
+        """
+        end = before[0] if before is not None else None
+        frames = []
+        found = 0
+        for partition in reversed(self.partitions(end=end)):
+            table = self._read_table(
+                lambda: sorted(glob.glob(os.path.join(self.root, partition, "*.parquet"))),
+                filters=self._filter(None, end, [cluster] if cluster is not None else None)
+            )
+            if table is None:
+                continue
+            df = table.to_pandas()
+            if before is not None:
+                df = df[(df["timestamp"] < before[0]) | ((df["timestamp"] == before[0]) & (df["cluster"] < before[1]))]
+            # Files not compacted yet may repeat a sample
+            df = df.drop_duplicates(subset=DEDUP_COLUMNS).sort_values(["timestamp", "cluster"], ascending=False).head(limit)
+            frames.append(df.assign(device_state=df["device_state"].astype("string")))
+            found += len(df)
+            if found >= limit:
+                break
+        if not frames:
+            return pd.DataFrame(columns=INSERT_COLUMNS)
+        return pd.concat(frames, ignore_index=True).head(limit)
+
+    def latest_timestamp(self) -> Optional[datetime]:
+        for partition in reversed(self.partitions()):
+            table = self._read_table(
+                lambda: glob.glob(os.path.join(self.root, partition, "*.parquet")), columns=["timestamp"]
+            )
+            if table is not None and table.num_rows:
+                return pc.max(table.column("timestamp")).as_py()
+        return None
+
+    def _recent_parts(self, recent_partitions: int) -> List[Tuple[str, str]]:
+        parts = []
+        for partition in self.partitions()[-recent_partitions:]:
+            parts.extend(
+                (os.path.basename(path), path)
+                for path in glob.glob(os.path.join(self.root, partition, "part-*.parquet"))
+            )
+        return sorted(parts)
+
+    def newest_part(self, recent_partitions: int = 2) -> str:
+        """Name of the most recently appended file, "" when the store is empty"""
+        parts = self._recent_parts(recent_partitions)
+        return parts[-1][0] if parts else ""
+
+    def read_new_parts(self, after: str = "", recent_partitions: int = 2) -> Tuple[Optional["pa.Table"], str]:
+        """
+        Samples from files appended after the part named `after`
+        Only the newest partitions are checked; used to tail the store like the SQL id poll.
+        Returns:
+            (table or None, name of the newest part seen)
+        """
+        new = [(name, path) for name, path in self._recent_parts(recent_partitions) if name > after]
+        if not new:
+            return None, after
+        # Parts are only compacted once older than compact_min_age, so a tailer polling
+        # more often than that reads every part before it goes
+        table = pq.read_table([path for _, path in new], memory_map=True)
+        return table, new[-1][0]
+
+    def _settled_files(self, partition: str, now: float, min_age: float = 0.0) -> List[str]:
+        paths = []
+        for path in sorted(glob.glob(os.path.join(self.root, partition, "*.parquet"))):
+            try:
+                if os.path.getmtime(path) <= now - min_age:
+                    paths.append(path)
+            except FileNotFoundError:
+                continue  # Just compacted by another process
+        return paths
+
+    def compact(self, partition: str, min_age: float = 0.0) -> Tuple[int, int]:
+        """
+        Merge a partition's files into one, dropping duplicate samples
+        Files newer than min_age seconds are left alone. Skipped while another
+        process compacts the same partition.
+        Returns:
+            (files merged, rows kept)
+        """
+        directory = os.path.join(self.root, partition)
+        with _file_lock(os.path.join(directory, ".compact"), blocking=False) as locked:
+            if locked is None:
+                return 0, 0
+            paths = self._settled_files(partition, time.time(), min_age)
+            if len(paths) < 2:
+                return 0, 0
+            df = pq.read_table(paths, memory_map=True).to_pandas()
+            df = df.drop_duplicates(subset=DEDUP_COLUMNS)
+            df["device_state"] = df["device_state"].astype("string")
+            # "compact-" sorts before "part-", so live tailing does not re-read merged rows
+            self._write_table(self._to_table(df), directory, prefix="compact")
+            for path in paths:
+                os.remove(path)
+        return len(paths), len(df)
+
+    def get_stats(self) -> Dict[str, Any]:
+        paths = self.files()
+        return {
+            "root": self.root,
+            "partitions": len(self.partitions()),
+            "files": len(paths),
+            "bytes": sum(os.path.getsize(path) for path in paths)
+        }
+
+# Shared store when STORAGE_BACKEND=parquet; None keeps everything in electrical_data
+columnar_store = (
+    ColumnarStore(
+        settings.COLUMNAR_DATA_DIR,
+        settings.COLUMNAR_PARTITION,
+        compact_files=settings.COLUMNAR_COMPACT_FILES,
+        compact_min_age=settings.COLUMNAR_COMPACT_MIN_AGE
+    )
+    if settings.STORAGE_BACKEND == "parquet" else None
+)
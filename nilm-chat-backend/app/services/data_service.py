@@ -1,25 +1,40 @@
 from typing import Dict, List, Any
 from datetime import datetime, timedelta
-from sqlalchemy import func
-from app.models.electrical_data import ElectricalData
+from sqlalchemy import select
+from app.models.rollup import RollupCoverage
+from app.services.rollup_service import pick_resolution, sums_query
+from app.services.columnar_store import columnar_store
+from app.utils.clock import utcnow
 
-async def get_actual_devices(db, hours: int = 24) -> List[Dict[str, Any]]:
-    """Extract ONLY real devices found in the dataset"""
+def _query_active_devices(db, time_window: datetime, hours: int):
+    # Get active clusters with their real device names from the coarsest rollup
+    # covering the window, with raw rows for its partial first bucket and
+    # for samples the rollups don't cover yet
+    covered_from = db.scalar(select(RollupCoverage.covered_from))
+    query = sums_query(("cluster", "device_state"), time_window, covered_from, pick_resolution(timedelta(hours=hours)))
+    return [
+        (cluster, device_state, power_sum / count, thd_sum / count)
+        for cluster, device_state, count, power_sum, thd_sum, _ in db.execute(query)
+    ]
+
+def get_actual_devices(db, hours: int = 24) -> List[Dict[str, Any]]:
+    """
+    Extract ONLY real devices found in the dataset
+    Args:
+        db: sync Session (use AsyncSession.run_sync from async code); unused with columnar storage
+    """
     try:
-        time_window = datetime.now() - timedelta(hours=hours)
+        time_window = utcnow() - timedelta(hours=hours)
         
-        # Get active clusters with their real device names from dataset
-        active_devices = db.query(
-            ElectricalData.cluster,
-            ElectricalData.device_state,
-            func.avg(ElectricalData.real_power_watt).label("avg_power"),
-            func.avg(ElectricalData.thd).label("avg_thd")
-        ).filter(
-            ElectricalData.timestamp >= time_window
-        ).group_by(
-            ElectricalData.cluster,
-            ElectricalData.device_state
-        ).all()
+        if columnar_store is not None:
+            # One group-by over the columnar partitions covering the window
+            grouped = columnar_store.aggregate(start=time_window, by=("cluster", "device_state"))
+            active_devices = [
+                (int(row.cluster), row.device_state, row.power_sum / row.sample_count, row.thd_sum / row.sample_count)
+                for row in grouped.itertuples()
+            ]
+        else:
+            active_devices = _query_active_devices(db, time_window, hours)
 
         # Build response with ONLY real devices
         devices = []
@@ -1,52 +1,113 @@
+import time
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import func, select
+from app.config import settings
 from app.models.electrical_data import ElectricalData
+from app.models.rollup import ElectricalDataRollup, RollupCoverage
+from app.services.rollup_service import RESOLUTIONS, sums_query
+from app.services.columnar_store import columnar_store
 
-def get_cluster_summaries(db: Session):
-    # For SQLite: Get most common device_state per cluster using count
-    subquery = (
-        db.query(
-            ElectricalData.cluster,
-            ElectricalData.device_state,
-            func.count().label("count")
-        )
-        .group_by(ElectricalData.cluster, ElectricalData.device_state)
-        .subquery()
-    )
-
-    # For each cluster, pick the device_state with the highest count
-    most_common_device_state = (
-        db.query(
-            subquery.c.cluster,
-            subquery.c.device_state
-        )
-        .order_by(subquery.c.cluster, desc(subquery.c.count))
-        .distinct(subquery.c.cluster)
-        .all()
-    )
-
-    # Map to dictionary for quick lookup
-    cluster_to_device = {row.cluster: row.device_state for row in most_common_device_state}
-
-    # Get power and THD averages per cluster
-    results = (
-        db.query(
-            ElectricalData.cluster,
-            func.avg(ElectricalData.real_power_watt).label("typical_power"),
-            func.avg(ElectricalData.thd).label("typical_thd")
-        )
-        .group_by(ElectricalData.cluster)
-        .all()
-    )
+class SummaryCache:
+    """
+    Last device summary, keyed by a data version
+    The version changes whenever samples are ingested by any process, so a
+    cached result is never served for older data; the TTL is only a safety net.
+    """
 
+    def __init__(self, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self._entry: Optional[Tuple[Any, float, List[Dict[str, Any]]]] = None
+        self._lock = threading.Lock()
+
+    def get(self, version: Any) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry[0] == version and time.monotonic() - entry[1] < self.ttl:
+                return entry[2]
+            return None
+
+    def set(self, version: Any, summaries: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entry = (version, time.monotonic(), summaries)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entry = None
+
+def data_version(db: Optional[Session]) -> Any:
+    """Cheap marker that changes on every ingest: newest file, or newest row id (a PK lookup)"""
+    if columnar_store is not None:
+        return columnar_store.newest_part(recent_partitions=0)
+    return db.execute(select(
+        select(func.max(ElectricalData.id)).scalar_subquery(),
+        select(func.max(ElectricalDataRollup.id)).scalar_subquery()
+    )).one()
+
+def _cluster_summaries_from_store(store):
+    """Same rows from one group-by over the columnar files"""
+    grouped = store.aggregate(by=("cluster", "device_state"))
+    if grouped.empty:
+        return []
+    most_common = grouped.sort_values(
+        ["sample_count", "device_state"], ascending=[False, True]
+    ).drop_duplicates("cluster").set_index("cluster")["device_state"]
+    totals = grouped.groupby("cluster")[["sample_count", "power_sum", "thd_sum"]].sum()
     return [
+        (int(cluster), most_common[cluster], row.power_sum / row.sample_count, row.thd_sum / row.sample_count)
+        for cluster, row in totals.iterrows()
+    ]
+
+def _summary_query(covered_from: Optional[datetime]):
+    """
+    One statement: per (cluster, device_state) counts and sums, then window functions
+    pick the most common device_state and total the averages per cluster
+    """
+    # All-time sums from the coarsest rollup, and raw rows stored before its coverage
+    counts = sums_query(("cluster", "device_state"), None, covered_from, max(RESOLUTIONS)).subquery()
+
+    per_cluster = {"partition_by": counts.c.cluster}
+    ranked = select(
+        counts.c.cluster,
+        counts.c.device_state,
+        (func.sum(counts.c.power_sum).over(**per_cluster) / func.sum(counts.c.sample_count).over(**per_cluster)).label("typical_power"),
+        (func.sum(counts.c.thd_sum).over(**per_cluster) / func.sum(counts.c.sample_count).over(**per_cluster)).label("typical_thd"),
+        func.row_number().over(
+            partition_by=counts.c.cluster,
+            order_by=(counts.c.sample_count.desc(), counts.c.device_state)
+        ).label("rank")
+    ).subquery()
+
+    return select(
+        ranked.c.cluster, ranked.c.device_state, ranked.c.typical_power, ranked.c.typical_thd
+    ).where(ranked.c.rank == 1).order_by(ranked.c.cluster)
+
+def get_cluster_summaries(db: Optional[Session]):
+    version = data_version(db)
+    cached = summary_cache.get(version)
+    if cached is not None:
+        return cached
+
+    if columnar_store is not None:
+        rows = _cluster_summaries_from_store(columnar_store)
+    else:
+        rows = db.execute(_summary_query(db.scalar(select(RollupCoverage.covered_from)))).all()
+
+    summaries = [
         {
-            "id": row.cluster,
-            "name": cluster_to_device.get(row.cluster, f"Unknown Device (Cluster {row.cluster})"),
-            "cluster": row.cluster,
-            "typical_power": row.typical_power,
-            "typical_thd": row.typical_thd,
-            "description": "Identified device" if cluster_to_device.get(row.cluster) else "Unidentified device"
+            "id": cluster,
+            "name": device_state or f"Unknown Device (Cluster {cluster})",
+            "cluster": cluster,
+            "typical_power": typical_power,
+            "typical_thd": typical_thd,
+            "description": "Identified device" if device_state else "Unidentified device"
         }
-        for row in results
+        for cluster, device_state, typical_power, typical_thd in rows
     ]
+    summary_cache.set(version, summaries)
+    return summaries
+
+# Shared cache for /api/devices/
+summary_cache = SummaryCache(ttl_seconds=settings.DEVICE_SUMMARY_CACHE_TTL)
@@ -0,0 +1,289 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete, insert
+from app.config import settings
+from app.database import engine, insert_ignore
+from app.models.electrical_data import ElectricalData
+from app.models.energy import EnergyPeriod
+from app.services.rollup_service import lock_windows
+from app.utils.clock import to_naive_utc, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Calendar periods served; each is summed from the closed totals of a finer one, hours from samples
+PERIODS = ("hour", "day", "week", "month")
+_CHILD = {"day": "hour", "week": "day", "month": "day"}
+_FREQ = {"hour": "h", "day": "D", "week": "W-MON", "month": "MS"}
+
+# Periods returned when no start is given
+DEFAULT_COUNT = {"hour": 24, "day": 30, "week": 12, "month": 12}
+
+# {cluster: [energy_wh, sample_count]}
+Totals = Dict[int, List[float]]
+
+def period_start(value: datetime, period: str) -> pd.Timestamp:
+    """Start of the period containing value; weeks start on Monday"""
+    ts = pd.Timestamp(value)
+    if period == "hour":
+        return ts.floor("h")
+    day = ts.normalize()
+    if period == "week":
+        return day - pd.Timedelta(days=day.dayofweek)
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+def period_starts(start: datetime, end: datetime, period: str) -> pd.DatetimeIndex:
+    """Starts of the periods overlapping [start, end)"""
+    return pd.date_range(period_start(start, period), end, freq=_FREQ[period], inclusive="left")
+
+def period_end(start: pd.Timestamp, period: str) -> pd.Timestamp:
+    return start + pd.tseries.frequencies.to_offset(_FREQ[period])
+
+def integrate_hours(samples: pd.DataFrame, start: datetime, end: datetime, max_gap: float) -> pd.DataFrame:
+    """
+    Trapezoidal energy of real_power_watt per hour and cluster
+    Each interval between consecutive samples of a cluster counts in the hour of
+    the sample ending it, so only samples in [start, end) are counted; pass the
+    samples of the max_gap seconds before start as well so the first interval is
+    complete. Intervals longer than max_gap are not integrated.
+    Returns:
+        DataFrame indexed by (hour, cluster) with energy_wh and sample_count
+    """
+    samples = samples.sort_values(["cluster", "timestamp"], kind="stable")
+    clusters = samples["cluster"].to_numpy()
+    timestamps = samples["timestamp"].to_numpy("datetime64[ns]")
+    power = samples["real_power_watt"].to_numpy(np.float64)
+
+    elapsed = np.diff(timestamps.astype(np.int64)) / 1e9
+    valid = (clusters[1:] == clusters[:-1]) & (elapsed > 0) & (elapsed <= max_gap)
+    interval_wh = np.where(valid, (power[1:] + power[:-1]) / 2 * elapsed / 3600, 0.0)
+
+    counted = (timestamps >= np.datetime64(pd.Timestamp(start))) & (timestamps < np.datetime64(pd.Timestamp(end)))
+    frame = pd.DataFrame({
+        "hour": pd.DatetimeIndex(timestamps[counted]).floor("h"),
+        "cluster": clusters[counted],
+        "energy_wh": np.concatenate(([0.0], interval_wh))[counted],
+    })
+    return frame.groupby(["hour", "cluster"]).agg(
+        energy_wh=("energy_wh", "sum"), sample_count=("energy_wh", "size")
+    )
+
+def _add(target: Totals, totals: Totals) -> None:
+    for cluster, (energy_wh, sample_count) in totals.items():
+        current = target.setdefault(cluster, [0.0, 0])
+        current[0] += energy_wh
+        current[1] += sample_count
+
+def invalidate_periods(conn, timestamps: pd.Series, max_gap: Optional[float] = None) -> int:
+    """
+    Drop cached periods that new samples at these timestamps change
+    A sample also changes the interval ending at the next sample, up to max_gap later.
+    """
+    max_gap = settings.ENERGY_MAX_GAP_SECONDS if max_gap is None else max_gap
+    if timestamps.empty:
+        return 0
+    touched = pd.DatetimeIndex(pd.concat([timestamps, timestamps + pd.Timedelta(seconds=max_gap)])).floor("h").unique()
+    # Waits for queries caching these hours, see EnergyService._totals
+    lock_windows(conn, touched.min(), touched.max())
+    deleted = 0
+    for period in PERIODS:
+        starts = sorted({period_start(hour, period).to_pydatetime() for hour in touched})
+        for i in range(0, len(starts), 500):
+            deleted += conn.execute(
+                delete(EnergyPeriod).where(EnergyPeriod.period == period, EnergyPeriod.period_start.in_(starts[i:i + 500]))
+            ).rowcount
+    return deleted
+
+class EnergyService:
+    """
+    Energy totals per cluster and calendar period (UTC, like the stored samples)
+    Closed periods are computed once and kept in energy_periods: a month is the sum
+    of its days, a day of its hours, and only hours are integrated from samples.
+    A query therefore reads a handful of cached rows plus the samples of the
+    current hour. Ingest drops the cached periods that late samples change.
+    """
+
+    def __init__(self, max_gap: float, read_hours: int):
+        self.max_gap = max_gap
+        self.read_hours = read_hours
+        # (data version, totals) of the hours still open at the last query
+        self._open: Optional[tuple] = None
+        self._open_lock = threading.Lock()
+        self._stats = {"queries": 0, "cached_periods": 0, "computed_periods": 0, "integrated_hours": 0, "open_hits": 0}
+
+    def _read_samples(self, conn, start: datetime, end: datetime) -> pd.DataFrame:
+        # Imported here: the columnar store imports ingest_service, which invalidates periods
+        from app.services.columnar_store import columnar_store
+
+        columns = ["timestamp", "cluster", "real_power_watt"]
+        if columnar_store is not None:
+            samples = columnar_store.scan(start, end, columns=columns).to_pandas()
+            return samples[samples["timestamp"] < end]
+        return pd.read_sql(
+            select(*(getattr(ElectricalData, column) for column in columns))
+            .where(ElectricalData.timestamp >= start, ElectricalData.timestamp < end),
+            conn,
+            parse_dates=["timestamp"]
+        )
+
+    def _integrate(self, conn, hours: Sequence[pd.Timestamp]) -> Dict[pd.Timestamp, Totals]:
+        """Totals of the given hours, reading samples for runs of consecutive hours at a time"""
+        totals: Dict[pd.Timestamp, Totals] = {hour: {} for hour in hours}
+        gap = pd.Timedelta(seconds=self.max_gap)
+        run: List[pd.Timestamp] = []
+        for i, hour in enumerate(hours):
+            run.append(hour)
+            last = i == len(hours) - 1
+            if last or len(run) == self.read_hours or hours[i + 1] != hour + pd.Timedelta(hours=1):
+                start, end = run[0], run[-1] + pd.Timedelta(hours=1)
+                integrated = integrate_hours(self._read_samples(conn, start - gap, end), start, end, self.max_gap)
+                for (hour_start, cluster), row in zip(integrated.index, integrated.itertuples(index=False)):
+                    totals[hour_start][int(cluster)] = [float(row.energy_wh), int(row.sample_count)]
+                run = []
+        self._stats["integrated_hours"] += len(hours)
+        return totals
+
+    def _open_hours(self, conn, hours: Sequence[pd.Timestamp]) -> Dict[pd.Timestamp, Totals]:
+        """
+        Totals of hours still in progress, integrated once per data version
+        Concurrent queries wait for one integration instead of each reading the samples.
+        """
+        # Imported here: device_service imports the columnar store, see _read_samples
+        from app.services.device_service import data_version
+
+        if not hours:
+            return {}
+        version = data_version(conn)
+        with self._open_lock:
+            if self._open is not None and self._open[0] == version and set(hours) <= self._open[1].keys():
+                self._stats["open_hits"] += 1
+                return {hour: self._open[1][hour] for hour in hours}
+            totals = self._integrate(conn, hours)
+            self._open = (version, totals)
+            return totals
+
+    def _totals(self, conn, period: str, starts: pd.DatetimeIndex, now: datetime) -> Dict[pd.Timestamp, Totals]:
+        """Totals of the periods at starts: cached when closed, computed (and cached) otherwise"""
+        if not len(starts):
+            return {}
+        ends = starts + pd.tseries.frequencies.to_offset(_FREQ[period])
+        closed = set(starts[ends <= pd.Timestamp(now)])
+
+        cached: Dict[pd.Timestamp, Totals] = {}
+        if closed:
+            rows = conn.execute(
+                select(EnergyPeriod.period_start, EnergyPeriod.totals).where(
+                    EnergyPeriod.period == period,
+                    EnergyPeriod.period_start >= min(closed).to_pydatetime(),
+                    EnergyPeriod.period_start <= max(closed).to_pydatetime()
+                )
+            ).all()
+            cached = {
+                pd.Timestamp(start): {int(cluster): values for cluster, values in totals.items()}
+                for start, totals in rows if pd.Timestamp(start) in closed
+            }
+        needed = [start for start in starts if start not in cached]
+        if not needed:
+            self._stats["cached_periods"] += len(cached)
+            return cached
+
+        # Ingest invalidates under the same hour locks, so samples read from here on can't
+        # be made stale by a concurrent ingest before these periods are cached
+        closed_needed = [start for start in needed if start in closed]
+        if closed_needed:
+            lock_windows(conn, closed_needed[0], period_end(closed_needed[-1], period) - pd.Timedelta(hours=1))
+
+        if period == "hour":
+            computed = self._integrate(conn, [start for start in needed if start in closed])
+            computed.update(self._open_hours(conn, [start for start in needed if start not in closed]))
+        else:
+            child = _CHILD[period]
+            # Children of the open period stop at now; later ones have no samples yet
+            child_starts = pd.DatetimeIndex(np.concatenate([
+                period_starts(start, min(period_end(start, period), pd.Timestamp(now)), child) for start in needed
+            ]))
+            child_totals = self._totals(conn, child, child_starts, now)
+            computed = {start: {} for start in needed}
+            for child_start, totals in child_totals.items():
+                _add(computed[period_start(child_start, period)], totals)
+
+        new_rows = [
+            {
+                "period": period,
+                "period_start": start.to_pydatetime(),
+                "totals": {str(cluster): values for cluster, values in totals.items()},
+            }
+            for start, totals in computed.items() if start in closed
+        ]
+        if new_rows:
+            # Periods cached by a concurrent request meanwhile are left alone
+            statement = insert_ignore(conn.dialect.name, EnergyPeriod.__table__)
+            conn.execute(statement if statement is not None else insert(EnergyPeriod.__table__), new_rows)
+        self._stats["cached_periods"] += len(cached)
+        self._stats["computed_periods"] += len(computed)
+        return {**cached, **computed}
+
+    def totals(
+        self,
+        period: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        clusters: Optional[Iterable[int]] = None,
+        now: Optional[datetime] = None,
+        bind=None
+    ) -> List[Dict[str, Any]]:
+        """
+        Energy per cluster for each period overlapping [start, end)
+        Whole periods are reported, so start and end snap to period boundaries.
+        Timezone-aware start and end are converted to naive UTC like the samples.
+        Returns:
+            rows with period_start, cluster_id, energy_kwh, sample_count and complete
+            (false for the period still in progress)
+        """
+        if period not in PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+        now = to_naive_utc(now) or utcnow()
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        end = min(end, now) if end is not None else now
+        if start is None:
+            start = period_start(end, period) - (DEFAULT_COUNT[period] - 1) * pd.tseries.frequencies.to_offset(_FREQ[period])
+        wanted = set(clusters) if clusters is not None else None
+
+        with (bind if bind is not None else engine).begin() as conn:
+            totals = self._totals(conn, period, period_starts(start, end, period), now)
+        self._stats["queries"] += 1
+
+        now = pd.Timestamp(now)
+        return [
+            {
+                "period_start": start.to_pydatetime(),
+                "cluster_id": cluster,
+                "energy_kwh": round(energy_wh / 1000, 6),
+                "sample_count": sample_count,
+                "complete": period_end(start, period) <= now,
+            }
+            for start in sorted(totals)
+            for cluster, (energy_wh, sample_count) in sorted(totals[start].items())
+            if wanted is None or cluster in wanted
+        ]
+
+    def by_cluster(self, start: datetime, end: Optional[datetime] = None, bind=None) -> Dict[int, float]:
+        """kWh per cluster over the whole hours from start to end"""
+        energy: Dict[int, float] = {}
+        for row in self.totals("hour", start, end, bind=bind):
+            energy[row["cluster_id"]] = energy.get(row["cluster_id"], 0.0) + row["energy_kwh"]
+        return energy
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"max_gap_seconds": self.max_gap, **self._stats}
+
+# Shared energy service for the device endpoints and chat grounding
+energy_service = EnergyService(
+    max_gap=settings.ENERGY_MAX_GAP_SECONDS,
+    read_hours=settings.ENERGY_READ_HOURS
+)
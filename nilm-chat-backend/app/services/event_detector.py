@@ -0,0 +1,414 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, insert, update, delete, func
+from app.config import settings
+from app.database import engine
+from app.models.electrical_data import ElectricalData
+from app.models.device_event import DeviceEvent, EventDetectorCheckpoint
+from app.services.columnar_store import columnar_store
+from app.services.sample_tail import SampleTail
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "device_events"
+
+_SAMPLE_COLUMNS = ["timestamp", "cluster", "device_state", "real_power_watt"]
+
+@dataclass
+class OpenEvent:
+    """An on period still running at the end of the processed samples"""
+    cluster: int
+    device_state: str
+    started_at: datetime
+    ended_at: datetime
+    energy_wh: float
+    peak_power_watt: float
+    sample_count: int
+    power_sum: float
+    last_power_watt: float
+
+    def to_row(self, is_open: bool) -> Dict[str, Any]:
+        duration = (self.ended_at - self.started_at).total_seconds()
+        return {
+            "cluster": self.cluster,
+            "device_state": self.device_state,
+            "started_at": self.started_at,
+            "ended_at": self.ended_at,
+            "duration_seconds": duration,
+            "energy_wh": self.energy_wh,
+            "avg_power_watt": self.power_sum / self.sample_count,
+            "peak_power_watt": self.peak_power_watt,
+            "sample_count": self.sample_count,
+            "is_open": is_open,
+            "last_power_watt": self.last_power_watt if is_open else None,
+        }
+
+def _detect_cluster(
+    group: pd.DataFrame,
+    carried: Optional[OpenEvent],
+    on_watts: float,
+    off_watts: float,
+    max_gap: float
+) -> Tuple[List[OpenEvent], Optional[OpenEvent]]:
+    """Edge detection over one cluster's time-ordered samples; see detect_events"""
+    timestamps = group["timestamp"].to_numpy("datetime64[ns]")
+    seconds = timestamps.astype(np.int64) / 1e9
+    power = group["real_power_watt"].to_numpy(np.float64)
+
+    # Hysteresis: on at or above on_watts, off below off_watts, otherwise unchanged
+    level = pd.Series(np.where(power >= on_watts, 1.0, np.where(power < off_watts, 0.0, np.nan)))
+    on = level.ffill().fillna(1.0 if carried is not None else 0.0).to_numpy().astype(bool)
+
+    # Previous sample of each row; the first row continues from the carried event
+    previous_seconds = np.concatenate((
+        [pd.Timestamp(carried.ended_at).value / 1e9 if carried is not None else np.nan], seconds[:-1]
+    ))
+    previous_power = np.concatenate(([carried.last_power_watt if carried is not None else np.nan], power[:-1]))
+    previous_on = np.concatenate(([carried is not None], on[:-1]))
+    elapsed = seconds - previous_seconds
+    gap = elapsed > max_gap  # A silent meter ends the event at its last sample
+
+    starts = on & (~previous_on | gap)
+    continues = on & ~starts
+    segment = np.cumsum(starts)  # 0 only for rows continuing the carried event
+    interval_wh = np.where(continues, (power + previous_power) / 2 * elapsed / 3600, 0.0)
+
+    rows = pd.DataFrame({
+        "segment": segment[on],
+        "timestamp": timestamps[on],
+        "power": power[on],
+        "energy": interval_wh[on],
+        "device_state": group["device_state"].to_numpy()[on],
+    })
+    segments = rows.groupby("segment", sort=True).agg(
+        started_at=("timestamp", "first"),
+        ended_at=("timestamp", "last"),
+        energy_wh=("energy", "sum"),
+        peak_power_watt=("power", "max"),
+        sample_count=("power", "size"),
+        power_sum=("power", "sum"),
+        last_power_watt=("power", "last"),
+        device_state=("device_state", "first"),
+    )
+
+    events = []
+    for number, segment_row in zip(segments.index, segments.itertuples(index=False)):
+        event = OpenEvent(
+            cluster=int(group["cluster"].iloc[0]),
+            device_state=segment_row.device_state,
+            started_at=pd.Timestamp(segment_row.started_at).to_pydatetime(),
+            ended_at=pd.Timestamp(segment_row.ended_at).to_pydatetime(),
+            energy_wh=float(segment_row.energy_wh),
+            peak_power_watt=float(segment_row.peak_power_watt),
+            sample_count=int(segment_row.sample_count),
+            power_sum=float(segment_row.power_sum),
+            last_power_watt=float(segment_row.last_power_watt),
+        )
+        if number == 0:
+            # Rows that extend the event carried from the previous chunk
+            event.started_at = carried.started_at
+            event.device_state = carried.device_state
+            event.energy_wh += carried.energy_wh
+            event.peak_power_watt = max(event.peak_power_watt, carried.peak_power_watt)
+            event.sample_count += carried.sample_count
+            event.power_sum += carried.power_sum
+        events.append(event)
+
+    if carried is not None and (not events or segments.index[0] != 0):
+        events.insert(0, carried)  # Switched off (or went silent) before this chunk's first sample
+
+    # Only an event reaching the last sample can still be running
+    still_open = events.pop() if on[-1] and events else None
+    return events, still_open
+
+def detect_events(
+    samples: pd.DataFrame,
+    open_events: Dict[int, OpenEvent],
+    on_watts: float,
+    off_watts: float,
+    max_gap: float,
+    min_duration: float
+) -> Tuple[List[OpenEvent], Dict[int, OpenEvent]]:
+    """
+    Find on/off periods in a chunk of samples, continuing the events left open by the previous chunk
+    Edges come from array operations per cluster, not a loop over samples. Energy
+    is the trapezoidal integral of real_power_watt between consecutive on samples.
+    Samples at or before a cluster's open event are treated as already processed
+    (EventDetector re-detects clusters that receive such late samples). An open
+    event ends once the newest sample of any cluster is more than max_gap past it,
+    so a meter that goes silent doesn't leave its event open.
+    Returns:
+        (events that ended in this chunk, events still open keyed by cluster)
+    """
+    open_events = dict(open_events)
+    closed: List[OpenEvent] = []
+    if samples.empty:
+        return closed, open_events
+    samples = samples.sort_values(["cluster", "timestamp"], kind="stable")
+    for cluster, group in samples.groupby("cluster", sort=False):
+        carried = open_events.pop(int(cluster), None)
+        if carried is not None:
+            group = group[group["timestamp"] > pd.Timestamp(carried.ended_at)]
+        if group.empty:
+            if carried is not None:
+                open_events[int(cluster)] = carried
+            continue
+
+        ended, still_open = _detect_cluster(group, carried, on_watts, off_watts, max_gap)
+        closed.extend(
+            event for event in ended
+            if (event.ended_at - event.started_at).total_seconds() >= min_duration
+        )
+        if still_open is not None:
+            open_events[int(cluster)] = still_open
+
+    silent_since = pd.Timestamp(samples["timestamp"].max()) - pd.Timedelta(seconds=max_gap)
+    for cluster, event in list(open_events.items()):
+        if pd.Timestamp(event.ended_at) < silent_since:
+            del open_events[cluster]
+            if (event.ended_at - event.started_at).total_seconds() >= min_duration:
+                closed.append(event)
+    return closed, open_events
+
+def latest_events(db, clusters: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, Any]]:
+    """
+    Most recent event of each cluster, keyed by cluster
+    Args:
+        db: sync Session or Connection (use AsyncSession.run_sync from async code)
+    """
+    newest = select(DeviceEvent.cluster, func.max(DeviceEvent.started_at).label("started_at")).group_by(DeviceEvent.cluster)
+    if clusters is not None:
+        newest = newest.where(DeviceEvent.cluster.in_(list(clusters)))
+    newest = newest.subquery()
+    rows = db.execute(
+        select(DeviceEvent.__table__)
+        .join(newest, (DeviceEvent.cluster == newest.c.cluster) & (DeviceEvent.started_at == newest.c.started_at))
+        .order_by(DeviceEvent.id)
+    ).mappings().all()
+    return {row["cluster"]: dict(row) for row in rows}
+
+def describe_event(event: Dict[str, Any]) -> str:
+    """One line for the chat grounding, e.g. 'on since 14:02 (35 min, 0.41 kWh so far)'"""
+    minutes = event["duration_seconds"] / 60
+    kwh = event["energy_wh"] / 1000
+    if event["is_open"]:
+        return f"on since {event['started_at']:%Y-%m-%d %H:%M} ({minutes:.0f} min, {kwh:.2f} kWh so far)"
+    return (
+        f"last on {event['started_at']:%Y-%m-%d %H:%M} to {event['ended_at']:%H:%M} "
+        f"({minutes:.0f} min, {kwh:.2f} kWh)"
+    )
+
+class _CheckpointMoved(Exception):
+    """Another process advanced the checkpoint first"""
+
+class EventDetector:
+    """
+    Tails the stored samples and keeps device_events up to date
+    Open events are stored with is_open and rewritten on every run, so detection
+    resumes exactly where it stopped after a restart. The checkpoint is advanced
+    with a compare-and-set, which lets several workers run the detector safely.
+    """
+
+    def __init__(self, on_watts: float, off_watts: float, max_gap: float, min_duration: float, interval: float, batch_size: int, tail_lookback: int = 10000):
+        self.on_watts = on_watts
+        self.off_watts = off_watts
+        self.max_gap = max_gap
+        self.min_duration = min_duration
+        self.interval = interval
+        self.batch_size = batch_size
+        self.tail_lookback = tail_lookback
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"runs": 0, "samples": 0, "events": 0, "replays": 0, "conflicts": 0, "failures": 0}
+
+    def _detect(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        open_events: Dict[int, OpenEvent],
+        horizons: Dict[int, datetime]
+    ) -> Tuple[List[OpenEvent], Dict[int, OpenEvent], int, Dict[int, datetime]]:
+        """
+        Detect events in new samples, setting aside clusters that got samples from
+        before the end of their latest stored event (backfills, late commits)
+        Returns:
+            (closed events, open events, samples read, earliest late sample per set-aside cluster)
+        """
+        closed, samples = [], 0
+        late: Dict[int, datetime] = {}
+        for chunk in chunks:
+            samples += len(chunk)
+            if horizons:
+                horizon = chunk["cluster"].map(horizons)
+                is_late = (chunk["timestamp"] < horizon).to_numpy()
+                for cluster, first in chunk[is_late].groupby("cluster")["timestamp"].min().items():
+                    late[int(cluster)] = min(late.get(int(cluster), first), first)
+                # A sample at the horizon is the event's own last sample read again
+                chunk = chunk[~(is_late | (chunk["timestamp"] == horizon).to_numpy())]
+            # Late clusters are re-detected from their stored samples instead
+            chunk = chunk[~chunk["cluster"].isin(list(late))]
+            chunk_closed, open_events = detect_events(
+                chunk, open_events, self.on_watts, self.off_watts, self.max_gap, self.min_duration
+            )
+            closed.extend(chunk_closed)
+        return closed, open_events, samples, late
+
+    def _read_cluster(self, conn, cluster: int, since: datetime, position: Optional[str]) -> pd.DataFrame:
+        """Samples of one cluster from since up to the checkpoint position"""
+        if columnar_store is not None:
+            return columnar_store.scan(since, None, clusters=[cluster], columns=_SAMPLE_COLUMNS).to_pandas()
+        tail = SampleTail.parse(position, self.tail_lookback)
+        return pd.read_sql(
+            select(*(getattr(ElectricalData, column) for column in _SAMPLE_COLUMNS))
+            .where(ElectricalData.cluster == cluster, ElectricalData.timestamp >= since, ~tail.condition()),
+            conn,
+            parse_dates=["timestamp"]
+        )
+
+    def _replay(self, conn, cluster: int, first_late: datetime, position: Optional[str]) -> Tuple[List[OpenEvent], Dict[int, OpenEvent]]:
+        """
+        Re-detect a cluster's events from its earliest late sample on
+        Events ending within max_gap before that sample could absorb it, so they are
+        deleted and re-detected too, starting from the first of them.
+        """
+        affected = (DeviceEvent.cluster == cluster) & (DeviceEvent.ended_at >= first_late - timedelta(seconds=self.max_gap))
+        since = conn.scalar(select(func.min(DeviceEvent.started_at)).where(affected))
+        since = min(since, first_late) if since is not None else first_late
+        conn.execute(delete(DeviceEvent).where(affected))
+        self._stats["replays"] += 1
+        return detect_events(
+            self._read_cluster(conn, cluster, since, position), {},
+            self.on_watts, self.off_watts, self.max_gap, self.min_duration
+        )
+
+    def _new_samples(self, conn, position: Optional[str]) -> Tuple[Iterable[pd.DataFrame], Optional[str]]:
+        """Samples after the checkpoint, and the checkpoint after them"""
+        if columnar_store is not None:
+            if not position:
+                # First run: the whole history, including compacted files
+                newest = columnar_store.newest_part(recent_partitions=0)
+                batches = columnar_store.iter_batches(None, None, None, _SAMPLE_COLUMNS, self.batch_size)
+                return (batch.to_pandas() for batch in batches), newest or None
+            table, newest = columnar_store.read_new_parts(position)
+            return ([table.select(_SAMPLE_COLUMNS).to_pandas()] if table is not None else []), newest
+
+        tail = SampleTail.parse(position, self.tail_lookback)
+        chunk = pd.read_sql(
+            select(ElectricalData.id, *(getattr(ElectricalData, column) for column in _SAMPLE_COLUMNS))
+            .where(tail.condition())
+            .order_by(ElectricalData.id)
+            .limit(self.batch_size),
+            conn,
+            parse_dates=["timestamp"]
+        )
+        if chunk.empty:
+            return [], position
+        tail.advance(chunk["id"].tolist())
+        return [chunk.drop(columns="id")], str(tail)
+
+    def _run_batch(self, bind) -> int:
+        """Process one batch in one transaction; returns the number of samples processed"""
+        with bind.begin() as conn:
+            position = conn.scalar(
+                select(EventDetectorCheckpoint.position).where(EventDetectorCheckpoint.name == CHECKPOINT_NAME)
+            )
+            chunks, new_position = self._new_samples(conn, position)
+            if new_position == position:
+                return 0
+
+            open_rows = conn.execute(select(DeviceEvent).where(DeviceEvent.is_open.is_(True))).mappings().all()
+            open_events = {
+                row["cluster"]: OpenEvent(
+                    cluster=row["cluster"],
+                    device_state=row["device_state"],
+                    started_at=row["started_at"],
+                    ended_at=row["ended_at"],
+                    energy_wh=row["energy_wh"],
+                    peak_power_watt=row["peak_power_watt"],
+                    sample_count=row["sample_count"],
+                    power_sum=row["avg_power_watt"] * row["sample_count"],
+                    last_power_watt=row["last_power_watt"],
+                )
+                for row in open_rows
+            }
+            horizons = dict(conn.execute(
+                select(DeviceEvent.cluster, func.max(DeviceEvent.ended_at)).group_by(DeviceEvent.cluster)
+            ).all())
+            closed, open_events, samples, late = self._detect(chunks, open_events, horizons)
+            for cluster, first_late in late.items():
+                open_events.pop(cluster, None)
+                replay_closed, replay_open = self._replay(conn, cluster, pd.Timestamp(first_late).to_pydatetime(), new_position)
+                closed.extend(replay_closed)
+                open_events.update(replay_open)
+                logger.info(f"Re-detected events of cluster {cluster} from {first_late} after late samples")
+
+            if position is None:
+                conn.execute(insert(EventDetectorCheckpoint).values(name=CHECKPOINT_NAME, position=new_position))
+            else:
+                moved = conn.execute(
+                    update(EventDetectorCheckpoint)
+                    .where(EventDetectorCheckpoint.name == CHECKPOINT_NAME, EventDetectorCheckpoint.position == position)
+                    .values(position=new_position)
+                ).rowcount
+                if not moved:
+                    raise _CheckpointMoved()
+
+            conn.execute(delete(DeviceEvent).where(DeviceEvent.is_open.is_(True)))
+            rows = [event.to_row(is_open=False) for event in closed]
+            rows += [event.to_row(is_open=True) for event in open_events.values()]
+            if rows:
+                conn.execute(insert(DeviceEvent), rows)
+
+        self._stats["samples"] += samples
+        self._stats["events"] += len(closed)
+        return samples
+
+    def run_until_current(self, bind=None) -> int:
+        """Process batches until no new samples are left; returns the number of samples processed"""
+        bind = bind if bind is not None else engine
+        processed = 0
+        try:
+            while True:
+                samples = self._run_batch(bind)
+                if not samples:
+                    break
+                processed += samples
+        except _CheckpointMoved:
+            self._stats["conflicts"] += 1  # The other process does the work
+        self._stats["runs"] += 1
+        return processed
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.run_until_current)
+            except Exception as e:
+                self._stats["failures"] += 1
+                logger.error(f"Event detection failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"interval": self.interval, **self._stats}
+
+# Background event detection started by the app
+event_detector = EventDetector(
+    on_watts=settings.EVENT_ON_WATTS,
+    off_watts=settings.EVENT_OFF_WATTS,
+    max_gap=settings.EVENT_MAX_GAP_SECONDS,
+    min_duration=settings.EVENT_MIN_SECONDS,
+    interval=settings.EVENT_DETECTION_INTERVAL,
+    batch_size=settings.EVENT_DETECTION_BATCH,
+    tail_lookback=settings.SAMPLE_TAIL_LOOKBACK
+)
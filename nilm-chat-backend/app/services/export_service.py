@@ -0,0 +1,132 @@
+import io
+import csv
+import json
+import logging
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence
+from sqlalchemy import select
+from app.database import engine
+from app.models.electrical_data import ElectricalData
+from app.services.ingest_service import INSERT_COLUMNS
+from app.services.columnar_store import columnar_store
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+def export_columns() -> List[str]:
+    """Columns that can be exported from the active storage backend"""
+    # Columnar files have no surrogate id
+    return list(INSERT_COLUMNS) if columnar_store is not None else ["id"] + INSERT_COLUMNS
+
+def _arrow_type(column: str):
+    if column == "timestamp":
+        return pa.timestamp("us")
+    if column in ("id", "cluster"):
+        return pa.int64()
+    if column == "device_state":
+        return pa.string()
+    return pa.float64()
+
+def _sql_batches(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    clusters: Optional[Sequence[int]],
+    columns: Sequence[str],
+    batch_size: int
+) -> Iterator[List[tuple]]:
+    """Rows in timestamp order, fetched batch_size at a time through a streaming cursor"""
+    query = select(*(getattr(ElectricalData, column) for column in columns))
+    if start is not None:
+        query = query.where(ElectricalData.timestamp >= start)
+    if end is not None:
+        query = query.where(ElectricalData.timestamp <= end)
+    if clusters:
+        query = query.where(ElectricalData.cluster.in_(clusters))
+    query = query.order_by(ElectricalData.timestamp, ElectricalData.id)
+
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for partition in result.partitions():
+            yield partition
+
+def _store_batches(
+    start: Optional[datetime],
+    end: Optional[datetime],
+    clusters: Optional[Sequence[int]],
+    columns: Sequence[str],
+    batch_size: int
+) -> Iterator[List[tuple]]:
+    for batch in columnar_store.iter_batches(start, end, clusters, columns, batch_size):
+        yield list(zip(*(batch.column(column).to_pylist() for column in columns)))
+
+def _encode_ndjson(batches: Iterator[List[tuple]], columns: Sequence[str]) -> Iterator[str]:
+    timestamp_index = columns.index("timestamp") if "timestamp" in columns else None
+    for rows in batches:
+        lines = []
+        for row in rows:
+            record = dict(zip(columns, row))
+            if timestamp_index is not None:
+                record["timestamp"] = row[timestamp_index].isoformat()
+            lines.append(json.dumps(record))
+        yield "\n".join(lines) + "\n"
+
+def _encode_csv(batches: Iterator[List[tuple]], columns: Sequence[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+def _encode_arrow(batches: Iterator[List[tuple]], columns: Sequence[str]) -> Iterator[bytes]:
+    schema = pa.schema([(column, _arrow_type(column)) for column in columns])
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, schema) as writer:
+        for rows in batches:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            # Hand each batch to the client and reuse the buffer
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()  # End-of-stream marker
+
+def export_rows(
+    format: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    clusters: Optional[Sequence[int]] = None,
+    columns: Optional[Sequence[str]] = None,
+    batch_size: int = 10000
+) -> Iterator:
+    """
+    Stream ElectricalData in [start, end] as NDJSON, CSV or Arrow IPC chunks
+    Only one batch of rows is held in memory at a time, whatever the range.
+    """
+    columns = list(columns or export_columns())
+    if columnar_store is not None:
+        batches = _store_batches(start, end, clusters, columns, batch_size)
+    else:
+        batches = _sql_batches(start, end, clusters, columns, batch_size)
+
+    if format == "csv":
+        return _encode_csv(batches, columns)
+    if format == "arrow":
+        if pa is None:
+            raise ImportError("arrow export requires pyarrow: pip install pyarrow")
+        return _encode_arrow(batches, columns)
+    return _encode_ndjson(batches, columns)
@@ -0,0 +1,92 @@
+import time
+import asyncio
+from datetime import timedelta
+import logging
+from typing import Any, Dict, List, Optional
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.services.data_service import get_actual_devices
+from app.services.columnar_store import columnar_store
+from app.services.event_detector import latest_events
+from app.services.energy_service import energy_service
+from app.utils.clock import utcnow
+
+logger = logging.getLogger(__name__)
+
+class GroundingContextProvider:
+    """
+    Device list used to ground chat answers, computed once per time bucket
+    Concurrent requests in a new bucket share a single query (single-flight),
+    so the per-message database cost is a dictionary lookup.
+    """
+
+    def __init__(self, bucket_seconds: float, hours: int):
+        self.bucket_seconds = bucket_seconds
+        self.hours = hours
+        self._bucket: Optional[int] = None
+        self._devices: List[Dict[str, Any]] = []
+        self._inflight: Optional[asyncio.Task] = None
+        self._stats = {"hits": 0, "loads": 0, "shared": 0, "failures": 0}
+
+    def _current_bucket(self) -> int:
+        if self.bucket_seconds <= 0:
+            return time.monotonic_ns()  # Caching disabled: every call is a new bucket
+        return int(time.time() // self.bucket_seconds)
+
+    async def _load(self) -> List[Dict[str, Any]]:
+        async with AsyncSessionLocal() as session:
+            if columnar_store is not None:
+                devices = await asyncio.to_thread(get_actual_devices, None, self.hours)
+            else:
+                devices = await session.run_sync(get_actual_devices, self.hours)
+            # Detected on/off events say when each device ran, without scanning samples
+            events = await session.run_sync(latest_events, [d["cluster_id"] for d in devices])
+        # Energy over the same window, mostly from cached closed hours
+        energy = await asyncio.to_thread(energy_service.by_cluster, utcnow() - timedelta(hours=self.hours))
+        return [
+            {**d, "last_event": events.get(d["cluster_id"]), "energy_kwh": round(energy.get(d["cluster_id"], 0.0), 3)}
+            for d in devices
+        ]
+
+    async def get(self) -> List[Dict[str, Any]]:
+        """Devices active in the last `hours`, as of the current bucket"""
+        bucket = self._current_bucket()
+        if self._bucket == bucket:
+            self._stats["hits"] += 1
+            return self._devices
+
+        if self._inflight is None:
+            self._inflight = asyncio.get_running_loop().create_task(self._refresh(bucket))
+        else:
+            self._stats["shared"] += 1
+        # A caller that goes away must not cancel the load other requests wait for
+        return await asyncio.shield(self._inflight)
+
+    async def _refresh(self, bucket: int) -> List[Dict[str, Any]]:
+        try:
+            devices = await self._load()
+        except Exception:
+            self._stats["failures"] += 1
+            raise
+        finally:
+            self._inflight = None
+        self._stats["loads"] += 1
+        self._devices, self._bucket = devices, bucket
+        return devices
+
+    def invalidate(self) -> None:
+        """Recompute on the next request, e.g. after ingesting new samples"""
+        self._bucket = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "bucket_seconds": self.bucket_seconds,
+            "devices": len(self._devices),
+            **self._stats
+        }
+
+# Shared grounding context for LLMService
+grounding_provider = GroundingContextProvider(
+    bucket_seconds=settings.GROUNDING_BUCKET_SECONDS,
+    hours=settings.GROUNDING_WINDOW_HOURS
+)
@@ -0,0 +1,189 @@
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import torch
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "torch-int8", "onnx", "stub")
+
+# The stub model's answer; its words are the stub tokenizer's whole vocabulary
+STUB_REPLY = "Based on the active devices listed above , the highest consumer is using the most power right now ."
+
+class BackendStats:
+    """Load cost and running throughput for the loaded inference backend"""
+
+    def __init__(self, backend: str, load_seconds: float, model_bytes: Optional[int], rss_delta_bytes: Optional[int]):
+        self.backend = backend
+        self.load_seconds = load_seconds
+        self.model_bytes = model_bytes
+        self.rss_delta_bytes = rss_delta_bytes
+        self._lock = threading.Lock()
+        self.generated_tokens = 0
+        self.generation_seconds = 0.0
+
+    def record_generation(self, tokens: int, seconds: float) -> None:
+        with self._lock:
+            self.generated_tokens += tokens
+            self.generation_seconds += seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            tokens_per_second = (
+                self.generated_tokens / self.generation_seconds
+                if self.generation_seconds else 0.0
+            )
+            return {
+                "backend": self.backend,
+                "load_seconds": round(self.load_seconds, 3),
+                "model_bytes": self.model_bytes,
+                "rss_delta_bytes": self.rss_delta_bytes,
+                "generated_tokens": self.generated_tokens,
+                "generation_seconds": round(self.generation_seconds, 3),
+                "tokens_per_second": round(tokens_per_second, 2)
+            }
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux only)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _tensor_bytes(value) -> int:
+    if isinstance(value, torch.Tensor):
+        return value.numel() * value.element_size()
+    if isinstance(value, (tuple, list)):
+        # Dynamically quantized Linear layers keep (weight, bias) packed in a tuple
+        return sum(_tensor_bytes(v) for v in value)
+    return 0
+
+def _model_bytes(model) -> Optional[int]:
+    if not isinstance(model, torch.nn.Module):
+        return None
+    return sum(_tensor_bytes(v) for v in model.state_dict().values())
+
+def _load_torch(model_name: str, device: torch.device):
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    return model.to(device).eval()
+
+def _load_torch_int8(model_name: str, device: torch.device):
+    if device.type != "cpu":
+        raise ValueError("torch-int8 backend only runs on CPU")
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name).eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _load_onnx(model_name: str, device: torch.device, num_threads: int):
+    try:
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError:
+        raise ImportError(
+            "onnx backend requires optional packages: pip install optimum[onnxruntime]"
+        )
+
+    session_options = onnxruntime.SessionOptions()
+    if num_threads > 0:
+        session_options.intra_op_num_threads = num_threads
+    provider = "CUDAExecutionProvider" if device.type == "cuda" else "CPUExecutionProvider"
+    return ORTModelForSeq2SeqLM.from_pretrained(
+        model_name,
+        export=True,
+        provider=provider,
+        session_options=session_options
+    )
+
+class StubSeq2SeqModel:
+    """
+    Stand-in for the seq2seq model: a fixed answer at a fixed cost per generated token
+    Needs no weights or downloads, so benchmarks and tests can run the real
+    batching, streaming and executor paths with a predictable model cost.
+    A batch costs the same as one prompt, as on a saturated accelerator.
+    """
+
+    def __init__(self, reply_ids: List[int], pad_token_id: int, eos_token_id: int, token_seconds: float):
+        self.reply_ids = reply_ids
+        self.pad_token_id = pad_token_id
+        self.eos_token_id = eos_token_id
+        self.token_seconds = token_seconds
+
+    def generate(self, input_ids, attention_mask=None, max_new_tokens: int = 20, streamer=None, stopping_criteria=None, **kwargs):
+        batch = input_ids.shape[0]
+        # Like encoder-decoder models, output starts with the decoder start (pad) token
+        output = [self.pad_token_id]
+        if streamer is not None:
+            streamer.put(torch.tensor([output]))
+        for token in (self.reply_ids + [self.eos_token_id])[:max_new_tokens]:
+            time.sleep(self.token_seconds)
+            output.append(token)
+            if streamer is not None:
+                streamer.put(torch.tensor([token]))
+            if stopping_criteria is not None and bool(stopping_criteria(torch.tensor([output] * batch), None).all()):
+                break
+        if streamer is not None:
+            streamer.end()
+        return torch.tensor([output] * batch)
+
+def _load_stub():
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    words = sorted(set(STUB_REPLY.split()))
+    vocab = {"<pad>": 0, "</s>": 1, "<unk>": 2, **{word: i + 3 for i, word in enumerate(words)}}
+    word_level = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    word_level.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=word_level, pad_token="<pad>", eos_token="</s>", unk_token="<unk>"
+    )
+    model = StubSeq2SeqModel(
+        reply_ids=[vocab[word] for word in STUB_REPLY.split()],
+        pad_token_id=tokenizer.pad_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+        token_seconds=settings.STUB_TOKEN_LATENCY_MS / 1000
+    )
+    return model, tokenizer
+
+def load_backend(backend: str, model_name: str, device: torch.device, num_threads: int = 0) -> Tuple[Any, Any, BackendStats]:
+    """
+    Load tokenizer and model for the selected inference backend
+    Args:
+        backend: one of BACKENDS
+        num_threads: intra-op threads for torch/onnxruntime (0 keeps the library default)
+    Returns:
+        (model, tokenizer, stats)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+
+    rss_before = _rss_bytes()
+    started = time.perf_counter()
+
+    if backend == "stub":
+        model, tokenizer = _load_stub()
+    else:
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if backend == "torch":
+            model = _load_torch(model_name, device)
+        elif backend == "torch-int8":
+            model = _load_torch_int8(model_name, device)
+        else:
+            model = _load_onnx(model_name, device, num_threads)
+
+    load_seconds = time.perf_counter() - started
+    rss_after = _rss_bytes()
+    stats = BackendStats(
+        backend=backend,
+        load_seconds=load_seconds,
+        model_bytes=_model_bytes(model),
+        rss_delta_bytes=rss_after - rss_before if rss_before is not None and rss_after is not None else None
+    )
+    logger.info(f"Loaded {model_name} with {backend} backend in {load_seconds:.1f}s")
+    return model, tokenizer, stats
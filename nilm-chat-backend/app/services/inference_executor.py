@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from fastapi import HTTPException, status
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class InferenceExecutor:
+    """Run blocking model calls on a dedicated worker pool with a bounded queue"""
+
+    def __init__(self, max_workers: int, max_queue_size: int, timeout: float):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.timeout = timeout
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0  # Jobs running or waiting for a worker
+        self._stats = {"submitted": 0, "completed": 0, "rejected": 0, "timed_out": 0}
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="inference"
+            )
+        return self._pool
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._stats["completed"] += 1
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """
+        Run fn(*args) on the worker pool without blocking the event loop
+        Raises:
+            HTTPException 503 when the queue is full, 504 when the job times out
+        """
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue_size:
+                self._stats["rejected"] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="AI service is busy, please retry shortly",
+                    headers={"Retry-After": "5"}
+                )
+            self._pending += 1
+            self._stats["submitted"] += 1
+
+        # The slot is released when the worker finishes (or the job is cancelled
+        # before it starts), not when the caller gives up waiting.
+        future = self._get_pool().submit(fn, *args)
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout=timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats["timed_out"] += 1
+            logger.warning("Inference job timed out")
+            raise HTTPException(
+                status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                detail="AI service timed out"
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_size": self.max_queue_size,
+                "pending": self._pending,
+                **self._stats
+            }
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+# Shared executor used by the LLM service
+inference_executor = InferenceExecutor(
+    max_workers=settings.INFERENCE_WORKERS,
+    max_queue_size=settings.INFERENCE_QUEUE_SIZE,
+    timeout=settings.INFERENCE_TIMEOUT
+)
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from fastapi import HTTPException, status
+from app.config import settings
+from app.database import engine
+from app.services.ingest_service import DEDUP_COLUMNS, ingest_frame
+from app.services.live_metrics import live_metrics
+
+logger = logging.getLogger(__name__)
+
+class IngestBuffer:
+    """
+    In-memory buffer between the ingest API and the database
+    Accepted samples are written by a single flusher per worker once flush_rows
+    are buffered or flush_interval seconds have passed, one transaction per flush.
+    Buffered plus in-flight rows never exceed max_pending_rows; beyond that
+    submissions are refused with 503 so meters back off instead of the worker
+    growing without bound. A failed flush puts its rows back in the buffer and
+    is retried with exponential backoff up to max_retry_delay seconds.
+    """
+
+    def __init__(self, flush_rows: int, flush_interval: float, max_pending_rows: int, max_retry_delay: float = 30.0):
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_pending_rows = max_pending_rows
+        self.max_retry_delay = max_retry_delay
+        self._retry_delay = 0.0  # Backoff after failed flushes, 0 while writes succeed
+        self._frames: List[pd.DataFrame] = []
+        self._buffered = 0
+        self._inflight = 0
+        self._batch: Optional[asyncio.Future] = None  # Resolved with the inserted count of the next flush
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats = {"accepted": 0, "rejected": 0, "inserted": 0, "flushes": 0, "failures": 0, "retried_rows": 0}
+
+    def _ensure_flusher(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or a new event loop (tests): tasks from the old loop are gone
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._batch = None
+            self._flusher = None
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush_loop())
+
+    async def submit(self, df: pd.DataFrame, wait: bool = False) -> Optional[int]:
+        """
+        Buffer a prepared frame
+        Returns:
+            With wait, the number of rows inserted by the flush that wrote it; otherwise None
+        Raises:
+            HTTPException 503 when the buffer is full, or with wait when the flush
+            failed (the rows stay buffered and are retried)
+        """
+        if self._buffered + self._inflight + len(df) > self.max_pending_rows:
+            self._stats["rejected"] += len(df)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Ingest buffer is full, please retry shortly",
+                headers={"Retry-After": "1"}
+            )
+
+        self._ensure_flusher()
+        if self._batch is None:
+            self._batch = self._loop.create_future()
+        batch = self._batch
+        self._frames.append(df)
+        self._buffered += len(df)
+        self._stats["accepted"] += len(df)
+        if self._buffered >= self.flush_rows:
+            self._wakeup.set()
+
+        if wait:
+            return await asyncio.shield(batch)
+        return None
+
+    async def _flush_loop(self) -> None:
+        while True:
+            if self._retry_delay:
+                # Backing off: a full buffer doesn't bring the retry forward
+                await asyncio.sleep(self._retry_delay)
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _write(self, df: pd.DataFrame) -> int:
+        with engine.begin() as conn:
+            return ingest_frame(conn, df)
+
+    async def flush(self) -> int:
+        """Write everything buffered so far in one transaction"""
+        if not self._frames:
+            return 0
+        frames, batch = self._frames, self._batch
+        self._frames, self._batch = [], None
+        rows, self._buffered = self._buffered, 0
+        self._inflight += rows
+
+        # Requests may repeat samples; one batch can hold each (timestamp, cluster) only once
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(subset=DEDUP_COLUMNS)
+        try:
+            inserted = await asyncio.to_thread(self._write, df)
+        except Exception as e:
+            # Keep the rows (ahead of newer ones) for the next attempt; they still count
+            # against max_pending_rows, so a long outage ends in 503s rather than lost data
+            self._frames.insert(0, df)
+            self._buffered += len(df)
+            self._stats["failures"] += 1
+            self._stats["retried_rows"] += len(df)
+            self._retry_delay = min(self.max_retry_delay, max(self.flush_interval, self._retry_delay * 2))
+            logger.error(f"Ingest flush of {len(df)} rows failed, retrying in {self._retry_delay:.1f}s: {str(e)}")
+            if batch is not None and not batch.done():
+                batch.set_exception(HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Samples are buffered but could not be written yet, please retry shortly",
+                    headers={"Retry-After": str(max(1, round(self._retry_delay)))}
+                ))
+                batch.exception()  # Nobody may be waiting; mark it retrieved
+            return 0
+        finally:
+            self._inflight -= rows
+
+        self._retry_delay = 0.0
+        self._stats["inserted"] += inserted
+        self._stats["flushes"] += 1
+        # Samples the database skipped as duplicates are skipped by the live window too
+        live_metrics.publish(zip(
+            df['timestamp'].dt.to_pydatetime().tolist(),
+            df['cluster'].tolist(),
+            df['real_power_watt'].tolist(),
+            df['power_factor'].tolist(),
+            df['thd'].tolist()
+        ))
+        if batch is not None and not batch.done():
+            batch.set_result(inserted)
+        return inserted
+
+    async def stop(self) -> None:
+        """Write what is still buffered and stop the flusher"""
+        await self.flush()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "buffered_rows": self._buffered,
+            "inflight_rows": self._inflight,
+            "max_pending_rows": self.max_pending_rows,
+            "retry_delay": self._retry_delay,
+            **self._stats
+        }
+
+# Shared ingest buffer for this worker
+ingest_buffer = IngestBuffer(
+    flush_rows=settings.INGEST_FLUSH_ROWS,
+    flush_interval=settings.INGEST_FLUSH_INTERVAL,
+    max_pending_rows=settings.INGEST_MAX_PENDING_ROWS
+)
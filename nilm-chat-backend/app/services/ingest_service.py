@@ -0,0 +1,272 @@
+import io
+import logging
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, insert, inspect, select, text
+from app.database import insert_ignore
+from app.models.electrical_data import ElectricalData
+from app.services.rollup_service import refresh_rollups, merge_rollups, rebuild_rollups
+from app.services.energy_service import invalidate_periods
+
+logger = logging.getLogger(__name__)
+
+# CSV header -> ElectricalData column. Captures use either spelling for real power in watts.
+CSV_COLUMNS = {
+    'DateTime': 'timestamp',
+    'Voltage': 'voltage',
+    'Current': 'current',
+    'Real Power': 'real_power',
+    'Reactive Power': 'reactive_power',
+    'Apparent Power': 'apparent_power',
+    'Power Factor': 'power_factor',
+    'Frequency': 'frequency',
+    'THD': 'thd',
+    'Real Power (Watt)': 'real_power_watt',
+    'Real Power (W)': 'real_power_watt',
+    'Cluster': 'cluster',
+    'Device_State': 'device_state',
+}
+
+CSV_DTYPES = {
+    'Voltage': 'float32',
+    'Current': 'float32',
+    'Real Power': 'float32',
+    'Reactive Power': 'float32',
+    'Apparent Power': 'float32',
+    'Power Factor': 'float32',
+    'Frequency': 'float32',
+    'THD': 'float32',
+    'Real Power (Watt)': 'float32',
+    'Real Power (W)': 'float32',
+    'Cluster': 'int32',
+    'Device_State': 'string',
+}
+
+# Natural key of a sample; backed by the ux_timestamp_cluster unique index
+DEDUP_COLUMNS = ['timestamp', 'cluster']
+
+# Single-column indexes replaced by ix_timestamp_id and ix_cluster_timestamp_id
+STALE_INDEXES = ['ix_timestamp', 'ix_cluster']
+
+# Columns written on insert, in table order
+INSERT_COLUMNS = [
+    'timestamp', 'voltage', 'current', 'real_power', 'reactive_power',
+    'apparent_power', 'power_factor', 'frequency', 'thd',
+    'real_power_watt', 'cluster', 'device_state',
+]
+
+# Nullable columns; a sample is only dropped for missing values elsewhere
+OPTIONAL_COLUMNS = ['frequency']
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Rename CSV columns to model columns, clean and validate a chunk without per-row Python"""
+    df = df.rename(columns=CSV_COLUMNS)
+    missing = [column for column in INSERT_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"CSV is missing columns: {missing}")
+    df = df[INSERT_COLUMNS]
+
+    # Clean and validate data
+    df = df.assign(device_state=df['device_state'].str.strip())
+    df = df.replace([np.inf, -np.inf], np.nan)
+    df = df.dropna(subset=[column for column in INSERT_COLUMNS if column not in OPTIONAL_COLUMNS])  # drop rows with missing values
+
+    df = df.assign(
+        power_factor=df['power_factor'].clip(-1, 1),
+        frequency=df['frequency'].clip(45, 55),
+        cluster=df['cluster'].astype('int64'),
+    )
+    return df.drop_duplicates(subset=DEDUP_COLUMNS)
+
+def frame_to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convert a prepared frame to executemany parameters with native Python values"""
+    columns = [
+        df[column].dt.to_pydatetime().tolist() if column == 'timestamp'
+        else df[column].astype(object).where(df[column].notna(), None).tolist() if column in OPTIONAL_COLUMNS
+        else df[column].tolist()
+        for column in INSERT_COLUMNS
+    ]
+    return [dict(zip(INSERT_COLUMNS, row)) for row in zip(*columns)]
+
+def remove_duplicate_samples(conn) -> int:
+    """
+    Delete all but the first stored row (lowest id) of each (timestamp, cluster)
+    Rollups and cached energy totals of the affected range are rebuilt.
+    Returns:
+        Number of rows removed
+    """
+    first_ids = select(func.min(ElectricalData.id)).group_by(*(getattr(ElectricalData, column) for column in DEDUP_COLUMNS))
+    duplicates = ElectricalData.id.not_in(first_ids)
+    timestamps = pd.Series(conn.execute(select(ElectricalData.timestamp).where(duplicates)).scalars().all(), dtype='datetime64[ns]')
+    if timestamps.empty:
+        return 0
+
+    removed = conn.execute(delete(ElectricalData).where(duplicates)).rowcount
+    rebuild_rollups(conn, timestamps.min().to_pydatetime(), timestamps.max().to_pydatetime())
+    invalidate_periods(conn, timestamps)
+    return removed
+
+def ensure_indexes(bind) -> None:
+    """
+    Create electrical_data indexes missing from databases created before they existed
+    Duplicate samples stored before ux_timestamp_cluster existed are removed first,
+    since the unique index can't be built over them. Indexes the new ones replace are dropped.
+    """
+    with bind.begin() as conn:
+        for name in STALE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        existing = {index['name'] for index in inspect(conn).get_indexes(ElectricalData.__tablename__)}
+        if 'ux_timestamp_cluster' not in existing:
+            removed = remove_duplicate_samples(conn)
+            if removed:
+                logger.info(f"Removed {removed} duplicate (timestamp, cluster) samples before adding ux_timestamp_cluster")
+        for index in ElectricalData.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+# Whether ux_timestamp_cluster exists; cleared by check_indexes on databases not migrated yet
+_conflict_index = True
+
+def check_indexes(bind) -> List[str]:
+    """
+    Names of electrical_data indexes to add or drop (STALE_INDEXES), without changing the database
+    Until ux_timestamp_cluster exists, deduplicating inserts filter out stored
+    samples with a query instead of relying on ON CONFLICT.
+    """
+    global _conflict_index
+    existing = {index['name'] for index in inspect(bind).get_indexes(ElectricalData.__tablename__)}
+    missing = [index.name for index in ElectricalData.__table__.indexes if index.name not in existing]
+    _conflict_index = 'ux_timestamp_cluster' not in missing
+    return missing + [name for name in STALE_INDEXES if name in existing]
+
+def _drop_stored(conn, df: pd.DataFrame) -> pd.DataFrame:
+    """Rows of df whose (timestamp, cluster) isn't stored yet; the fallback without ux_timestamp_cluster"""
+    stored = pd.read_sql(
+        select(ElectricalData.timestamp, ElectricalData.cluster).where(
+            ElectricalData.timestamp >= df['timestamp'].min().to_pydatetime(),
+            ElectricalData.timestamp <= df['timestamp'].max().to_pydatetime(),
+            ElectricalData.cluster.in_([int(cluster) for cluster in df['cluster'].unique()])
+        ),
+        conn,
+        parse_dates=['timestamp']
+    )
+    if stored.empty:
+        return df
+    stored = stored.drop_duplicates().astype({'cluster': df['cluster'].dtype})
+    merged = df.merge(stored, on=DEDUP_COLUMNS, how='left', indicator=True)
+    return df[(merged['_merge'] == 'left_only').to_numpy()]
+
+def _insert_statement(conn, dedup: bool):
+    """INSERT that silently skips samples already stored, where the dialect supports it"""
+    table = ElectricalData.__table__
+    statement = insert_ignore(conn.dialect.name, table, DEDUP_COLUMNS) if dedup else None
+    return statement if statement is not None else insert(table)
+
+def _copy_frame(conn, df: pd.DataFrame, dedup: bool) -> Optional[int]:
+    """Stream a frame through PostgreSQL COPY; returns None when the driver can't"""
+    driver = conn.dialect.driver
+    if conn.dialect.name != 'postgresql' or driver not in ('psycopg2', 'psycopg'):
+        return None
+
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S.%f')
+    buffer.seek(0)
+    columns = ', '.join(INSERT_COLUMNS)
+    table = ElectricalData.__tablename__
+
+    # COPY can't skip conflicts, so deduplicating loads go through a staging table
+    target = '_ingest_stage' if dedup else table
+    if dedup:
+        conn.execute(text(
+            f"CREATE TEMP TABLE IF NOT EXISTS _ingest_stage "
+            f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        ))
+    sql = f"COPY {target} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if driver == 'psycopg2':
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+    if not dedup:
+        return len(df)
+    result = conn.execute(text(
+        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM _ingest_stage "
+        f"ON CONFLICT ({', '.join(DEDUP_COLUMNS)}) DO NOTHING"
+    ))
+    conn.execute(text("TRUNCATE _ingest_stage"))
+    return result.rowcount
+
+def _sqlite_executemany(conn, df: pd.DataFrame, dedup: bool) -> Optional[int]:
+    """Bind rows positionally through the DBAPI cursor, skipping per-row parameter processing"""
+    if conn.dialect.name != 'sqlite':
+        return None
+    columns = ', '.join(INSERT_COLUMNS)
+    conflict = f" ON CONFLICT ({', '.join(DEDUP_COLUMNS)}) DO NOTHING" if dedup else ""
+    sql = (
+        f"INSERT INTO {ElectricalData.__tablename__} ({columns}) "
+        f"VALUES ({', '.join('?' * len(INSERT_COLUMNS))}){conflict}"
+    )
+    values = [
+        # Same text format SQLAlchemy's DateTime stores on SQLite
+        df[column].dt.strftime('%Y-%m-%d %H:%M:%S.%f').tolist() if column == 'timestamp' else df[column].tolist()
+        for column in INSERT_COLUMNS
+    ]
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.executemany(sql, zip(*values))
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def insert_frame(conn, df: pd.DataFrame, use_copy: bool = True, dedup: bool = True) -> int:
+    """
+    Insert a prepared frame inside the caller's transaction
+    Uses COPY on PostgreSQL when available, a DBAPI executemany on SQLite,
+    otherwise one SQLAlchemy executemany INSERT.
+    With dedup, samples whose (timestamp, cluster) is already stored are skipped.
+    Returns:
+        Number of rows actually inserted
+    """
+    if dedup and not _conflict_index:
+        df, dedup = _drop_stored(conn, df), False
+    if df.empty:
+        return 0
+    if use_copy:
+        copied = _copy_frame(conn, df, dedup)
+        if copied is not None:
+            return copied
+    inserted = _sqlite_executemany(conn, df, dedup)
+    if inserted is not None:
+        return inserted
+
+    result = conn.execute(_insert_statement(conn, dedup), frame_to_records(df))
+    return result.rowcount if result.rowcount >= 0 else len(df)
+
+def ingest_frame(conn, df: pd.DataFrame, use_copy: bool = True) -> int:
+    """Insert a prepared frame and bring the rollups it touches up to date, in one transaction"""
+    from app.services.columnar_store import columnar_store
+    from app.services.device_service import summary_cache
+
+    if columnar_store is not None:
+        # Columnar files answer range aggregates directly, so no rollups are kept
+        inserted = columnar_store.write_frame(df)
+    else:
+        inserted = insert_frame(conn, df, use_copy=use_copy)
+        if inserted:
+            # Without skipped duplicates the new rows are simply added to their buckets;
+            # otherwise the touched buckets are rebuilt from raw rows
+            merged = merge_rollups(conn, df) if inserted == len(df) else None
+            if merged is None:
+                refresh_rollups(conn, df['timestamp'].min(), df['timestamp'].max(), clusters=df['cluster'].unique())
+    if inserted:
+        # Cached energy totals of the periods these samples fall in are recomputed on next use
+        invalidate_periods(conn, df['timestamp'])
+        # Other processes notice the new rows through the summary's data version
+        summary_cache.invalidate()
+    return inserted
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select, func
+from app.config import settings
+from app.database import async_engine
+from app.models.electrical_data import ElectricalData
+from app.services.columnar_store import columnar_store
+from app.services.sample_tail import SampleTail
+from app.utils.clock import utcnow
+
+logger = logging.getLogger(__name__)
+
+# (timestamp, real_power_watt, power_factor, thd)
+Sample = Tuple[datetime, float, float, float]
+
+_COLUMNS = (
+    ElectricalData.id,
+    ElectricalData.timestamp,
+    ElectricalData.cluster,
+    ElectricalData.real_power_watt,
+    ElectricalData.power_factor,
+    ElectricalData.thd,
+)
+
+_SAMPLE_COLUMNS = ["timestamp", "cluster", "real_power_watt", "power_factor", "thd"]
+
+def _table_samples(table) -> Iterable[tuple]:
+    """Sample tuples from an Arrow table read from the columnar store"""
+    return zip(*(table.column(column).to_pylist() for column in _SAMPLE_COLUMNS))
+
+class LiveMetricsState:
+    """
+    Latest window of samples per cluster in ring buffers with running sums,
+    so the metrics summary is answered without touching the database
+
+    Modes:
+        local: updated only by ingest running in this process
+        poll: every worker tails electrical_data by id, so all workers apply
+              the same rows and converge on the same state
+    """
+
+    def __init__(self, window_seconds: float, max_samples_per_cluster: int, mode: str, poll_interval: float, tail_lookback: int = 10000):
+        self.window = timedelta(seconds=window_seconds)
+        self.max_samples = max_samples_per_cluster
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.ready = False
+        self.latest_timestamp: Optional[datetime] = None
+        self.tail = SampleTail(tail_lookback)  # ElectricalData ids applied in poll mode
+        self.last_part = ""  # Newest columnar file applied when STORAGE_BACKEND=parquet
+        self._buffers: Dict[int, Deque[Sample]] = {}
+        self._sums: Dict[int, List[float]] = {}  # cluster -> [power, pf, thd]
+        self._timestamps: Dict[int, Set[datetime]] = {}  # Buffered per cluster, so repeated samples count once
+        self._lock = threading.Lock()
+        self._poll_task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[List[tuple]], None]] = []
+
+    def _pop_oldest(self, cluster: int) -> None:
+        timestamp, power, pf, thd = self._buffers[cluster].popleft()
+        self._timestamps[cluster].discard(timestamp)
+        sums = self._sums[cluster]
+        sums[0] -= power
+        sums[1] -= pf
+        sums[2] -= thd
+
+    def add_listener(self, callback: Callable[[List[tuple]], None]) -> None:
+        """Call callback with every batch of samples applied after startup"""
+        self._listeners.append(callback)
+
+    def add_samples(self, samples: Iterable[Tuple[datetime, int, float, float, float]], notify: bool = True) -> int:
+        """Apply (timestamp, cluster, real_power_watt, power_factor, thd) samples; ones already buffered are skipped"""
+        applied = []
+        with self._lock:
+            for timestamp, cluster, power, pf, thd in samples:
+                if self.latest_timestamp is not None and timestamp < self.latest_timestamp - self.window:
+                    continue  # Already outside the live window
+                buffer = self._buffers.get(cluster)
+                if buffer is None:
+                    buffer = self._buffers[cluster] = deque()
+                    self._sums[cluster] = [0.0, 0.0, 0.0]
+                    self._timestamps[cluster] = set()
+                elif timestamp in self._timestamps[cluster]:
+                    continue  # Re-sent sample the database skipped as a duplicate
+                elif len(buffer) >= self.max_samples:
+                    self._pop_oldest(cluster)
+
+                buffer.append((timestamp, power, pf, thd))
+                self._timestamps[cluster].add(timestamp)
+                sums = self._sums[cluster]
+                sums[0] += power
+                sums[1] += pf
+                sums[2] += thd
+                applied.append((timestamp, cluster, power, pf, thd))
+                if self.latest_timestamp is None or timestamp > self.latest_timestamp:
+                    self.latest_timestamp = timestamp
+
+            self._evict()
+
+        if notify and applied:
+            for callback in self._listeners:
+                callback(applied)
+        return len(applied)
+
+    def _evict(self) -> None:
+        if self.latest_timestamp is None:
+            return
+        cutoff = self.latest_timestamp - self.window
+        for cluster in list(self._buffers):
+            buffer = self._buffers[cluster]
+            while buffer and buffer[0][0] < cutoff:
+                self._pop_oldest(cluster)
+            if not buffer:
+                del self._buffers[cluster]
+                del self._sums[cluster]
+                del self._timestamps[cluster]
+
+    def publish(self, samples: Iterable[Tuple[datetime, int, float, float, float]]) -> None:
+        """Hook for the in-process ingest path; poll mode picks rows up from the DB instead"""
+        if self.mode == "local" and self.ready:
+            self.add_samples(samples)
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        """Same figures as /metrics/summary over the live window, or None before startup"""
+        if not self.ready:
+            return None
+        with self._lock:
+            count = sum(len(buffer) for buffer in self._buffers.values())
+            if not count:
+                return {
+                    "total_devices": 0,
+                    "total_power": 0.0,
+                    "avg_power_factor": 0.0,
+                    "avg_thd": 0.0,
+                    "timestamp": self.latest_timestamp or utcnow()
+                }
+            return {
+                "total_devices": len(self._buffers),
+                "total_power": sum(s[0] for s in self._sums.values()) / count,
+                "avg_power_factor": sum(s[1] for s in self._sums.values()) / count,
+                "avg_thd": sum(s[2] for s in self._sums.values()) / count,
+                "timestamp": self.latest_timestamp
+            }
+
+    def _load_from_store(self) -> int:
+        latest = columnar_store.latest_timestamp()
+        self.last_part = columnar_store.newest_part()
+        if latest is None:
+            return 0
+        table = columnar_store.scan(start=latest - self.window, columns=_SAMPLE_COLUMNS)
+        return self.add_samples(_table_samples(table), notify=False)
+
+    async def load_from_db(self) -> None:
+        """Rebuild the state from the latest window stored in the database"""
+        with self._lock:
+            self._buffers.clear()
+            self._sums.clear()
+            self._timestamps.clear()
+            self.latest_timestamp = None
+        if columnar_store is not None:
+            loaded = await asyncio.to_thread(self._load_from_store)
+            self.ready = True
+            logger.info(f"Live metrics loaded {loaded} samples from columnar storage (mode: {self.mode})")
+            return
+
+        async with async_engine.connect() as conn:
+            latest, last_id = (await conn.execute(
+                select(func.max(ElectricalData.timestamp), func.max(ElectricalData.id))
+            )).one()
+            rows = []
+            if latest is not None:
+                rows = (await conn.execute(
+                    select(*_COLUMNS).where(ElectricalData.timestamp >= latest - self.window)
+                )).all()
+
+        self.add_samples((row[1:] for row in rows), notify=False)
+        self.tail = SampleTail(self.tail.lookback, last_id or 0)
+        self.ready = True
+        logger.info(f"Live metrics loaded {len(rows)} samples (mode: {self.mode})")
+
+    async def poll_once(self, batch_size: int = 50000) -> int:
+        """Apply rows inserted since the last poll by any process"""
+        if columnar_store is not None:
+            table, self.last_part = await asyncio.to_thread(columnar_store.read_new_parts, self.last_part)
+            return self.add_samples(_table_samples(table)) if table is not None else 0
+
+        async with async_engine.connect() as conn:
+            rows = (await conn.execute(
+                select(*_COLUMNS)
+                .where(self.tail.condition())
+                .order_by(ElectricalData.id)
+                .limit(batch_size)
+            )).all()
+        if rows:
+            self.add_samples(row[1:] for row in rows)
+            self.tail.advance(row[0] for row in rows)
+        return len(rows)
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                logger.error(f"Live metrics poll failed: {str(e)}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def start(self) -> None:
+        await self.load_from_db()
+        if self.mode == "poll" and self._poll_task is None:
+            self._poll_task = asyncio.get_running_loop().create_task(self._poll_loop())
+
+    def stop(self) -> None:
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+
+# Shared live state for this worker
+live_metrics = LiveMetricsState(
+    window_seconds=settings.LIVE_METRICS_WINDOW,
+    max_samples_per_cluster=settings.LIVE_METRICS_MAX_SAMPLES,
+    mode=settings.LIVE_METRICS_MODE,
+    poll_interval=settings.LIVE_METRICS_POLL_INTERVAL,
+    tail_lookback=settings.SAMPLE_TAIL_LOOKBACK
+)
@@ -1,150 +1,313 @@
 import json
+import time
+import hashlib
+import asyncio
 import logging
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Callable, Awaitable, AsyncIterator
 import torch
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from transformers import (
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextStreamer
+)
 from app.config import settings
-from app.services.data_service import get_actual_devices
-from fastapi import HTTPException , Depends
-from datetime import datetime
-from app.database import get_db
-from sqlalchemy.orm import Session
+from app.services.grounding_service import grounding_provider
+from app.services.event_detector import describe_event
+from app.services.inference_executor import inference_executor
+from app.services.model_manager import model_manager
+from app.services.response_cache import response_cache
+from fastapi import HTTPException
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Global model cache
-_model_cache = {
-    "model": None,
-    "tokenizer": None,
-    "last_loaded": None
-}
+MAX_INPUT_TOKENS = 1024
+NO_DEVICES_RESPONSE = "No active devices detected in the system."
+FALLBACK_RESPONSE = "I'm experiencing technical difficulties. Please try again later."
+
+class _QueueTextStreamer(TextStreamer):
+    """Hand decoded text from the inference thread to an asyncio queue"""
+
+    def __init__(self, tokenizer, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.loop = loop
+        self.queue = queue
+        self.cancelled = False
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text and not self.cancelled:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+
+class _CancelledCriteria(StoppingCriteria):
+    """Stop generation early once the streaming client has disconnected"""
+
+    def __init__(self, streamer: _QueueTextStreamer):
+        self.streamer = streamer
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), self.streamer.cancelled, dtype=torch.bool)
+
+def snapshot_version(prefix: str) -> str:
+    """Hash of the grounding prefix; changes whenever the device snapshot does"""
+    return hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+
+class PromptPrefixCache:
+    """Keep the tokenized grounding prefix for the current device snapshot"""
 
-class LLMService:
     def __init__(self):
-        self.device = torch.device(settings.DEVICE)
-        self.max_history = settings.MAX_CONVERSATION_HISTORY
+        self._key: Optional[str] = None
+        self._ids: List[int] = []
+        self._stats = {"hits": 0, "misses": 0}
 
-    async def initialize_model(self):
-        """Lazy-load model with cache validation"""
-        if not self._should_reload_model():
-            return _model_cache["model"], _model_cache["tokenizer"]
+    def get(self, tokenizer, prefix: str) -> List[int]:
+        key = snapshot_version(prefix)
+        if key == self._key:
+            self._stats["hits"] += 1
+            return self._ids
 
-        try:
-            logger.info("Loading FLAN-T5 model...")
-            tokenizer = AutoTokenizer.from_pretrained(settings.MODEL_NAME)
-            model = AutoModelForSeq2SeqLM.from_pretrained(settings.MODEL_NAME)
-            model = model.to(self.device)
-
-            # Update cache
-            _model_cache.update({
-                "model": model,
-                "tokenizer": tokenizer,
-                "last_loaded": datetime.now()
-            })
-            return model, tokenizer
+        # A new device snapshot replaces the previous entry
+        self._stats["misses"] += 1
+        self._ids = tokenizer(prefix, add_special_tokens=False).input_ids
+        self._key = key
+        return self._ids
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"prefix_tokens": len(self._ids), **self._stats}
+
+class BatchScheduler:
+    """Collect prompts arriving within a short window and run them as one batch"""
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[str]]],
+        window_ms: float,
+        max_batch_size: int
+    ):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._stats = {"batches": 0, "prompts": 0, "max_batch_seen": 0}
+
+    async def submit(self, prompt: List[int]) -> str:
+        """Queue a prompt and wait for its generated text"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
 
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+        # Callers that went away while waiting don't need a slot in the batch
+        batch = [(prompt, future) for prompt, future in batch if not future.done()]
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        self._stats["batches"] += 1
+        self._stats["prompts"] += len(batch)
+        self._stats["max_batch_seen"] = max(self._stats["max_batch_seen"], len(batch))
+
+        try:
+            results = await self.run_batch([prompt for prompt, _ in batch])
         except Exception as e:
-            logger.error(f"Model loading failed: {str(e)}")
-            raise HTTPException(
-                status_code=503,
-                detail="AI service temporarily unavailable"
-            )
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
 
-    def _should_reload_model(self):
-        """Check if model needs reloading"""
-        cache = _model_cache
-        return (
-            cache["model"] is None or 
-            cache["tokenizer"] is None or
-            (datetime.now() - cache["last_loaded"]).total_seconds() > settings.MODEL_CACHE_TIMEOUT
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "waiting": len(self._pending),
+            **self._stats
+        }
+
+class LLMService:
+    def __init__(self):
+        self.device = torch.device(settings.DEVICE)
+        self.max_history = settings.MAX_CONVERSATION_HISTORY
+        self.prefix_cache = PromptPrefixCache()
+        self.batcher = BatchScheduler(
+            self._run_batch,
+            window_ms=settings.BATCH_WINDOW_MS,
+            max_batch_size=settings.MAX_BATCH_SIZE
         )
 
-    async def generate_response(self, user_message: str, conversation_history: List[Tuple[str, str]], db: Session = Depends(get_db)) -> Dict[str, Any]:
+    async def initialize_model(self):
+        """Return the cached model, loading it once if nothing is loaded yet"""
+        return await model_manager.get()
+
+    async def generate_response(self, user_message: str, conversation_history: List[Tuple[str, str]], use_cache: bool = True) -> Dict[str, Any]:
         """
         Generate response using ONLY real devices from dataset
         Args:
-            db: SQLAlchemy session (added as dependency)
+            use_cache: set False to bypass the response cache
         Returns:
             {
                 "response": str,
                 "devices": List[Dict],  # Actual devices used in response
-                "confidence": float  # 0-1
+                "confidence": float,  # 0-1
+                "cached": bool  # Served from the response cache
             }
         """
         try:
-            # 1. Get REAL devices from dataset
-            devices = await get_actual_devices(db)  # Pass the session, not 'get'
+            devices, prefix = await self._ground()
             if not devices:
                 return {
-                    "response": "No active devices detected in the system.",
+                    "response": NO_DEVICES_RESPONSE,
                     "devices": [],
-                    "confidence": 0.9
+                    "confidence": 0.9,
+                    "cached": False
                 }
 
-            # 2. Build electrical context
-            device_context = self._build_device_context(devices)
-            power_summary = self._generate_power_summary(devices)
+            # 3. Answers grounded on the same snapshot skip generation entirely
+            cache_key = None
+            if use_cache and settings.RESPONSE_CACHE_ENABLED:
+                cache_key = response_cache.make_key(
+                    user_message, conversation_history, snapshot_version(prefix)
+                )
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    return {**cached, "cached": True}
 
-            # 3. Prepare prompt with STRICT grounding
-            prompt = self._build_prompt(
-                user_message=user_message,
-                conversation_history=conversation_history,
-                device_context=device_context,
-                power_summary=power_summary
-            )
-
-            # 4. Generate response
-            model, tokenizer = await self.initialize_model()
-            response = self._generate_with_model(model, tokenizer, prompt)
+            # 4. Generate response, batched with concurrent requests on the inference pool
+            prompt = await self._tokenize_prompt(prefix, user_message, conversation_history)
+            response = await self.batcher.submit(prompt)
 
-            return {
+            result = {
                 "response": response,
                 "devices": devices,
                 "confidence": self._calculate_confidence(response, devices)
             }
+            if cache_key is not None:
+                response_cache.set(cache_key, result)
+            return {**result, "cached": False}
 
         except HTTPException:
             raise
         except Exception as e:
             logger.error(f"Response generation failed: {str(e)}")
             return {
-                "response": "I'm experiencing technical difficulties. Please try again later.",
+                "response": FALLBACK_RESPONSE,
                 "devices": [],
-                "confidence": 0
+                "confidence": 0,
+                "cached": False
             }
 
+    async def stream_response(self, user_message: str, conversation_history: List[Tuple[str, str]]) -> AsyncIterator[str]:
+        """
+        Stream response text as the model generates it
+        Yields:
+            Text chunks (roughly one word each) in generation order
+        """
+        try:
+            devices, prompt = await self._prepare_prompt(user_message, conversation_history)
+        except Exception as e:
+            logger.error(f"Response generation failed: {str(e)}")
+            yield FALLBACK_RESPONSE
+            return
+
+        if not devices:
+            yield NO_DEVICES_RESPONSE
+            return
+
+        model, tokenizer = await self.initialize_model()
+        queue: asyncio.Queue = asyncio.Queue()
+        streamer = _QueueTextStreamer(tokenizer, asyncio.get_running_loop(), queue)
+
+        # Streaming needs a batch of one, but still goes through the bounded pool
+        job = asyncio.ensure_future(inference_executor.run(
+            self._stream_with_model, model, tokenizer, prompt, streamer
+        ))
+        # Chunks are queued from the worker thread before the job completes,
+        # so the end marker always arrives after the last chunk.
+        job.add_done_callback(lambda _: queue.put_nowait(None))
+
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+            await job
+        finally:
+            # Stop generating if the client went away mid-stream
+            streamer.cancelled = True
+
+    async def _prepare_prompt(self, user_message: str, conversation_history: List[Tuple[str, str]]) -> Tuple[List[Dict], Optional[List[int]]]:
+        """Ground and tokenize the prompt; returns ([], None) when there are no devices"""
+        devices, prefix = await self._ground()
+        if not devices:
+            return [], None
+        return devices, await self._tokenize_prompt(prefix, user_message, conversation_history)
+
+    async def _ground(self) -> Tuple[List[Dict], Optional[str]]:
+        """Fetch real devices and build the grounding prefix for them"""
+        # 1. Get REAL devices from dataset, shared by all requests in the current time bucket
+        devices = await grounding_provider.get()
+        if not devices:
+            return [], None
+
+        # 2. Build electrical context
+        device_context = self._build_device_context(devices)
+        power_summary = self._generate_power_summary(devices)
+        return devices, self._build_prompt_prefix(device_context, power_summary)
+
+    async def _tokenize_prompt(self, prefix: str, user_message: str, conversation_history: List[Tuple[str, str]]) -> List[int]:
+        """Prepare prompt with STRICT grounding as token ids"""
+        # The grounding prefix is tokenized once per device snapshot,
+        # only the conversation per request
+        _, tokenizer = await self.initialize_model()
+        prefix_ids = self.prefix_cache.get(tokenizer, prefix)
+        suffix_ids = tokenizer(
+            self._build_prompt_suffix(user_message, conversation_history)
+        ).input_ids
+        return self._fit_input_ids(prefix_ids, suffix_ids)
+
     def _build_device_context(self, devices: List[Dict]) -> str:
         """Format real device data for LLM context"""
         return "\n".join(
             f"- {d['name']} (Cluster {d['cluster_id']}): "
             f"{d['avg_power']}W, THD: {d['avg_thd']:.1f}%"
+            + (f", {d['energy_kwh']} kWh used" if 'energy_kwh' in d else "")
+            + (f", {describe_event(d['last_event'])}" if d.get('last_event') else "")
             for d in devices
         )
 
     def _generate_power_summary(self, devices: List[Dict]) -> str:
         """Create human-friendly power summary"""
-        total_power = sum(d['avg_power'] for d in devices)
+        # Average watts don't add up to consumption; energy is integrated over time per device
+        total_energy = sum({d['cluster_id']: d.get('energy_kwh', 0.0) for d in devices}.values())
         highest = max(devices, key=lambda x: x['avg_power'])
         return (
-            f"Total power: {total_power:.1f}W\n"
+            f"Energy used in the last {settings.GROUNDING_WINDOW_HOURS}h: {total_energy:.2f} kWh\n"
             f"Highest consumer: {highest['name']} ({highest['avg_power']}W)"
         )
 
-    def _build_prompt(
-        self,
-        user_message: str,
-        conversation_history: List[Tuple[str, str]],
-        device_context: str,
-        power_summary: str
-    ) -> str:
-        """Create grounded prompt with system instructions"""
-        history_str = "\n".join(
-            f"{role}: {text}" 
-            for role, text in conversation_history[-self.max_history:]
-        )
-
+    def _build_prompt_prefix(self, device_context: str, power_summary: str) -> str:
+        """Create the grounding block shared by every request on the same device snapshot"""
         return f"""SYSTEM: You are an electrical assistant analyzing REAL-TIME data.
 ACTIVE DEVICES:
 {device_context}
@@ -156,30 +319,99 @@ RULES:
 - If unsure, say "I don't have enough data"
 - Never guess about non-existent devices
 
-CONVERSATION HISTORY:
+"""
+
+    def _build_prompt_suffix(self, user_message: str, conversation_history: List[Tuple[str, str]]) -> str:
+        """Create the per-request part of the prompt"""
+        history_str = "\n".join(
+            f"{role}: {text}" 
+            for role, text in conversation_history[-self.max_history:]
+        )
+
+        return f"""CONVERSATION HISTORY:
 {history_str}
 
 USER: {user_message}
 ASSISTANT:"""
 
-    def _generate_with_model(self, model, tokenizer, prompt: str) -> str:
-        """Generate response with FLAN-T5"""
-        input_ids = tokenizer(
-            prompt,
-            return_tensors="pt",
-            truncation=True,
-            max_length=1024
-        ).input_ids.to(self.device)
-
-        outputs = model.generate(
-            input_ids,
-            max_new_tokens=settings.MAX_NEW_TOKENS,
-            temperature=0.7,
-            do_sample=True,
-            top_p=0.9
+    def _fit_input_ids(self, prefix_ids: List[int], suffix_ids: List[int]) -> List[int]:
+        """Join prefix and suffix within MAX_INPUT_TOKENS, dropping the oldest history first"""
+        budget = MAX_INPUT_TOKENS - len(prefix_ids)
+        if len(suffix_ids) <= budget:
+            return prefix_ids + suffix_ids
+
+        # Always keep the end of the suffix: the user message and the ASSISTANT cue
+        keep = max(budget, MAX_INPUT_TOKENS // 4)
+        return prefix_ids[:MAX_INPUT_TOKENS - keep] + suffix_ids[-keep:]
+
+    async def _run_batch(self, prompts: List[List[int]]) -> List[str]:
+        """Generate a whole batch of prompts in one call on the inference pool"""
+        model, tokenizer = await self.initialize_model()
+        return await inference_executor.run(
+            self._generate_with_model, model, tokenizer, prompts
         )
 
-        return tokenizer.decode(outputs[0], skip_special_tokens=True)
+    def _generate_with_model(self, model, tokenizer, prompts: List[List[int]]) -> List[str]:
+        """Generate responses with FLAN-T5 for a padded batch of tokenized prompts"""
+        inputs = tokenizer.pad(
+            {"input_ids": prompts},
+            return_tensors="pt"
+        ).to(self.device)
+
+        started = time.perf_counter()
+        with torch.inference_mode():
+            outputs = model.generate(
+                input_ids=inputs.input_ids,
+                attention_mask=inputs.attention_mask,
+                max_new_tokens=settings.MAX_NEW_TOKENS,
+                temperature=settings.TEMPERATURE,
+                do_sample=True,
+                top_p=0.9
+            )
+        self._record_generation(tokenizer, outputs, started)
+
+        return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def _stream_with_model(self, model, tokenizer, prompt: List[int], streamer: "_QueueTextStreamer") -> None:
+        """Generate a single response, pushing text to the streamer as it decodes"""
+        inputs = tokenizer.pad(
+            {"input_ids": [prompt]},
+            return_tensors="pt"
+        ).to(self.device)
+
+        started = time.perf_counter()
+        with torch.inference_mode():
+            outputs = model.generate(
+                input_ids=inputs.input_ids,
+                attention_mask=inputs.attention_mask,
+                max_new_tokens=settings.MAX_NEW_TOKENS,
+                temperature=settings.TEMPERATURE,
+                do_sample=True,
+                top_p=0.9,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([_CancelledCriteria(streamer)])
+            )
+        self._record_generation(tokenizer, outputs, started)
+
+    def _record_generation(self, tokenizer, outputs, started: float) -> None:
+        """Feed generated token count and wall time into the backend throughput stats"""
+        backend_stats = model_manager.backend_stats
+        if backend_stats is not None:
+            tokens = int((outputs != tokenizer.pad_token_id).sum())
+            backend_stats.record_generation(tokens, time.perf_counter() - started)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Inference backend, batching and worker pool statistics"""
+        backend_stats = model_manager.backend_stats
+        return {
+            "model": model_manager.get_stats(),
+            "backend": backend_stats.to_dict() if backend_stats else None,
+            "grounding": grounding_provider.get_stats(),
+            "prompt_prefix_cache": self.prefix_cache.get_stats(),
+            "response_cache": response_cache.get_stats(),
+            "batching": self.batcher.get_stats(),
+            "executor": inference_executor.get_stats()
+        }
 
     def _calculate_confidence(self, response: str, devices: List[Dict]) -> float:
         """Calculate response confidence (0-1) based on device mentions"""
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException, status
+from app.config import settings
+from app.services.live_metrics import live_metrics, LiveMetricsState
+
+logger = logging.getLogger(__name__)
+
+class Subscriber:
+    """
+    One connected dashboard
+    Updates accumulate here between sends, so a subscriber that is rate limited
+    or slow gets one coalesced update instead of a growing backlog.
+    """
+
+    def __init__(self, cluster: Optional[int], min_interval: float, max_pending: int):
+        self.cluster = cluster
+        self.min_interval = min_interval
+        self.samples: deque = deque(maxlen=max_pending)
+        self.summary: Optional[Dict[str, Any]] = None
+        self.dropped = 0
+        self._sent_summary: Dict[str, Any] = {}
+        self._wakeup = asyncio.Event()
+
+    def push(self, summary: Optional[Dict[str, Any]], samples: List[Dict[str, Any]]) -> None:
+        # The deque keeps the newest samples; count what falls off for the client
+        self.dropped += max(0, len(self.samples) + len(samples) - self.samples.maxlen)
+        self.samples.extend(samples)
+        if summary is not None:
+            self.summary = summary
+        self._wakeup.set()
+
+    async def next_update(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next coalesced update
+        Returns:
+            {"summary": changed fields, "samples": [...], "dropped": n}, or None on timeout
+        """
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._wakeup.clear()
+
+        update: Dict[str, Any] = {}
+        if self.summary is not None:
+            # Only the fields that changed since the last send
+            delta = {k: v for k, v in self.summary.items() if self._sent_summary.get(k) != v}
+            if delta:
+                update["summary"] = delta
+                self._sent_summary = self.summary
+            self.summary = None
+        if self.samples:
+            update["samples"] = list(self.samples)
+            self.samples.clear()
+        if self.dropped:
+            update["dropped"] = self.dropped
+            self.dropped = 0
+        return update
+
+class MetricsBroadcaster:
+    """
+    Fans live metrics out to WebSocket/SSE subscribers
+    New samples come from the live metrics state, which is fed by one DB poll
+    (or in-process ingest) per worker. Each tick the summary and the sample
+    payloads are built once and shared by every subscriber, so database load
+    does not grow with the number of open dashboards.
+    """
+
+    def __init__(self, source: LiveMetricsState, interval: float, min_interval: float, max_subscribers: int, max_pending: int):
+        self.source = source
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_subscribers = max_subscribers
+        self.max_pending = max_pending
+        self._subscribers: List[Subscriber] = []
+        self._pending: List[tuple] = []
+        self._pending_lock = threading.Lock()  # Samples may be published from ingest threads
+        self._task: Optional[asyncio.Task] = None
+        self.ticks = 0
+        self.samples_sent = 0
+
+        source.add_listener(self._on_samples)
+
+    def _on_samples(self, samples: List[tuple]) -> None:
+        if not self._subscribers:
+            return
+        with self._pending_lock:
+            self._pending.extend(samples)
+
+    def _summary(self) -> Optional[Dict[str, Any]]:
+        summary = self.source.summary()
+        if summary is not None:
+            summary["timestamp"] = summary["timestamp"].isoformat()
+        return summary
+
+    def subscribe(self, cluster: Optional[int] = None, interval: Optional[float] = None) -> Subscriber:
+        """Register a subscriber and queue the current summary as its first update"""
+        if len(self._subscribers) >= self.max_subscribers:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many live metrics subscribers, try again later"
+            )
+        subscriber = Subscriber(
+            cluster=cluster,
+            min_interval=max(interval or self.interval, self.min_interval),
+            max_pending=self.max_pending
+        )
+        subscriber.push(self._summary(), [])
+        self._subscribers.append(subscriber)
+        self.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        if subscriber in self._subscribers:
+            self._subscribers.remove(subscriber)
+
+    def tick(self) -> int:
+        """Build one update from the samples applied since the last tick and fan it out"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        if not pending or not self._subscribers:
+            return 0
+
+        # 1. Compute the shared payloads once
+        summary = self._summary()
+        samples = [
+            {
+                "timestamp": timestamp.isoformat(),
+                "cluster": cluster,
+                "real_power_watt": power,
+                "power_factor": pf,
+                "thd": thd
+            }
+            for timestamp, cluster, power, pf, thd in pending
+        ]
+        by_cluster: Dict[int, List[Dict[str, Any]]] = {}
+        for sample in samples:
+            by_cluster.setdefault(sample["cluster"], []).append(sample)
+
+        # 2. Hand references to every subscriber; they send at their own pace
+        for subscriber in self._subscribers:
+            if subscriber.cluster is None:
+                subscriber.push(summary, samples)
+            else:
+                subscriber.push(summary, by_cluster.get(subscriber.cluster, []))
+
+        self.ticks += 1
+        self.samples_sent += len(samples)
+        return len(samples)
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Metrics broadcast failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscribers),
+            "ticks": self.ticks,
+            "samples_sent": self.samples_sent
+        }
+
+# Shared broadcaster for this worker
+metrics_broadcaster = MetricsBroadcaster(
+    source=live_metrics,
+    interval=settings.METRICS_PUSH_INTERVAL,
+    min_interval=settings.METRICS_PUSH_MIN_INTERVAL,
+    max_subscribers=settings.METRICS_PUSH_MAX_SUBSCRIBERS,
+    max_pending=settings.METRICS_PUSH_MAX_PENDING
+)
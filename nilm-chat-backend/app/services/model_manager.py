@@ -0,0 +1,167 @@
+import gc
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+import torch
+from fastapi import HTTPException
+from app.config import settings
+from app.services.inference_backends import BackendStats, load_backend
+
+logger = logging.getLogger(__name__)
+
+class ModelManager:
+    """
+    Own the loaded model: single-flight loading, background refresh with
+    hot swap, and optional unloading after a period without requests
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Tuple[Any, Any, BackendStats]],
+        refresh_after: float,
+        idle_timeout: float
+    ):
+        self.loader = loader
+        self.refresh_after = refresh_after  # 0 disables background refresh
+        self.idle_timeout = idle_timeout  # 0 keeps the model loaded forever
+        self.model = None
+        self.tokenizer = None
+        self.backend_stats: Optional[BackendStats] = None
+        self.last_loaded: Optional[datetime] = None
+        self._loaded_at = 0.0
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self._loading: Optional[Future] = None
+        self._load_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._stats = {
+            "loads": 0,
+            "swaps": 0,
+            "refreshes": 0,
+            "load_failures": 0,
+            "unloads": 0,
+            "last_load_seconds": None
+        }
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.model is not None and self.tokenizer is not None
+
+    async def get(self) -> Tuple[Any, Any]:
+        """Return (model, tokenizer), waiting only if no model is loaded yet"""
+        self._last_used = time.monotonic()
+        model, tokenizer = self.model, self.tokenizer
+
+        if model is not None and tokenizer is not None:
+            if self.refresh_after and time.monotonic() - self._loaded_at > self.refresh_after:
+                # Keep serving the current model while the fresh one loads
+                self._start_load(refresh=True)
+            return model, tokenizer
+
+        try:
+            await asyncio.wrap_future(self._start_load(refresh=False))
+        except Exception as e:
+            logger.error(f"Model loading failed: {str(e)}")
+            raise HTTPException(
+                status_code=503,
+                detail="AI service temporarily unavailable"
+            )
+        return self.model, self.tokenizer
+
+    def _start_load(self, refresh: bool) -> Future:
+        """Start a load unless one is already running, and return it"""
+        with self._lock:
+            if self._loading is None:
+                self._loading = self._load_pool.submit(self._load, refresh)
+            return self._loading
+
+    def _load(self, refresh: bool) -> None:
+        started = time.perf_counter()
+        try:
+            model, tokenizer, backend_stats = self.loader()
+        except Exception:
+            with self._lock:
+                self._stats["load_failures"] += 1
+                self._loading = None
+                # A failed refresh keeps the current model; retry after another period
+                self._loaded_at = time.monotonic()
+            if refresh:
+                logger.exception("Background model refresh failed, keeping current model")
+                return
+            raise
+
+        with self._lock:
+            swapped = self.model is not None
+            # Requests already running hold their own reference to the old model
+            self.model, self.tokenizer, self.backend_stats = model, tokenizer, backend_stats
+            self.last_loaded = datetime.now()
+            self._loaded_at = time.monotonic()
+            self._stats["loads"] += 1
+            self._stats["swaps"] += int(swapped)
+            self._stats["refreshes"] += int(refresh)
+            self._stats["last_load_seconds"] = round(time.perf_counter() - started, 3)
+            self._loading = None
+        logger.info(f"Model {'swapped' if swapped else 'loaded'} in {self._stats['last_load_seconds']}s")
+
+    def unload_if_idle(self) -> bool:
+        """Free the model when it has not been used for idle_timeout seconds"""
+        if not self.idle_timeout or not self.is_loaded:
+            return False
+        if time.monotonic() - self._last_used < self.idle_timeout:
+            return False
+
+        with self._lock:
+            if self._loading is not None:
+                return False
+            self.model = self.tokenizer = None
+            self._stats["unloads"] += 1
+        gc.collect()
+        logger.info("Model unloaded after idle timeout")
+        return True
+
+    async def _maintenance_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.unload_if_idle()
+
+    def start_maintenance(self) -> None:
+        if self.idle_timeout and self._maintenance_task is None:
+            interval = max(1.0, min(60.0, self.idle_timeout / 4))
+            self._maintenance_task = asyncio.get_running_loop().create_task(
+                self._maintenance_loop(interval)
+            )
+
+    def stop_maintenance(self) -> None:
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": self.is_loaded,
+                "loading": self._loading is not None,
+                "last_loaded": self.last_loaded.isoformat() if self.last_loaded else None,
+                "refresh_after_seconds": self.refresh_after,
+                "idle_timeout_seconds": self.idle_timeout,
+                **self._stats
+            }
+
+def _load_configured_backend():
+    return load_backend(
+        settings.INFERENCE_BACKEND,
+        settings.MODEL_NAME,
+        torch.device(settings.DEVICE),
+        num_threads=settings.TORCH_NUM_THREADS
+    )
+
+# Shared model lifecycle used by the LLM service
+model_manager = ModelManager(
+    loader=_load_configured_backend,
+    refresh_after=settings.MODEL_CACHE_TIMEOUT,
+    idle_timeout=settings.MODEL_IDLE_TIMEOUT
+)
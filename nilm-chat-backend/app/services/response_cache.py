@@ -0,0 +1,83 @@
+import re
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_message(message: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivial variants share a key"""
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub(" ", message.lower())).strip()
+
+class ResponseCache:
+    """LRU cache with TTL for chat answers grounded on the same data snapshot"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, history_turns: int):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.history_turns = history_turns
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def make_key(self, user_message: str, conversation_history: List[Tuple[str, str]], snapshot_version: str) -> str:
+        """
+        Build the cache key
+        Args:
+            conversation_history: may end with the current user message, which is ignored
+            snapshot_version: hash of the grounding data the answer was generated from
+        """
+        history = list(conversation_history)
+        if history and history[-1] == ("user", user_message):
+            history = history[:-1]
+        history = history[-self.history_turns:] if self.history_turns else []
+
+        digest = hashlib.sha256()
+        for role, text in history:
+            digest.update(f"{role}\x1f{normalize_message(text)}\x1e".encode("utf-8"))
+
+        return hashlib.sha256(
+            f"{normalize_message(user_message)}\x1d{digest.hexdigest()}\x1d{snapshot_version}".encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+            self._stats["misses"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._stats["hits"] += 1
+        return entry[1]
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self) -> None:
+        """Drop every cached answer, e.g. after new ElectricalData was ingested"""
+        self._entries.clear()
+        self._stats["invalidations"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.RESPONSE_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            **self._stats
+        }
+
+# Shared cache in front of LLMService.generate_response
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL,
+    history_turns=settings.RESPONSE_CACHE_HISTORY
+)
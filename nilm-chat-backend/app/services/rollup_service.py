@@ -0,0 +1,231 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Sequence
+import pandas as pd
+from sqlalchemy import select, delete, insert, func, text, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from app.models.electrical_data import ElectricalData
+from app.models.rollup import ALL_SAMPLES, ElectricalDataRollup, RollupCoverage
+
+logger = logging.getLogger(__name__)
+
+# Rollup resolutions in seconds; each divides the next so one refresh window covers all
+RESOLUTIONS = (1, 60, 3600)
+
+_AGGREGATES = {
+    'sample_count': ('real_power_watt', 'count'),
+    'power_sum': ('real_power_watt', 'sum'),
+    'power_min': ('real_power_watt', 'min'),
+    'power_max': ('real_power_watt', 'max'),
+    'thd_sum': ('thd', 'sum'),
+    'thd_min': ('thd', 'min'),
+    'thd_max': ('thd', 'max'),
+    'pf_sum': ('power_factor', 'sum'),
+    'pf_min': ('power_factor', 'min'),
+    'pf_max': ('power_factor', 'max'),
+}
+
+def floor_time(value: datetime, resolution: int) -> datetime:
+    """Start of the bucket containing value"""
+    return pd.Timestamp(value).floor(f"{resolution}s").to_pydatetime()
+
+def ceil_time(value: datetime, resolution: int) -> datetime:
+    """Start of the first whole bucket at or after value"""
+    return pd.Timestamp(value).ceil(f"{resolution}s").to_pydatetime()
+
+def pick_resolution(window: timedelta) -> int:
+    """Coarsest resolution that still gives several buckets over the window"""
+    seconds = window.total_seconds()
+    for resolution in reversed(RESOLUTIONS):
+        if seconds >= resolution * 4:
+            return resolution
+    return RESOLUTIONS[0]
+
+# First key of the PostgreSQL advisory locks taken per coarsest rollup window
+_LOCK_NAMESPACE = 0x524f4c4c
+
+def lock_windows(conn, start: datetime, end: datetime) -> None:
+    """
+    Serialize writers on the coarsest windows (hours) spanning [start, end]
+    Held until the transaction ends, so a refresh reads raw rows only after
+    concurrent writers to the same windows have committed. Also taken by the
+    energy cache. PostgreSQL only; SQLite already allows a single writer.
+    """
+    if conn.dialect.name != 'postgresql':
+        return
+    coarsest = max(RESOLUTIONS)
+    first = int(pd.Timestamp(start).timestamp()) // coarsest
+    last = int(pd.Timestamp(end).timestamp()) // coarsest
+    # Always in ascending order, so writers never wait on each other in a cycle
+    conn.execute(
+        text("SELECT pg_advisory_xact_lock(:namespace, id) FROM generate_series(:first, :last) AS id ORDER BY id"),
+        {"namespace": _LOCK_NAMESPACE, "first": first, "last": last}
+    )
+
+def _aggregate(df: pd.DataFrame, resolution: int) -> pd.DataFrame:
+    rollup = df.groupby(
+        [df['timestamp'].dt.floor(f"{resolution}s").rename('bucket_start'), 'cluster', 'device_state'],
+        sort=False
+    ).agg(**_AGGREGATES).reset_index()
+    rollup['resolution'] = resolution
+    return rollup
+
+def refresh_rollups(conn, start: datetime, end: datetime, clusters: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute every rollup bucket touched by samples in [start, end]
+    Buckets are rebuilt from raw rows, so this is idempotent and safe with
+    deduplicated or re-imported chunks. Run it in the same transaction as the insert.
+    Args:
+        clusters: only rebuild these clusters' buckets (default: all)
+    Returns:
+        Number of rollup rows written
+    """
+    coarsest = max(RESOLUTIONS)
+    window_start = floor_time(start, coarsest)
+    window_end = floor_time(end, coarsest) + timedelta(seconds=coarsest)
+    lock_windows(conn, window_start, end)
+
+    raw_filter = [ElectricalData.timestamp >= window_start, ElectricalData.timestamp < window_end]
+    rollup_filter = [ElectricalDataRollup.bucket_start >= window_start, ElectricalDataRollup.bucket_start < window_end]
+    if clusters is not None:
+        clusters = sorted({int(cluster) for cluster in clusters})
+        raw_filter.append(ElectricalData.cluster.in_(clusters))
+        rollup_filter.append(ElectricalDataRollup.cluster.in_(clusters))
+
+    raw = pd.read_sql(
+        select(
+            ElectricalData.timestamp,
+            ElectricalData.cluster,
+            ElectricalData.device_state,
+            ElectricalData.real_power_watt,
+            ElectricalData.thd,
+            ElectricalData.power_factor
+        ).where(*raw_filter),
+        conn,
+        parse_dates=['timestamp']
+    )
+
+    written = 0
+    for resolution in RESOLUTIONS:
+        conn.execute(delete(ElectricalDataRollup).where(
+            ElectricalDataRollup.resolution == resolution,
+            *rollup_filter
+        ))
+        if raw.empty:
+            continue
+
+        rollup = _aggregate(raw, resolution)
+        conn.execute(insert(ElectricalDataRollup), rollup.to_dict('records'))
+        written += len(rollup)
+
+    return written
+
+def merge_rollups(conn, df: pd.DataFrame) -> Optional[int]:
+    """
+    Add newly inserted samples to their rollup buckets without reading raw rows back
+    Sums and counts add up and min/max combine, so only the new rows are aggregated.
+    Only valid when every row of df was actually inserted; returns None on
+    dialects without an upsert so the caller can fall back to refresh_rollups.
+    """
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        upsert, least, greatest = sqlite.insert, func.min, func.max
+    elif dialect == 'postgresql':
+        upsert, least, greatest = postgresql.insert, func.least, func.greatest
+    else:
+        return None
+
+    # A concurrent refresh of these windows would otherwise overwrite the additions
+    lock_windows(conn, df['timestamp'].min(), df['timestamp'].max())
+    table = ElectricalDataRollup.__table__
+    written = 0
+    for resolution in RESOLUTIONS:
+        rollup = _aggregate(df, resolution)
+        statement = upsert(table)
+        combined = {}
+        for column, (_, how) in _AGGREGATES.items():
+            current, new = table.c[column], statement.excluded[column]
+            if how == 'min':
+                combined[column] = least(current, new)
+            elif how == 'max':
+                combined[column] = greatest(current, new)
+            else:
+                combined[column] = current + new
+        conn.execute(
+            statement.on_conflict_do_update(
+                index_elements=['resolution', 'bucket_start', 'cluster', 'device_state'],
+                set_=combined
+            ),
+            rollup.to_dict('records')
+        )
+        written += len(rollup)
+    return written
+
+def rebuild_rollups(conn, start: Optional[datetime] = None, end: Optional[datetime] = None, step: timedelta = timedelta(days=1)) -> int:
+    """
+    Backfill rollups for existing data one step at a time
+    Rebuilding everything (no start or end) marks every sample as covered.
+    """
+    if start is None and end is None:
+        conn.execute(delete(RollupCoverage))
+        conn.execute(insert(RollupCoverage).values(id=1, covered_from=ALL_SAMPLES))
+    bounds = conn.execute(
+        select(func.min(ElectricalData.timestamp), func.max(ElectricalData.timestamp))
+    ).first()
+    start = start or bounds[0]
+    end = end or bounds[1]
+    if start is None or end is None:
+        return 0
+
+    written = 0
+    cursor = start
+    while cursor <= end:
+        step_end = min(cursor + step, end)
+        written += refresh_rollups(conn, cursor, step_end)
+        cursor = floor_time(step_end, max(RESOLUTIONS)) + timedelta(seconds=max(RESOLUTIONS))
+    return written
+
+def sums_query(by: Sequence[str], start: Optional[datetime], covered_from: Optional[datetime], resolution: int):
+    """
+    sample_count and power, THD and power factor sums per group of the samples from start on
+    Whole rollup buckets are read from covered_from (the stored RollupCoverage) or the first
+    whole bucket after start, whichever is later; earlier samples, including those of a
+    partial first bucket, are read raw. Without coverage every sample is read raw.
+    """
+    split = None
+    if covered_from is not None:
+        split = covered_from if start is None else max(covered_from, ceil_time(start, resolution))
+
+    parts = []
+    if split is None or split > (start or ALL_SAMPLES):
+        raw = select(
+            *(getattr(ElectricalData, column) for column in by),
+            func.count().label("sample_count"),
+            func.sum(ElectricalData.real_power_watt).label("power_sum"),
+            func.sum(ElectricalData.thd).label("thd_sum"),
+            func.sum(ElectricalData.power_factor).label("pf_sum")
+        )
+        if start is not None:
+            raw = raw.where(ElectricalData.timestamp >= start)
+        if split is not None:
+            raw = raw.where(ElectricalData.timestamp < split)
+        parts.append(raw.group_by(*(getattr(ElectricalData, column) for column in by)))
+    if split is not None:
+        parts.append(select(
+            *(getattr(ElectricalDataRollup, column) for column in by),
+            func.sum(ElectricalDataRollup.sample_count).label("sample_count"),
+            func.sum(ElectricalDataRollup.power_sum).label("power_sum"),
+            func.sum(ElectricalDataRollup.thd_sum).label("thd_sum"),
+            func.sum(ElectricalDataRollup.pf_sum).label("pf_sum")
+        ).where(
+            ElectricalDataRollup.resolution == resolution,
+            ElectricalDataRollup.bucket_start >= split
+        ).group_by(*(getattr(ElectricalDataRollup, column) for column in by)))
+    if len(parts) == 1:
+        return parts[0]
+
+    combined = union_all(*parts).subquery()
+    return select(
+        *(combined.c[column] for column in by),
+        *(func.sum(combined.c[column]).label(column) for column in ("sample_count", "power_sum", "thd_sum", "pf_sum"))
+    ).group_by(*(combined.c[column] for column in by))
@@ -0,0 +1,46 @@
+from typing import Iterable, Optional, Set
+from app.models.electrical_data import ElectricalData
+
+class SampleTail:
+    """
+    Position in electrical_data for readers that tail new rows by id
+
+    Ids are assigned when a row is inserted but become visible when its transaction
+    commits, so on PostgreSQL a concurrent ingest can commit a lower id after a
+    higher one was read. Ids skipped below the newest one read are kept as holes
+    and queried again on every read until they show up or fall more than
+    lookback ids behind (rolled back inserts leave permanent holes).
+    """
+
+    def __init__(self, lookback: int, last_id: int = 0, holes: Iterable[int] = ()):
+        self.lookback = lookback
+        self.last_id = last_id
+        self.holes: Set[int] = set(holes)
+
+    @classmethod
+    def parse(cls, position: Optional[str], lookback: int) -> "SampleTail":
+        """Tail from a position written by __str__, e.g. '1200' or '1200:1187,1190'"""
+        last_id, _, holes = (position or "0").partition(":")
+        return cls(lookback, int(last_id), (int(hole) for hole in holes.split(",") if hole))
+
+    def __str__(self) -> str:
+        if not self.holes:
+            return str(self.last_id)
+        return f"{self.last_id}:{','.join(str(hole) for hole in sorted(self.holes))}"
+
+    def condition(self):
+        """WHERE clause selecting rows not read yet; order by id and limit as needed"""
+        newer = ElectricalData.id > self.last_id
+        return newer | ElectricalData.id.in_(sorted(self.holes)) if self.holes else newer
+
+    def advance(self, ids: Iterable[int]) -> None:
+        """Record the ids of rows just read with condition(), in ascending order"""
+        ids = list(ids)
+        self.holes.difference_update(ids)
+        newer = [row_id for row_id in ids if row_id > self.last_id]
+        if newer:
+            top = newer[-1]
+            self.holes.update(set(range(max(self.last_id, top - self.lookback) + 1, top)) - set(newer))
+            self.last_id = top
+        floor = self.last_id - self.lookback
+        self.holes = {hole for hole in self.holes if hole > floor}
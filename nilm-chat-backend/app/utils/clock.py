@@ -0,0 +1,13 @@
+# Samples and chat messages are stored as naive UTC datetimes; compare them only with these
+from datetime import datetime, timezone
+from typing import Optional
+
+def utcnow() -> datetime:
+    """Current time as naive UTC, matching stored timestamps and what func.now() stores on SQLite"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert a timezone-aware datetime to naive UTC; naive values are taken as UTC already"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
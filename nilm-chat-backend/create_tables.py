@@ -1,9 +1,21 @@
 # create_tables.py
 from app.database import Base, engine
 from app.models.electrical_data import ElectricalData  # Import your model
+from app.models.rollup import ElectricalDataRollup
+from app.models.ingest import IngestFile, IngestChunk
+from app.models.chat import ChatSession, ChatMessage
+from app.models.device_event import DeviceEvent, EventDetectorCheckpoint
+from app.models.energy import EnergyPeriod
+from app.services.ingest_service import ensure_indexes
 
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    # Removes duplicate samples before their unique index is added
+    ensure_indexes(engine)
+    # create_all skips tables that already exist, so add newer indexes explicitly
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
     print("✅ Tables created!")
 
 if __name__ == "__main__":
@@ -2,6 +2,7 @@
 
 from app.database import engine
 from app.models.electrical_data import ElectricalData
+from app.models.rollup import ElectricalDataRollup, RollupCoverage
 from sqlalchemy.orm import declarative_base
 
 Base = ElectricalData.__bases__[0]
@@ -10,6 +11,10 @@ def reset_table():
     print("Dropping and recreating the 'electrical_data' table...")
     ElectricalData.__table__.drop(bind=engine, checkfirst=True)
     ElectricalData.__table__.create(bind=engine, checkfirst=True)
+    # Rollups of the dropped samples go too; the empty table is covered from its first sample
+    for table in (ElectricalDataRollup.__table__, RollupCoverage.__table__):
+        table.drop(bind=engine, checkfirst=True)
+        table.create(bind=engine, checkfirst=True)
     print("✅ Table recreated successfully.")
 
 if __name__ == "__main__":
@@ -0,0 +1,283 @@
+import sys
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import numpy as np
+import httpx
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from scripts.synthetic_data import generate_samples
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Endpoints measured at every dataset size
+SCENARIOS = ("ingest", "metrics_summary", "metrics_by_cluster", "devices", "device_energy", "chat")
+
+# Latency fields compared by --compare; higher is worse
+COMPARED = ("p50_ms", "p95_ms")
+
+def parse_size(value: str) -> int:
+    """'10k', '1m' or '100M' -> rows"""
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, Any]:
+    """Latency percentiles in milliseconds and throughput of one scenario"""
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(len(latencies) / seconds, 2) if seconds else None,
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+async def run_scenario(
+    send: Callable[[int], Awaitable[httpx.Response]],
+    requests: int,
+    concurrency: int,
+    warmup: int = 0
+) -> Dict[str, Any]:
+    """
+    Issue `requests` calls of send(i) from `concurrency` concurrent workers
+    Warm-up calls run first and are not measured. Responses other than 2xx count as errors.
+    """
+    for i in range(warmup):
+        await send(-1 - i)
+
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            i = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await send(i)
+                failed = response.status_code >= 300
+            except httpx.HTTPError:
+                failed = True
+            if failed:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+def _ingest_bodies(args, count: int) -> List[bytes]:
+    """Distinct live batches timestamped from now on, so they never collide with stored samples"""
+    chunks = generate_samples(
+        clusters=args.clusters, rate=args.rate, start=datetime.now().replace(microsecond=0),
+        seed=args.seed + 1, chunk_rows=args.ingest_batch, rows=args.ingest_batch * count
+    )
+    return [chunk.to_json(orient="records", date_format="iso").encode() for chunk in chunks]
+
+async def run_scenarios(base_url: str, args) -> Dict[str, Any]:
+    bodies = _ingest_bodies(args, args.requests + args.warmup)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        senders = {
+            "ingest": lambda i: client.post(
+                "/api/ingest/", params={"wait": "true"}, content=bodies[i],
+                headers={"content-type": "application/json"}
+            ),
+            "metrics_summary": lambda i: client.get("/api/metrics/summary"),
+            "metrics_by_cluster": lambda i: client.get(
+                f"/api/metrics/by-cluster/{i % args.clusters}", params={"limit": 100}
+            ),
+            "devices": lambda i: client.get("/api/devices/"),
+            "device_energy": lambda i: client.get("/api/devices/energy", params={"period": "month"}),
+            "chat": lambda i: client.post("/api/chat/", json={
+                # Distinct messages, so every request is generated
+                "message": f"Which device used the most energy? ({i})",
+                "session_id": f"benchmark-{i % 16}",
+            }),
+        }
+        results = {}
+        for name in args.scenarios:
+            results[name] = await run_scenario(senders[name], args.requests, args.concurrency, args.warmup)
+            if name == "ingest":
+                results[name]["rows_per_second"] = round(results[name]["throughput_rps"] * args.ingest_batch, 1)
+            print(f"  {name}: {json.dumps(results[name])}")
+    return results
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _server_env(args, database: str, dataset: Dict[str, Any]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{database}",
+        "INFERENCE_BACKEND": "stub",
+        "LLM_PROVIDER": "stub",  # Skip the model warm-up on startup
+        "STUB_TOKEN_LATENCY_MS": str(args.token_ms),
+        "RESPONSE_CACHE_ENABLED": "false",
+        # Background jobs would compete with the measured requests
+        "EVENT_DETECTION_INTERVAL": "0",
+        "CHAT_RETENTION_INTERVAL": "0",
+    })
+    if env.get("STORAGE_BACKEND") == "parquet":
+        env["COLUMNAR_DATA_DIR"] = os.path.splitext(database)[0] + "-columnar"
+    if dataset.get("start"):
+        # A reused dataset may be older than the grounding window; chat needs its devices
+        age_hours = (datetime.now() - datetime.fromisoformat(dataset["start"])).total_seconds() / 3600
+        env["GROUNDING_WINDOW_HOURS"] = str(max(24, int(age_hours) + 1))
+    return env
+
+def prepare_dataset(args, rows: int) -> Dict[str, Any]:
+    """Generate and load a dataset once; later runs with the same parameters reuse it"""
+    backend = os.environ.get("STORAGE_BACKEND", "sql")
+    name = f"bench-{rows}-c{args.clusters}-r{args.rate:g}-s{args.seed}-{backend}"
+    database = os.path.join(args.workdir, f"{name}.db")
+    metadata_path = os.path.join(args.workdir, f"{name}.json")
+    if os.path.exists(metadata_path) and os.path.exists(database) and not args.regenerate:
+        with open(metadata_path) as f:
+            return {**json.load(f), "reused": True}
+
+    for path in (database, metadata_path):
+        if os.path.exists(path):
+            os.remove(path)
+    env = _server_env(args, database, {})
+    print(f"Loading {rows} synthetic rows into {database}")
+    output = subprocess.run(
+        [
+            sys.executable, os.path.join(BACKEND_DIR, "scripts", "synthetic_data.py"),
+            "--rows", str(rows), "--clusters", str(args.clusters),
+            "--rate", str(args.rate), "--seed", str(args.seed)
+        ],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    dataset = {"database": database, "load": json.loads(output.strip().splitlines()[-1])}
+    dataset.update(start=dataset["load"]["start"], end=dataset["load"]["end"])
+    with open(metadata_path, "w") as f:
+        json.dump(dataset, f, indent=2)
+    return {**dataset, "reused": False}
+
+def _wait_until_ready(server: subprocess.Popen, base_url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"API server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"API server not ready after {timeout}s")
+
+def benchmark_size(args, rows: int) -> Dict[str, Any]:
+    dataset = prepare_dataset(args, rows)
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=_server_env(args, dataset["database"], dataset)
+    )
+    try:
+        _wait_until_ready(server, base_url, args.startup_timeout)
+        print(f"Benchmarking {rows} rows")
+        endpoints = asyncio.run(run_scenarios(base_url, args))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {"rows": rows, "dataset": dataset, "endpoints": endpoints}
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Endpoints whose latency grew by more than tolerance against a previous results file"""
+    previous = {
+        (size["rows"], name): stats
+        for size in baseline.get("sizes", [])
+        for name, stats in size["endpoints"].items()
+    }
+    regressions = []
+    for size in results["sizes"]:
+        for name, stats in size["endpoints"].items():
+            before = previous.get((size["rows"], name))
+            if before is None:
+                continue
+            for field in COMPARED:
+                if before[field] > 0 and stats[field] > before[field] * (1 + tolerance):
+                    regressions.append(
+                        f"{name} @ {size['rows']} rows: {field} {before[field]} -> {stats[field]}"
+                    )
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end API latency and throughput on synthetic data")
+    parser.add_argument("--sizes", default="10k,100k,1m", help="Dataset sizes in rows, e.g. 10k,100k,1m,10m,100m")
+    parser.add_argument("--clusters", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=1.0, help="Samples per second per cluster")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per scenario")
+    parser.add_argument("--ingest-batch", type=int, default=1000, help="Samples per ingest request")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="Stub LLM cost per generated token")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--workdir", default="./data/benchmark", help="Where datasets are generated and reused")
+    parser.add_argument("--regenerate", action="store_true", help="Generate datasets even if they exist")
+    parser.add_argument("--output", default=None, help="Results file (default: <workdir>/results-<time>.json)")
+    parser.add_argument("--compare", help="Previous results file to check for latency regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed latency growth for --compare")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    os.makedirs(args.workdir, exist_ok=True)
+    args.workdir = os.path.abspath(args.workdir)
+
+    results = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "storage_backend": os.environ.get("STORAGE_BACKEND", "sql"),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("compare", "output")},
+        "sizes": [benchmark_size(args, parse_size(size)) for size in args.sizes.split(",")],
+    }
+    output = args.output or os.path.join(args.workdir, f"results-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"❌ {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No latency regression above {args.tolerance:.0%} against {args.compare}")
@@ -0,0 +1,53 @@
+import sys
+import os
+import time
+import json
+import torch
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from app.services.inference_backends import BACKENDS, load_backend
+
+SAMPLE_PROMPTS = [
+    "SYSTEM: You are an electrical assistant.\nACTIVE DEVICES:\n- Heater (Cluster 1): 1500W, THD: 2.1%\n- Fridge (Cluster 2): 120W, THD: 8.4%\nUSER: Which device uses the most power?\nASSISTANT:",
+    "SYSTEM: You are an electrical assistant.\nACTIVE DEVICES:\n- Laptop (Cluster 3): 65W, THD: 14.2%\nUSER: Is the laptop power quality good?\nASSISTANT:",
+]
+
+def benchmark_backend(backend, max_new_tokens=64, runs=3):
+    """Load one backend and measure greedy generation on the sample prompts"""
+    device = torch.device(settings.DEVICE)
+    model, tokenizer, stats = load_backend(backend, settings.MODEL_NAME, device, settings.TORCH_NUM_THREADS)
+
+    outputs = []
+    for _ in range(runs):
+        for prompt in SAMPLE_PROMPTS:
+            inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=1024).to(device)
+            started = time.perf_counter()
+            with torch.inference_mode():
+                generated = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
+            stats.record_generation(int((generated != tokenizer.pad_token_id).sum()), time.perf_counter() - started)
+            outputs.append(tokenizer.decode(generated[0], skip_special_tokens=True))
+
+    return stats.to_dict(), outputs
+
+if __name__ == "__main__":
+    backends = sys.argv[1:] or list(BACKENDS)
+    results = {}
+    reference = None
+
+    for backend in backends:
+        try:
+            result, outputs = benchmark_backend(backend)
+        except (ImportError, ValueError) as e:
+            print(f"Skipping {backend}: {e}")
+            continue
+
+        # Greedy outputs are deterministic, so agreement with the first backend approximates accuracy loss
+        if reference is None:
+            reference = outputs
+        result["agreement"] = sum(a == b for a, b in zip(outputs, reference)) / len(reference)
+        results[backend] = result
+        print(json.dumps(result))
+
+    print(json.dumps(results, indent=2))
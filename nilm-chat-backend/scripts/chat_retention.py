@@ -0,0 +1,36 @@
+import sys
+import os
+import time
+import argparse
+import logging
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def run(vacuum=False):
+    """Archive inactive chat sessions and trim long ones, e.g. from cron when CHAT_RETENTION_INTERVAL=0"""
+    from sqlalchemy import text
+    from app.config import settings
+    from app.database import engine
+    from app.services.chat_retention import run_retention
+
+    started = time.perf_counter()
+    result = run_retention(engine)
+    logger.info(
+        f"✅ Purged {len(result['purged_sessions'])} sessions and trimmed {result['trimmed_messages']} messages "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    if vacuum and settings.DATABASE_URL.startswith("sqlite"):
+        # SQLite reuses freed pages but only VACUUM shrinks the file
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM"))
+        logger.info("✅ Vacuumed the database file")
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat history retention")
+    parser.add_argument("--vacuum", action="store_true", help="Shrink the SQLite file afterwards")
+    args = parser.parse_args()
+    run(vacuum=args.vacuum)
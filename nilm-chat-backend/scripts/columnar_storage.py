@@ -0,0 +1,66 @@
+import sys
+import os
+import time
+import argparse
+import logging
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _store():
+    from app.config import settings
+    from app.services.columnar_store import ColumnarStore
+    return ColumnarStore(settings.COLUMNAR_DATA_DIR, settings.COLUMNAR_PARTITION)
+
+def migrate(chunk_size=500000):
+    """Copy electrical_data into the columnar store, one id range at a time"""
+    import pandas as pd
+    from sqlalchemy import select
+    from app.database import engine
+    from app.models.electrical_data import ElectricalData
+    from app.services.ingest_service import INSERT_COLUMNS
+
+    store = _store()
+    columns = [ElectricalData.id] + [getattr(ElectricalData, column) for column in INSERT_COLUMNS]
+    started = time.perf_counter()
+    written = 0
+    last_id = 0
+    with engine.connect() as conn:
+        while True:
+            df = pd.read_sql(
+                select(*columns).where(ElectricalData.id > last_id).order_by(ElectricalData.id).limit(chunk_size),
+                conn,
+                parse_dates=['timestamp']
+            )
+            if df.empty:
+                break
+            last_id = int(df['id'].iloc[-1])
+            written += store.write_frame(df.drop(columns='id'))
+            logger.info(f"Migrated {written} rows (up to id {last_id})")
+
+    logger.info(f"✅ Wrote {written} rows to {store.root} in {time.perf_counter() - started:.1f}s")
+    return written
+
+def compact():
+    """Merge each partition's files into one and drop duplicate samples"""
+    store = _store()
+    for partition in store.partitions():
+        merged, rows = store.compact(partition)
+        if merged:
+            logger.info(f"{partition}: merged {merged} files, {rows} rows")
+    logger.info(f"✅ {store.get_stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the Parquet storage backend (STORAGE_BACKEND=parquet)")
+    parser.add_argument("command", choices=["migrate", "compact", "stats"])
+    parser.add_argument("--chunk-size", type=int, default=500000, help="Rows per migrated chunk")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate(args.chunk_size)
+    elif args.command == "compact":
+        compact()
+    else:
+        print(_store().get_stats())
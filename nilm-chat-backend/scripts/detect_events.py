@@ -0,0 +1,38 @@
+import sys
+import os
+import time
+import argparse
+import logging
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def detect(rebuild: bool = False):
+    """Bring device_events up to date with the stored samples, optionally from scratch"""
+    from sqlalchemy import delete
+    from app.database import Base, engine
+    from app.models.device_event import DeviceEvent, EventDetectorCheckpoint
+    from app.services.event_detector import event_detector
+
+    Base.metadata.create_all(bind=engine)
+    if rebuild:
+        # Events depend on the thresholds, so changing EVENT_* settings needs a rebuild
+        with engine.begin() as conn:
+            conn.execute(delete(DeviceEvent))
+            conn.execute(delete(EventDetectorCheckpoint))
+    started = time.perf_counter()
+    processed = event_detector.run_until_current(engine)
+    stats = event_detector.get_stats()
+    logger.info(
+        f"✅ Scanned {processed} samples and found {stats['events']} finished events "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return processed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect appliance on/off events from stored samples")
+    parser.add_argument("--rebuild", action="store_true", help="Drop detected events and scan all samples again")
+    args = parser.parse_args()
+    detect(rebuild=args.rebuild)
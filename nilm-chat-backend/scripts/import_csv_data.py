@@ -1,105 +1,94 @@
+import sys
+import os
+import time
 import pandas as pd
-import numpy as np
 from tqdm import tqdm
 import logging
 from sqlalchemy.exc import IntegrityError
 
-def import_csv_data(file_path, limit=None, batch_size=1000):
-    from app.database import SessionLocal
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+def _read_chunks(file_path, chunk_size, limit=None):
+    """Read the CSV in chunks so memory stays flat regardless of file size"""
+    from app.services.ingest_service import CSV_DTYPES
+
+    reader = pd.read_csv(
+        file_path.strip().strip('"'),
+        parse_dates=['DateTime'],
+        dtype=CSV_DTYPES,
+        chunksize=chunk_size
+    )
+    remaining = limit
+    for chunk in reader:
+        if remaining is not None:
+            chunk = chunk.head(remaining)
+            remaining -= len(chunk)
+        yield chunk
+        if remaining is not None and remaining <= 0:
+            break
+
+def import_csv_data(file_path, limit=None, batch_size=100000, fast=True):
+    """
+    Import a NILM capture CSV into electrical_data
+    Args:
+        batch_size: rows per chunk; each chunk is read, cleaned and committed in one transaction
+        fast: vectorized core INSERT (COPY on PostgreSQL); False builds ORM objects per row
+    """
+    from app.database import engine, SessionLocal
     from app.models.electrical_data import ElectricalData
+    from app.services.ingest_service import prepare_frame, frame_to_records, ingest_frame
+    from app.services.rollup_service import refresh_rollups
 
     # Setup logging
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
 
-    db = None
+    success_count = 0
+    read_count = 0
+    started = time.perf_counter()
     try:
-        # Read CSV with optimized data types
-        df = pd.read_csv(
-            file_path.strip().strip('"'),
-            parse_dates=['DateTime'],
-            dtype={
-                'Voltage': 'float32',
-                'Current': 'float32',
-                'Real Power': 'float32',
-                'Reactive Power': 'float32',
-                'Apparent Power': 'float32',
-                'Power Factor': 'float32',
-                'Frequency': 'float32',
-                'THD': 'float32',
-                'Real Power (Watt)': 'float32',
-                'Cluster': 'int32',
-                'Device_State': 'string'
-            }
-        )
-
-        if limit:
-            df = df.head(limit)
-
-        # Clean and validate data
-        df['Device_State'] = df['Device_State'].str.strip()
-        df.replace([np.inf, -np.inf], np.nan, inplace=True)
-        df.dropna(inplace=True)  # drop rows with missing values
-
-        df['Power Factor'] = df['Power Factor'].clip(-1, 1)
-        df['Frequency'] = df['Frequency'].clip(45, 55)
-
-        # Batch import
-        db = SessionLocal()
-        success_count = 0
-
-        with tqdm(total=len(df), desc="Importing") as pbar:
-            for i in range(0, len(df), batch_size):
-                batch = df.iloc[i:i+batch_size]
-                records = [
-                    ElectricalData(
-                        timestamp=row['DateTime'],
-                        voltage=row['Voltage'],
-                        current=row['Current'],
-                        real_power=row['Real Power'],
-                        reactive_power=row['Reactive Power'],
-                        apparent_power=row['Apparent Power'],
-                        power_factor=row['Power Factor'],
-                        frequency=row['Frequency'],
-                        thd=row['THD'],
-                        real_power_watt=row['Real Power (W)'],
-                        cluster=int(row['Cluster']),
-                        device_state=row['Device_State']
-                    ) for _, row in batch.iterrows()
-                ]
+        with tqdm(desc="Importing", unit="rows") as pbar:
+            for chunk in _read_chunks(file_path, batch_size, limit):
+                read_count += len(chunk)
+                df = prepare_frame(chunk)
                 try:
-                    db.bulk_save_objects(records)
-                    db.commit()
-                    success_count += len(records)
+                    if fast:
+                        with engine.begin() as conn:
+                            success_count += ingest_frame(conn, df)
+                    else:
+                        with SessionLocal() as db:
+                            db.bulk_save_objects([ElectricalData(**record) for record in frame_to_records(df)])
+                            refresh_rollups(db.connection(), df['timestamp'].min(), df['timestamp'].max(), clusters=df['cluster'].unique())
+                            db.commit()
+                            success_count += len(df)
                 except IntegrityError as e:
-                    db.rollback()
                     logger.error(f"Batch failed due to integrity error: {e}")
                 except Exception as e:
-                    db.rollback()
                     logger.error(f"Batch failed: {e}")
-                pbar.update(len(batch))
+                pbar.update(len(chunk))
+                pbar.set_postfix(rows_per_sec=int(success_count / (time.perf_counter() - started)))
 
-        logger.info(f"✅ Success: {success_count}/{len(df)} rows")
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"✅ Success: {success_count}/{read_count} rows in {elapsed:.1f}s "
+            f"({success_count / elapsed if elapsed else 0:,.0f} rows/s)"
+        )
         return success_count
 
     except Exception as e:
         logger.error(f"❌ Fatal error: {e}")
-        return 0
-    finally:
-        if db:
-            db.close()
+        return success_count
 
 if __name__ == "__main__":
-    import sys
-
     if len(sys.argv) > 1:
         file_path = sys.argv[1]
     else:
         file_path = input("Enter the path to your CSV file: ").strip().strip('"')
 
     limit = None
-    batch_size = 1000
+    batch_size = 100000
+    fast = "--orm" not in sys.argv[2:]
 
     print(f"Starting import from: {file_path}")
-    rows_imported = import_csv_data(file_path, limit, batch_size)
+    rows_imported = import_csv_data(file_path, limit, batch_size, fast)
     print(f"Import complete. {rows_imported} rows imported successfully.")
@@ -0,0 +1,158 @@
+import sys
+import os
+import glob
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def expand_sources(sources):
+    """Turn directories and glob patterns into a sorted list of CSV files"""
+    files = set()
+    for source in sources:
+        if os.path.isdir(source):
+            files.update(glob.glob(os.path.join(source, "**", "*.csv"), recursive=True))
+        else:
+            files.update(glob.glob(source, recursive=True))
+    return sorted(os.path.abspath(path) for path in files)
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def _init_worker():
+    # Pooled connections inherited from the parent process must not be shared
+    from app.database import engine
+    engine.dispose(close=False)
+
+def ingest_file(path, chunk_size):
+    """
+    Import one capture file, committing each chunk together with its checkpoint
+    Completed chunks are skipped on rerun; a changed file (size/mtime) starts over.
+    Returns:
+        (path, rows_read, rows_inserted, chunks_skipped)
+    """
+    import pandas as pd
+    from sqlalchemy import select, func, insert, update
+    from app.database import engine
+    from app.models.ingest import IngestFile, IngestChunk
+    from app.services.ingest_service import CSV_DTYPES, prepare_frame, ingest_frame
+
+    fingerprint = _fingerprint(path)
+    with engine.begin() as conn:
+        ingest_file_row = conn.execute(
+            select(IngestFile).where(IngestFile.path == path, IngestFile.fingerprint == fingerprint)
+        ).first()
+        if ingest_file_row is None:
+            file_id = conn.execute(
+                insert(IngestFile).values(path=path, fingerprint=fingerprint, chunk_size=chunk_size)
+            ).inserted_primary_key[0]
+        elif ingest_file_row.status == "complete":
+            return path, 0, 0, None
+        else:
+            file_id = ingest_file_row.id
+            # Chunk boundaries must match the interrupted run
+            chunk_size = ingest_file_row.chunk_size
+
+        done_chunks = set(conn.execute(
+            select(IngestChunk.chunk_index).where(IngestChunk.file_id == file_id)
+        ).scalars())
+
+    # Chunks commit in order, so completed work is a prefix we can skip without parsing
+    resume_from = 0
+    while resume_from in done_chunks:
+        resume_from += 1
+
+    reader = pd.read_csv(
+        path,
+        parse_dates=['DateTime'],
+        dtype=CSV_DTYPES,
+        chunksize=chunk_size,
+        skiprows=range(1, resume_from * chunk_size + 1)
+    )
+
+    rows_read = rows_inserted = 0
+    for chunk_index, chunk in enumerate(reader, start=resume_from):
+        if chunk_index in done_chunks:
+            continue
+        df = prepare_frame(chunk)
+        with engine.begin() as conn:
+            inserted = ingest_frame(conn, df)
+            conn.execute(insert(IngestChunk).values(
+                file_id=file_id,
+                chunk_index=chunk_index,
+                rows_read=len(chunk),
+                rows_inserted=inserted
+            ))
+        rows_read += len(chunk)
+        rows_inserted += inserted
+
+    with engine.begin() as conn:
+        total = conn.execute(
+            select(func.coalesce(func.sum(IngestChunk.rows_inserted), 0)).where(IngestChunk.file_id == file_id)
+        ).scalar()
+        conn.execute(
+            update(IngestFile).where(IngestFile.id == file_id).values(
+                status="complete", rows_inserted=total, completed_at=func.now()
+            )
+        )
+
+    return path, rows_read, rows_inserted, resume_from
+
+def ingest_captures(sources, workers=None, chunk_size=100000):
+    """Ingest many capture files in parallel; safe to rerun after an interruption"""
+    from app.database import Base, engine
+    from app.models import ingest  # noqa: F401  (registers checkpoint tables)
+    from app.models.electrical_data import ElectricalData  # noqa: F401
+    from app.models.rollup import ElectricalDataRollup  # noqa: F401
+    from app.services.ingest_service import ensure_indexes
+
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
+    # Workers open their own connections
+    engine.dispose()
+
+    files = expand_sources(sources)
+    if not files:
+        logger.warning("No capture files found")
+        return 0
+
+    started = time.perf_counter()
+    total_inserted = 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker) as pool:
+        futures = {pool.submit(ingest_file, path, chunk_size): path for path in files}
+        for future in as_completed(futures):
+            try:
+                path, rows_read, rows_inserted, skipped = future.result()
+            except Exception as e:
+                logger.error(f"❌ {futures[future]} failed, rerun to resume: {e}")
+                continue
+            total_inserted += rows_inserted
+            if skipped is None:
+                logger.info(f"Skipped {path} (already complete)")
+            else:
+                logger.info(
+                    f"{path}: {rows_inserted}/{rows_read} new rows"
+                    + (f", resumed after {skipped} chunks" if skipped else "")
+                )
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"✅ Ingested {total_inserted} rows from {len(files)} files in {elapsed:.1f}s "
+        f"({total_inserted / elapsed if elapsed else 0:,.0f} rows/s)"
+    )
+    return total_inserted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel, resumable ingest of NILM capture CSVs")
+    parser.add_argument("sources", nargs="+", help="CSV files, directories or glob patterns")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=100000, help="Rows per committed chunk")
+    args = parser.parse_args()
+
+    ingest_captures(args.sources, workers=args.workers, chunk_size=args.chunk_size)
@@ -0,0 +1,26 @@
+import sys
+import os
+import time
+import logging
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def rebuild():
+    """Backfill electrical_data_rollups for data imported before rollups existed"""
+    from app.database import Base, engine
+    from app.models.electrical_data import ElectricalData  # noqa: F401
+    from app.models.rollup import ElectricalDataRollup  # noqa: F401
+    from app.services.rollup_service import rebuild_rollups
+
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        written = rebuild_rollups(conn)
+    logger.info(f"✅ Wrote {written} rollup rows in {time.perf_counter() - started:.1f}s")
+    return written
+
+if __name__ == "__main__":
+    rebuild()
@@ -0,0 +1,170 @@
+import sys
+import os
+import json
+import math
+import time
+import argparse
+import logging
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Appliances assigned to clusters in turn:
+# (device_state, on watts, standby watts, mean on seconds, mean off seconds, power factor when on, THD %)
+APPLIANCES = [
+    ("Heater", 1500.0, 0.0, 1800, 3600, 0.99, 2.0),
+    ("Fridge", 120.0, 2.0, 900, 1500, 0.85, 8.0),
+    ("Laptop", 65.0, 1.0, 5400, 7200, 0.95, 14.0),
+    ("Television", 110.0, 0.5, 3600, 10800, 0.93, 12.0),
+    ("Kettle", 2000.0, 0.0, 180, 7200, 1.0, 1.5),
+    ("Washing Machine", 500.0, 1.0, 3600, 36000, 0.8, 10.0),
+]
+
+def _switch_times(rng: np.random.Generator, mean_on: float, mean_off: float, seconds: float) -> np.ndarray:
+    """Times at which an appliance toggles, starting off, covering [0, seconds]"""
+    # Alternate off and on durations until the whole range is covered
+    means = np.array([mean_off, mean_on])
+    switches = np.empty(0)
+    while not switches.size or switches[-1] <= seconds:
+        count = max(16, int(2 * seconds / (mean_on + mean_off)) + 2)
+        durations = rng.exponential(np.tile(means, count // 2 + 1)[:count])
+        last = switches[-1] if switches.size else 0.0
+        switches = np.concatenate((switches, last + np.cumsum(durations)))
+        if switches.size % 2:
+            switches = switches[:-1]  # Keep the off/on alternation aligned across extensions
+    return switches
+
+def generate_samples(
+    clusters: int = 4,
+    rate: float = 1.0,
+    days: float = 1.0,
+    start: Optional[datetime] = None,
+    seed: int = 0,
+    chunk_rows: int = 500000,
+    rows: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Deterministic synthetic samples in the prepared-frame layout, in time order
+    Each cluster is an appliance from APPLIANCES switching between on and standby
+    with exponentially distributed durations, plus measurement noise. The same
+    arguments always produce the same rows.
+    Args:
+        rate: samples per second per cluster
+        days: length of the series; ignored when rows is given
+        start: first timestamp (default: the series ends now)
+        rows: exact number of rows to produce
+    Yields:
+        frames of at most chunk_rows rows
+    """
+    total_rows = rows if rows is not None else int(clusters * rate * days * 86400)
+    steps = math.ceil(total_rows / clusters)
+    seconds = steps / rate
+    if start is None:
+        start = datetime.now().replace(microsecond=0) - timedelta(seconds=seconds)
+
+    appliances = [APPLIANCES[cluster % len(APPLIANCES)] for cluster in range(clusters)]
+    switches = [
+        _switch_times(np.random.default_rng([seed, cluster]), mean_on, mean_off, seconds)
+        for cluster, (_, _, _, mean_on, mean_off, _, _) in enumerate(appliances)
+    ]
+    on_watts = np.array([appliance[1] for appliance in appliances])
+    standby_watts = np.array([appliance[2] for appliance in appliances])
+    on_pf = np.array([appliance[5] for appliance in appliances])
+    base_thd = np.array([appliance[6] for appliance in appliances])
+    names = np.array([appliance[0] for appliance in appliances], dtype=object)
+    start_ns = pd.Timestamp(start).value
+
+    block_steps = max(1, chunk_rows // clusters)
+    produced = 0
+    for block, first in enumerate(range(0, steps, block_steps)):
+        count = min(block_steps, steps - first)
+        offsets = (first + np.arange(count)) / rate  # Seconds since start, shared by all clusters
+        # An odd number of switches before t means the appliance is on
+        on = np.stack([np.searchsorted(times, offsets, side="right") % 2 == 1 for times in switches], axis=1)
+
+        noise = np.random.default_rng([seed, 1_000_003, block]).standard_normal((5, count, clusters))
+        power = np.where(on, on_watts, standby_watts) * (1 + 0.02 * noise[0])
+        power = np.maximum(power, 0.0)
+        power_factor = np.clip(np.where(on, on_pf, 0.5) + 0.01 * noise[1], 0.05, 1.0)
+        voltage = 230.0 + 2.0 * noise[2]
+        apparent = power / power_factor
+        frame = pd.DataFrame({
+            'timestamp': pd.to_datetime(np.repeat(start_ns + np.round(offsets * 1e9).astype(np.int64), clusters)),
+            'voltage': voltage.ravel(),
+            'current': (apparent / voltage).ravel(),
+            'real_power': power.ravel(),
+            'reactive_power': np.sqrt(np.maximum(apparent ** 2 - power ** 2, 0.0)).ravel(),
+            'apparent_power': apparent.ravel(),
+            'power_factor': power_factor.ravel(),
+            'frequency': (50.0 + 0.02 * noise[3]).ravel(),
+            'thd': np.abs(base_thd + 0.5 * noise[4]).ravel(),
+            'real_power_watt': power.ravel(),
+            'cluster': np.tile(np.arange(clusters), count),
+            'device_state': np.tile(names, count),
+        })
+        frame = frame.iloc[:total_rows - produced]
+        produced += len(frame)
+        yield frame
+
+def populate(chunks: Iterator[pd.DataFrame]) -> dict:
+    """Insert generated chunks through the regular import path; returns row count and timings"""
+    from app.database import Base, engine
+    from app.models.electrical_data import ElectricalData  # noqa: F401
+    from app.services.ingest_service import ensure_indexes, ingest_frame
+
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes(engine)
+    inserted, first, last = 0, None, None
+    started = time.perf_counter()
+    for chunk in chunks:
+        with engine.begin() as conn:
+            inserted += ingest_frame(conn, chunk)
+        first = first if first is not None else chunk['timestamp'].iloc[0]
+        last = chunk['timestamp'].iloc[-1]
+        logger.info(f"Inserted {inserted} rows")
+    seconds = time.perf_counter() - started
+    return {
+        "rows": inserted,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(inserted / seconds, 1) if seconds else None,
+        "start": first.isoformat() if first is not None else None,
+        "end": last.isoformat() if last is not None else None,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic electrical samples")
+    parser.add_argument("--clusters", type=int, default=4, help="Number of appliances (clusters)")
+    parser.add_argument("--rate", type=float, default=1.0, help="Samples per second per cluster")
+    parser.add_argument("--days", type=float, default=1.0, help="Length of the series in days")
+    parser.add_argument("--rows", type=int, help="Exact number of rows (overrides --days)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", type=datetime.fromisoformat, help="First timestamp (default: the series ends now)")
+    parser.add_argument("--chunk-rows", type=int, default=500000, help="Rows generated and inserted at a time")
+    parser.add_argument("--csv", help="Write a CSV file instead of inserting into DATABASE_URL")
+    args = parser.parse_args()
+
+    chunks = generate_samples(
+        clusters=args.clusters, rate=args.rate, days=args.days, start=args.start,
+        seed=args.seed, chunk_rows=args.chunk_rows, rows=args.rows
+    )
+    if args.csv:
+        from app.services.ingest_service import CSV_COLUMNS
+
+        # Capture headers, so the file loads with scripts/import_csv_data.py
+        headers = {column: header for header, column in CSV_COLUMNS.items()}
+        written = 0
+        for i, chunk in enumerate(chunks):
+            chunk.rename(columns=headers).to_csv(args.csv, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            written += len(chunk)
+        summary = {"rows": written, "csv": args.csv}
+    else:
+        summary = populate(chunks)
+    logger.info(f"✅ {summary}")
+    # Last line of output, for scripts/benchmark_api.py
+    print(json.dumps(summary))
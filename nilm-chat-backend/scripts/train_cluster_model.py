@@ -0,0 +1,38 @@
+import sys
+import os
+import time
+import logging
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def train(chunk_size=500000):
+    """Learn cluster centroids from the stored samples and save them for the ingest API"""
+    from app.config import settings
+    from app.database import engine
+    from app.services.cluster_model import ClusterModel, FEATURES, history_chunks
+
+    started = time.perf_counter()
+    with engine.connect() as conn:
+        model = ClusterModel.fit(history_chunks(conn, chunk_size))
+    model.save(settings.CLUSTER_MODEL_PATH)
+    logger.info(
+        f"✅ Saved {len(model.clusters)} centroids to {settings.CLUSTER_MODEL_PATH} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+    # How often the nearest centroid agrees with the stored label
+    agree = total = 0
+    with engine.connect() as conn:
+        for chunk in history_chunks(conn, chunk_size):
+            chunk = chunk.dropna(subset=FEATURES + ["cluster"])
+            nearest, _ = model.assign(chunk[FEATURES].to_numpy())
+            agree += int((model.clusters[nearest] == chunk["cluster"].to_numpy()).sum())
+            total += len(chunk)
+    logger.info(f"Nearest centroid matches the stored cluster for {agree / max(total, 1):.1%} of {total} samples")
+    return model
+
+if __name__ == "__main__":
+    train()
@@ -8,6 +8,9 @@ import uuid
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app.main import app
+from app.database import engine
+from app.models.electrical_data import ElectricalData
+from app.models.rollup import ElectricalDataRollup
 
 client = TestClient(app)
 
@@ -64,4 +67,107 @@ def test_chat_endpoint():
     # Should have at least two messages (user and assistant)
     assert len(history) >= 2
     assert history[0]["role"] == "user"
-    assert history[1]["role"] == "assistant"
\ No newline at end of file
+    assert history[1]["role"] == "assistant"
+
+def test_chat_stream_endpoint():
+    session_id = str(uuid.uuid4())
+    request_data = {
+        "message": "What's my current power usage?",
+        "session_id": session_id
+    }
+
+    response = client.post("/api/chat/stream", json=request_data)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: done" in response.text
+
+    # The finished reply is stored once, after the user message
+    history = client.get(f"/api/chat/history/{session_id}").json()
+    assert [msg["role"] for msg in history] == ["user", "assistant"]
+
+def test_chat_stream_reports_generation_failures(monkeypatch):
+    from app.services.llm_service import llm_service
+
+    async def failing_stream(message, history):
+        yield "Partial"
+        raise RuntimeError("CUDA out of memory")
+
+    monkeypatch.setattr(llm_service, "stream_response", failing_stream)
+    session_id = str(uuid.uuid4())
+    response = client.post("/api/chat/stream", json={"message": "Hello", "session_id": session_id})
+    assert response.status_code == 200
+    assert "event: error" in response.text
+
+    # The user message is still stored
+    history = client.get(f"/api/chat/history/{session_id}").json()
+    assert [msg["role"] for msg in history] == ["user"]
+
+def test_invalidate_response_cache():
+    response = client.delete("/api/chat/cache")
+    assert response.status_code == 204
+
+def test_export_endpoint():
+    response = client.get("/api/export/?format=csv&columns=timestamp,cluster&cluster=1")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines()[0] == "timestamp,cluster"
+
+    response = client.get("/api/export/?columns=not_a_column")
+    assert response.status_code == 400
+
+    response = client.get("/api/export/?format=csv&columns=cluster&cluster=1,99")
+    assert response.status_code == 200
+    assert set(response.text.splitlines()[1:]) <= {"1", "99"}
+
+    response = client.get("/api/export/?cluster=one")
+    assert response.status_code == 400
+
+def test_recent_metrics_pagination():
+    response = client.get("/api/metrics/recent?limit=5")
+    assert response.status_code == 200
+    assert len(response.json()) <= 5
+
+    cursor = response.headers.get("X-Next-Cursor")
+    if cursor:
+        older = client.get(f"/api/metrics/recent?limit=5&cursor={cursor}").json()
+        assert older[0]["timestamp"] <= response.json()[-1]["timestamp"]
+
+    assert client.get("/api/metrics/by-cluster/1?cursor=not-a-cursor").status_code == 400
+
+def test_chat_history_unknown_session():
+    session_id = str(uuid.uuid4())
+    assert client.get(f"/api/chat/history/{session_id}?limit=10").status_code == 404
+    assert client.get(f"/api/chat/history/{session_id}?cursor=not-a-cursor").status_code == 400
+
+@pytest.fixture
+def ingest_cluster():
+    """Cluster the ingest test writes to; its samples and rollups are deleted afterwards"""
+    yield 99
+    with engine.begin() as conn:
+        conn.execute(ElectricalData.__table__.delete().where(ElectricalData.cluster == 99))
+        conn.execute(ElectricalDataRollup.__table__.delete().where(ElectricalDataRollup.cluster == 99))
+
+def test_ingest_endpoint(ingest_cluster):
+    sample = {
+        "timestamp": "2020-01-01T00:00:00Z", "voltage": 230.0, "current": 1.0, "real_power": 100.0,
+        "reactive_power": 5.0, "apparent_power": 101.0, "power_factor": 0.99, "frequency": 50.0,
+        "thd": 2.0, "real_power_watt": 100.0, "cluster": ingest_cluster, "device_state": "Test"
+    }
+    response = client.post("/api/ingest/?wait=true", json=[sample, sample])
+    assert response.status_code == 200
+    assert response.json()["accepted"] == 1
+    assert response.json()["dropped"] == 1
+
+    response = client.post("/api/ingest/", content='{"voltage": "high"}\n', headers={"content-type": "application/x-ndjson"})
+    assert response.status_code == 422
+
+    # frequency is optional
+    without_frequency = {**sample, "timestamp": "2020-01-01T00:00:01Z"}
+    del without_frequency["frequency"]
+    response = client.post("/api/ingest/?wait=true", json=[without_frequency])
+    assert response.json()["accepted"] == 1
+
+    # Nothing left to write after cleaning
+    response = client.post("/api/ingest/?wait=true", json=[{**sample, "real_power_watt": "NaN"}])
+    assert response.status_code == 200
+    assert response.json() == {"accepted": 0, "dropped": 1}
@@ -0,0 +1,61 @@
+import sys
+import os
+import asyncio
+import pandas as pd
+import torch
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.ingest_service import INSERT_COLUMNS, prepare_frame
+from app.services.inference_backends import STUB_REPLY, load_backend
+from scripts.synthetic_data import generate_samples
+from scripts.benchmark_api import parse_size, run_scenario, compare
+
+def test_synthetic_samples_are_deterministic_and_ready_to_insert():
+    start = pd.Timestamp('2024-01-01')
+    first = pd.concat(generate_samples(clusters=3, rate=0.1, rows=10001, start=start, chunk_rows=4000))
+    second = pd.concat(generate_samples(clusters=3, rate=0.1, rows=10001, start=start, chunk_rows=4000))
+
+    pd.testing.assert_frame_equal(first, second)
+    assert len(first) == 10001
+    assert list(first.columns) == INSERT_COLUMNS
+    assert first['timestamp'].is_monotonic_increasing
+    assert first['timestamp'].iloc[-1] - start == pd.Timedelta(seconds=33330)
+    # Nothing is dropped by the import path's cleaning and deduplication
+    assert len(prepare_frame(first)) == len(first)
+    # Appliances really switch on and off
+    heater = first.loc[first['device_state'] == 'Heater', 'real_power_watt']
+    assert heater.min() < 10 and heater.max() > 1000
+
+def test_stub_backend_answers_without_model_weights():
+    model, tokenizer, stats = load_backend("stub", "unused", torch.device("cpu"))
+    prompts = [tokenizer("USER: which device uses most?").input_ids, tokenizer("hi").input_ids]
+    inputs = tokenizer.pad({"input_ids": prompts}, return_tensors="pt")
+
+    outputs = model.generate(input_ids=inputs.input_ids, attention_mask=inputs.attention_mask, max_new_tokens=64)
+
+    assert tokenizer.batch_decode(outputs, skip_special_tokens=True) == [STUB_REPLY] * 2
+    assert stats.backend == "stub"
+
+def test_run_scenario_reports_latency_and_errors():
+    class Response:
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    async def send(i):
+        await asyncio.sleep(0.001)
+        return Response(500 if i == 3 else 200)
+
+    stats = asyncio.run(run_scenario(send, requests=20, concurrency=4, warmup=2))
+
+    assert (stats["requests"], stats["errors"]) == (19, 1)
+    assert 0 < stats["p50_ms"] <= stats["p95_ms"] <= stats["max_ms"]
+    assert parse_size("10k") == 10_000 and parse_size("100M") == 100_000_000
+
+def test_compare_flags_latency_regressions():
+    def results(p95):
+        return {"sizes": [{"rows": 1000, "endpoints": {"devices": {"p50_ms": 10.0, "p95_ms": p95}}}]}
+
+    assert compare(results(11.0), results(10.0), tolerance=0.2) == []
+    assert compare(results(13.0), results(10.0), tolerance=0.2) == ["devices @ 1000 rows: p95_ms 10.0 -> 13.0"]
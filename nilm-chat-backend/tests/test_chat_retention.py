@@ -0,0 +1,47 @@
+import sys
+import os
+import gzip
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert, select, func
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import Base
+from app.models.chat import ChatSession, ChatMessage
+from app.services.chat_retention import purge_inactive_sessions, trim_long_sessions
+
+def _engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    now = datetime(2024, 6, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(ChatSession), [
+            {"session_id": f"old{i}", "created_at": now, "last_active": now - timedelta(days=100)} for i in range(3)
+        ] + [{"session_id": "new", "created_at": now, "last_active": now}])
+        conn.execute(insert(ChatMessage), [
+            {"session_id": f"old{i}", "role": "user", "content": "hi", "timestamp": now - timedelta(days=100)} for i in range(3)
+        ] + [
+            {"session_id": "new", "role": "user", "content": f"m{i}", "timestamp": now + timedelta(seconds=i)} for i in range(10)
+        ])
+    return engine
+
+def test_purge_archives_inactive_sessions(tmp_path):
+    engine = _engine()
+    purged = purge_inactive_sessions(engine, datetime(2024, 5, 1), str(tmp_path), batch_size=2)
+    assert sorted(purged) == ["old0", "old1", "old2"]
+
+    with engine.connect() as conn:
+        assert conn.scalars(select(ChatSession.session_id)).all() == ["new"]
+        assert conn.scalar(select(func.count()).select_from(ChatMessage)) == 10
+    archived = [line for path in tmp_path.iterdir() for line in gzip.open(path, "rt")]
+    assert len(archived) == 3
+
+def test_trim_keeps_newest_messages():
+    engine = _engine()
+    assert trim_long_sessions(engine, max_messages=4, archive_dir=None) == 6
+    with engine.connect() as conn:
+        kept = conn.scalars(
+            select(ChatMessage.content).where(ChatMessage.session_id == "new").order_by(ChatMessage.timestamp)
+        ).all()
+    assert kept == ["m6", "m7", "m8", "m9"]
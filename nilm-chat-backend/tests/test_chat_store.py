@@ -0,0 +1,104 @@
+import sys
+import os
+import asyncio
+from collections import deque
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.chat_store import ChatStore
+
+class _MemoryChatStore(ChatStore):
+    def __init__(self, **kwargs):
+        super().__init__(history_size=4, max_sessions=2, queue_size=10, **kwargs)
+        self.loads = 0
+        self.transactions = []
+
+    async def _load_history(self, session_id):
+        self.loads += 1
+        return deque(maxlen=self.history_size)
+
+    async def _write(self, records):
+        self.transactions.append([(turn.session_id, turn.user_message, reply) for turn, reply, _ in records])
+
+def test_cached_session_skips_history_query():
+    async def run():
+        store = _MemoryChatStore(write_behind=False)
+        turn, history = await store.start_turn("a", "hello")
+        assert history == [("user", "hello")]
+        await store.finish_turn(turn, "hi")
+
+        turn, history = await store.start_turn("a", "again")
+        assert history == [("user", "hello"), ("assistant", "hi"), ("user", "again")]
+        await store.finish_turn(turn, None)
+        assert store.loads == 1
+        assert store.transactions == [[("a", "hello", "hi")], [("a", "again", None)]]
+
+        # Least recently used session is evicted past max_sessions
+        await store.start_turn("b", "x")
+        await store.start_turn("c", "y")
+        await store.start_turn("a", "z")
+        assert store.loads == 4
+
+    asyncio.run(run())
+
+def test_write_behind_groups_queued_turns():
+    async def run():
+        store = _MemoryChatStore(write_behind=True)
+        for session_id in ("a", "b", "c"):
+            turn, _ = await store.start_turn(session_id, "hello")
+            await store.finish_turn(turn, "hi")
+        assert store.transactions == []
+
+        await store.flush()
+        assert store.transactions == [[("a", "hello", "hi"), ("b", "hello", "hi"), ("c", "hello", "hi")]]
+        await store.stop()
+
+    asyncio.run(run())
+
+def test_failed_write_behind_batch_is_retried():
+    class _FlakyChatStore(_MemoryChatStore):
+        failures = 1
+
+        async def _write(self, records):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("database is locked")
+            await super()._write(records)
+
+    async def run():
+        store = _FlakyChatStore(write_behind=True)
+        turn, _ = await store.start_turn("a", "hello")
+        await store.finish_turn(turn, "hi")
+
+        await asyncio.wait_for(store.flush(), timeout=5)
+        assert store.transactions == [[("a", "hello", "hi")]]
+        stats = store.get_stats()
+        assert (stats["write_failures"], stats["retry_delay"]) == (1, 0.0)
+        # The cached history still has the turn
+        _, history = await store.start_turn("a", "again")
+        assert history[:2] == [("user", "hello"), ("assistant", "hi")]
+        await store.stop()
+
+    asyncio.run(run())
+
+def test_concurrent_first_turns_of_a_session_are_all_written():
+    import uuid
+    from sqlalchemy import select, func
+    from app.database import AsyncSessionLocal, Base, engine
+    from app.models.chat import ChatMessage
+
+    Base.metadata.create_all(bind=engine)
+
+    async def run():
+        store = ChatStore(history_size=10, max_sessions=10, write_behind=False, queue_size=10)
+        session_id = str(uuid.uuid4())
+        turns = [await store.start_turn(session_id, f"message {i}") for i in range(4)]
+        await asyncio.gather(*(store.finish_turn(turn, "reply") for turn, _ in turns))
+
+        async with AsyncSessionLocal() as db:
+            stored = await db.scalar(select(func.count()).where(ChatMessage.session_id == session_id))
+        assert stored == 8
+        assert len(store._histories[session_id]) == 8
+
+    asyncio.run(run())
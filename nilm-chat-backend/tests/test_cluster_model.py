@@ -0,0 +1,83 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.cluster_model import ClusterModel, ClusterEngine, FEATURES
+
+# (cluster, device_state, real_power_watt, reactive_power, power_factor, thd)
+_DEVICES = [(3, "Heater", 2000.0, 50.0, 0.99, 2.0), (7, "Laptop", 60.0, 30.0, 0.6, 40.0), (9, "Fridge", 150.0, 120.0, 0.8, 8.0)]
+
+def _history(rows_per_device=500, seed=0):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for cluster, state, *means in _DEVICES:
+        values = np.asarray(means) * (1 + 0.05 * rng.standard_normal((rows_per_device, len(FEATURES))))
+        frame = pd.DataFrame(values, columns=FEATURES)
+        frame["cluster"], frame["device_state"] = cluster, state
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+def test_fit_and_assign_recover_labels(tmp_path):
+    history = _history()
+    # Chunked fitting gives the same model as one pass
+    model = ClusterModel.fit([history.iloc[:700], history.iloc[700:]])
+    assert list(model.clusters) == [3, 7, 9]
+    assert model.device_states == ["Heater", "Laptop", "Fridge"]
+
+    nearest, distances = model.assign(history[FEATURES].to_numpy())
+    assert (model.clusters[nearest] == history["cluster"].to_numpy()).all()
+    assert (distances >= 0).all()
+
+    path = str(tmp_path / "model.npz")
+    model.save(path)
+    loaded = ClusterModel.load(path)
+    np.testing.assert_allclose(loaded.centroids, model.centroids)
+    assert loaded.device_states == model.device_states
+
+def test_engine_labels_only_missing_rows(tmp_path):
+    engine = ClusterEngine(path=str(tmp_path / "model.npz"), online_updates=True)
+    engine.set_model(ClusterModel.fit([_history()]))
+    before = engine.model.centroids.copy()
+
+    samples = _history(rows_per_device=2, seed=1)
+    samples["cluster"] = pd.array([None, 1, None, None, None, 5], dtype="Int64")
+    samples.loc[[0, 2], "device_state"] = None
+    labelled = engine.label(samples)
+
+    assert list(labelled["cluster"]) == [3, 1, 7, 7, 9, 5]
+    assert list(labelled["device_state"]) == ["Heater", "Heater", "Laptop", "Laptop", "Fridge", "Fridge"]
+    assert not np.allclose(engine.model.centroids, before)  # Online update moved the centroids
+
+def test_engine_fills_only_the_missing_column(tmp_path):
+    engine = ClusterEngine(path=str(tmp_path / "model.npz"), online_updates=False)
+    engine.set_model(ClusterModel.fit([_history()]))
+
+    # Heater-like readings throughout
+    samples = _history(rows_per_device=1, seed=4).iloc[[0, 0, 0]].reset_index(drop=True)
+    samples["cluster"] = pd.array([9, 42, None], dtype="Int64")
+    samples["device_state"] = [None, None, "Space heater"]
+    labelled = engine.label(samples)
+
+    # A known cluster names its own state, an unknown one falls back to the nearest centroid
+    assert list(labelled["cluster"]) == [9, 42, 3]
+    assert list(labelled["device_state"]) == ["Fridge", "Heater", "Space heater"]
+
+def test_engine_skips_non_finite_samples(tmp_path):
+    engine = ClusterEngine(path=str(tmp_path / "model.npz"), online_updates=True)
+    engine.set_model(ClusterModel.fit([_history()]))
+
+    samples = _history(rows_per_device=1, seed=2)
+    samples["cluster"] = pd.array([None] * 3, dtype="Int64")
+    samples["device_state"] = None
+    samples.loc[0, "real_power_watt"] = np.nan
+    samples.loc[1, "thd"] = np.inf
+    labelled = engine.label(samples)
+
+    assert labelled["cluster"].isna().tolist() == [True, True, False]
+    assert np.isfinite(engine.model.centroids).all()
+    # Later samples still reach their own centroid
+    assert list(engine.label(_history(rows_per_device=1, seed=3).assign(cluster=None))["cluster"]) == [3, 7, 9]
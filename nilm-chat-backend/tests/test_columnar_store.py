@@ -0,0 +1,110 @@
+import sys
+import os
+from datetime import datetime
+import pytest
+import pandas as pd
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip("pyarrow")
+
+from app.services.columnar_store import ColumnarStore
+from app.services.ingest_service import INSERT_COLUMNS
+
+def _samples(start, rows, cluster):
+    df = pd.DataFrame({
+        'timestamp': pd.date_range(start, periods=rows, freq='h'),
+        'voltage': 230.0,
+        'current': 1.0,
+        'real_power': 100.0,
+        'reactive_power': 10.0,
+        'apparent_power': 110.0,
+        'power_factor': 0.9,
+        'frequency': 50.0,
+        'thd': 2.0,
+        'real_power_watt': [100.0 * (i + 1) for i in range(rows)],
+        'cluster': cluster,
+        'device_state': 'Heater' if cluster == 1 else 'Fridge',
+    })
+    return df[INSERT_COLUMNS]
+
+def test_write_partitions_and_dedups(tmp_path):
+    store = ColumnarStore(str(tmp_path), partition="day")
+    df = pd.concat([_samples('2024-01-01 22:00', 4, 1), _samples('2024-01-01 22:00', 4, 2)])
+
+    assert store.write_frame(df) == 8
+    assert store.partitions() == ['2024-01-01', '2024-01-02']
+    # Already stored samples are skipped
+    assert store.write_frame(df) == 0
+    assert store.write_frame(_samples('2024-01-02 01:00', 2, 1)) == 1
+
+    assert store.compact('2024-01-02') == (2, 5)
+    assert store.scan().num_rows == 9
+
+def test_range_scan_and_aggregate(tmp_path):
+    store = ColumnarStore(str(tmp_path), partition="day")
+    store.write_frame(pd.concat([_samples('2024-01-01', 48, 1), _samples('2024-01-01', 48, 2)]))
+
+    table = store.scan(start=datetime(2024, 1, 2), clusters=[2], columns=['timestamp', 'real_power_watt'])
+    assert table.num_rows == 24
+    assert table.column_names == ['timestamp', 'real_power_watt']
+    assert sum(batch.num_rows for batch in store.iter_batches(start=datetime(2024, 1, 2), clusters=[2], batch_size=5)) == 24
+
+    grouped = store.aggregate(start=datetime(2024, 1, 2), by=('cluster', 'device_state')).set_index('cluster')
+    assert grouped.loc[1, 'device_state'] == 'Heater'
+    assert grouped.loc[1, 'sample_count'] == 24
+    assert grouped.loc[1, 'power_sum'] == sum(100.0 * (i + 1) for i in range(24, 48))
+    assert store.latest_timestamp() == datetime(2024, 1, 2, 23)
+
+def test_writer_compacts_partitions_and_names_parts_in_publish_order(tmp_path):
+    store = ColumnarStore(str(tmp_path), partition="day", compact_files=2, compact_min_age=0)
+    for i in range(6):
+        store.write_frame(_samples(f'2024-01-01 0{i}:00', 1, 1))
+    assert len(store.files()) <= 3
+    assert store.scan().num_rows == 6
+
+    tailed = ColumnarStore(str(tmp_path / "tailed"), partition="day", compact_files=0)
+    published = []
+    for i in range(6):
+        tailed.write_frame(_samples(f'2024-01-01 0{i}:00', 1, 1))
+        published.append(tailed.newest_part())
+    assert published == sorted(published) and len(set(published)) == 6
+
+def test_concurrent_writers_store_each_sample_once(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = ColumnarStore(str(tmp_path), partition="day", compact_files=0)
+    df = pd.concat([_samples('2024-01-01 22:00', 4, 1), _samples('2024-01-01 22:00', 4, 2)])
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        written = list(pool.map(lambda _: ColumnarStore(str(tmp_path), partition="day", compact_files=0).write_frame(df), range(4)))
+    assert sum(written) == 8
+    assert store.scan().num_rows == 8
+
+def test_latest_pages_back_across_partitions(tmp_path):
+    store = ColumnarStore(str(tmp_path), partition="day")
+    store.write_frame(pd.concat([_samples('2024-01-01 22:00', 4, 1), _samples('2024-01-01 22:00', 4, 2)]))
+    store.write_frame(_samples('2024-01-02 01:00', 1, 2), dedup=False)  # A repeat not compacted yet
+
+    first = store.latest(3)
+    assert list(zip(first['timestamp'].dt.hour, first['cluster'])) == [(1, 2), (1, 1), (0, 2)]
+    older = store.latest(3, before=(first['timestamp'].iloc[-1], int(first['cluster'].iloc[-1])), cluster=1)
+    assert list(zip(older['timestamp'].dt.hour, older['cluster'])) == [(0, 1), (23, 1), (22, 1)]
+    assert store.latest(3, before=(datetime(2024, 1, 1, 22), 1)).empty
+
+def test_columnar_metrics_pages(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.api.endpoints import metrics
+
+    store = ColumnarStore(str(tmp_path), partition="day")
+    store.write_frame(pd.concat([_samples('2024-01-01 22:00', 4, 1), _samples('2024-01-01 22:00', 4, 2)]))
+    monkeypatch.setattr(metrics, "columnar_store", store)
+    client = TestClient(app)
+
+    response = client.get("/api/metrics/by-cluster/2?limit=3")
+    assert [row["timestamp"] for row in response.json()] == ['2024-01-02T01:00:00', '2024-01-02T00:00:00', '2024-01-01T23:00:00']
+    assert response.json()[0]["id"] is None
+    older = client.get(f"/api/metrics/by-cluster/2?limit=3&cursor={response.headers['X-Next-Cursor']}").json()
+    assert [row["timestamp"] for row in older] == ['2024-01-01T22:00:00']
+    assert len(client.get("/api/metrics/recent?limit=8").json()) == 8
@@ -0,0 +1,95 @@
+import sys
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import Base
+from app.models.electrical_data import ElectricalData
+from app.models.rollup import RollupCoverage
+from app.services import data_service
+from app.services.data_service import get_actual_devices
+from app.services.device_service import get_cluster_summaries, summary_cache
+from app.services.ingest_service import prepare_frame, ingest_frame
+from app.services.rollup_service import rebuild_rollups
+
+def _sample(seconds, cluster, device_state, power):
+    return ElectricalData(
+        timestamp=datetime(2024, 1, 1) + timedelta(seconds=seconds),
+        voltage=230.0, current=1.0, real_power=power, reactive_power=0.0,
+        apparent_power=power, power_factor=1.0, frequency=50.0, thd=2.0,
+        real_power_watt=power, cluster=cluster, device_state=device_state
+    )
+
+def test_cluster_summaries_pick_most_common_state_and_cache():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    summary_cache.invalidate()
+
+    with Session(engine) as db:
+        # Rows written without rollups, as in a database that predates them
+        db.execute(delete(RollupCoverage))
+        db.add_all([
+            _sample(0, 1, "Laptop", 100.0),
+            _sample(1, 1, "Heater", 200.0),
+            _sample(2, 1, "Heater", 300.0),
+            _sample(0, 2, "Fridge", 50.0),
+        ])
+        db.commit()
+
+        summaries = get_cluster_summaries(db)
+        assert [(s["cluster"], s["name"], s["typical_power"]) for s in summaries] == [
+            (1, "Heater", 200.0),
+            (2, "Fridge", 50.0),
+        ]
+        assert get_cluster_summaries(db) is summaries
+
+        # New rows change the data version, so the cached result is not reused
+        db.add(_sample(3, 1, "Laptop", 400.0))
+        db.commit()
+        assert get_cluster_summaries(db)[0]["typical_power"] == 250.0
+
+    summary_cache.invalidate()
+
+def _frame(start, seconds, power):
+    return prepare_frame(pd.DataFrame({
+        'timestamp': [start + timedelta(seconds=second) for second in seconds], 'voltage': 230.0, 'current': 1.0,
+        'real_power': power, 'reactive_power': 0.0, 'apparent_power': power, 'power_factor': 1.0,
+        'frequency': 50.0, 'thd': 2.0, 'real_power_watt': power, 'cluster': 1, 'device_state': 'Heater'
+    }))
+
+def test_rollups_are_read_only_where_they_cover_every_sample(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    summary_cache.invalidate()
+    now = datetime(2024, 1, 3, 12, 30, 30)
+    monkeypatch.setattr(data_service, "utcnow", lambda: now)
+
+    with Session(engine) as db:
+        # A sample stored without rollups before the coverage starts, then ingested ones
+        db.execute(delete(RollupCoverage))
+        db.add(_sample(0, 1, "Heater", 1000.0))
+        db.commit()
+        db.add(RollupCoverage(id=1, covered_from=datetime(2024, 1, 2)))
+        db.commit()
+        ingest_frame(db.connection(), _frame(now - timedelta(hours=3), [0, 1], 100.0))
+        # Around the start of a two hour window, inside its first partial minute: only the later sample counts
+        window_start = now - timedelta(hours=2)
+        ingest_frame(db.connection(), _frame(window_start, [-1, 1], 400.0))
+        db.commit()
+
+        assert get_cluster_summaries(db)[0]["typical_power"] == (1000 + 2 * 100 + 2 * 400) / 5
+        devices = get_actual_devices(db, hours=2)
+        assert [(device["cluster_id"], device["avg_power"]) for device in devices] == [(1, 400.0)]
+
+        # After a full backfill the rollups cover the older sample as well
+        rebuild_rollups(db.connection())
+        db.commit()
+        summary_cache.invalidate()
+        assert get_cluster_summaries(db)[0]["typical_power"] == (1000 + 2 * 100 + 2 * 400) / 5
+
+    summary_cache.invalidate()
@@ -0,0 +1,93 @@
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, func, select
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import Base
+from app.models.energy import EnergyPeriod
+from app.services.ingest_service import INSERT_COLUMNS, ingest_frame
+from app.services.energy_service import EnergyService, integrate_hours
+
+def _samples(timestamps, power, cluster=1):
+    df = pd.DataFrame({column: 1.0 for column in INSERT_COLUMNS}, index=range(len(timestamps)))
+    df['timestamp'] = pd.to_datetime(timestamps)
+    df['real_power_watt'] = power
+    df['cluster'] = cluster
+    df['device_state'] = 'Heater'
+    return df[INSERT_COLUMNS]
+
+def test_integrate_hours_uses_irregular_spacing_and_skips_gaps():
+    samples = _samples(
+        ['2024-01-01 00:59:50', '2024-01-01 01:00:00', '2024-01-01 01:00:30', '2024-01-01 02:00:00'],
+        [100.0, 200.0, 200.0, 50.0]
+    )
+    hours = integrate_hours(samples, datetime(2024, 1, 1, 1), datetime(2024, 1, 1, 3), max_gap=60)
+
+    # The interval ending at 01:00:00 starts before the range but counts in its ending hour
+    assert np.isclose(hours.loc[(pd.Timestamp('2024-01-01 01:00'), 1), 'energy_wh'], (150 * 10 + 200 * 30) / 3600)
+    # The 59.5 minute silence before 02:00 is not integrated
+    assert hours.loc[(pd.Timestamp('2024-01-01 02:00'), 1), 'energy_wh'] == 0
+    assert hours['sample_count'].sum() == 3
+
+def test_totals_are_cached_and_refreshed_by_late_samples():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    service = EnergyService(max_gap=120, read_hours=24)
+    now = datetime(2024, 2, 10, 12)
+    # 1 kW for a minute every day of January, for two clusters
+    days = pd.date_range('2024-01-01', periods=31, freq='D')
+    minute = pd.to_timedelta(np.arange(0, 61, 10), unit='s')
+    timestamps = (days.values[:, None] + minute.values[None, :]).ravel()
+    with engine.begin() as conn:
+        for cluster in (1, 2):
+            ingest_frame(conn, _samples(timestamps, 1000.0, cluster))
+
+    months = service.totals('month', datetime(2024, 1, 1), now=now, bind=engine)
+    # February is still open and has no samples
+    assert [(row['period_start'].month, row['cluster_id'], row['complete']) for row in months] == [(1, 1, True), (1, 2, True)]
+    assert np.isclose(months[0]['energy_kwh'], 31 / 60)
+    with engine.connect() as conn:
+        assert conn.scalar(select(func.count()).select_from(EnergyPeriod).where(EnergyPeriod.period == 'month')) == 1
+
+    weeks = service.totals('week', datetime(2024, 1, 1), datetime(2024, 1, 8), clusters=[2], now=now, bind=engine)
+    assert [(row['cluster_id'], row['sample_count']) for row in weeks] == [(2, 7 * 7)]
+
+    # A late sample extends January 15th by ten seconds at 1 kW
+    with engine.begin() as conn:
+        ingest_frame(conn, _samples(['2024-01-15 00:01:10'], 1000.0, 1))
+    months = service.totals('month', datetime(2024, 1, 1), now=now, bind=engine)
+    assert np.isclose(months[0]['energy_kwh'], 31 / 60 + 10 / 3600)
+
+def test_totals_take_timezone_aware_bounds_as_utc():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    service = EnergyService(max_gap=120, read_hours=24)
+    with engine.begin() as conn:
+        ingest_frame(conn, _samples(['2024-01-01 10:00:00', '2024-01-01 10:01:00'], 1000.0))
+
+    # 12:00 at UTC+2 is the 10:00 UTC hour of the samples
+    cest = timezone(timedelta(hours=2))
+    hours = service.totals('hour', datetime(2024, 1, 1, 12, tzinfo=cest), datetime(2024, 1, 1, 13, tzinfo=cest), now=datetime(2024, 1, 2), bind=engine)
+    assert [(row['period_start'], row['sample_count']) for row in hours] == [(datetime(2024, 1, 1, 10), 2)]
+
+def test_caching_and_invalidation_lock_the_same_hours(monkeypatch):
+    from app.services import energy_service as module
+    locked = []
+    monkeypatch.setattr(module, "lock_windows", lambda conn, start, end: locked.append((pd.Timestamp(start), pd.Timestamp(end))))
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    service = EnergyService(max_gap=120, read_hours=24)
+
+    # Only closed periods are locked: the two days before now, down to their last hour
+    service.totals('day', datetime(2024, 1, 1), now=datetime(2024, 1, 3, 12), bind=engine)
+    assert locked[0] == (pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-02 23:00'))
+
+    locked.clear()
+    with engine.begin() as conn:
+        module.invalidate_periods(conn, pd.Series(pd.to_datetime(['2024-01-01 10:59:30'])), max_gap=120)
+    assert locked == [(pd.Timestamp('2024-01-01 10:00'), pd.Timestamp('2024-01-01 11:00'))]
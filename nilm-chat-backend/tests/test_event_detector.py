@@ -0,0 +1,103 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, insert, select
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import Base
+from app.models.electrical_data import ElectricalData
+from app.models.device_event import DeviceEvent
+from app.services.event_detector import EventDetector, detect_events
+
+def _samples():
+    # Cluster 1: off 10 s, on at 100 W for 20 s (one reading in the hysteresis band), off 10 s,
+    # a 1 s blip, then on until the end. Cluster 2 stays off.
+    power = [0.0] * 10 + [100.0] * 9 + [7.0] + [100.0] * 10 + [0.0] * 10 + [50.0] + [0.0] * 5 + [200.0] * 5
+    timestamps = pd.date_range("2024-01-01", periods=len(power), freq="s")
+    frame = pd.DataFrame({"timestamp": timestamps, "cluster": 1, "device_state": "Heater", "real_power_watt": power})
+    idle = frame.assign(cluster=2, device_state="Laptop", real_power_watt=1.0)
+    return pd.concat([frame, idle], ignore_index=True).sort_values("timestamp", kind="stable", ignore_index=True)
+
+def _detect(chunks):
+    closed_all, open_events = [], {}
+    for chunk in chunks:
+        closed, open_events = detect_events(chunk, open_events, on_watts=10, off_watts=5, max_gap=60, min_duration=2)
+        closed_all.extend(closed)
+    return closed_all, open_events
+
+def test_events_are_the_same_whatever_the_chunking():
+    samples = _samples()
+    closed, open_events = _detect([samples])
+
+    assert len(closed) == 1  # The blip is shorter than min_duration
+    heater = closed[0]
+    assert heater.started_at == pd.Timestamp("2024-01-01 00:00:10")
+    assert heater.sample_count == 20
+    assert heater.to_row(is_open=False)["duration_seconds"] == 19
+    # Trapezoids: 17 s at 100 W plus two half-steps down to and up from 7 W
+    assert np.isclose(heater.energy_wh, (17 * 100 + 2 * (100 + 7) / 2) / 3600)
+    assert list(open_events) == [1]
+    assert open_events[1].peak_power_watt == 200
+
+    for size in (1, 7, 23):
+        # Chunks arrive in time order, but rows inside a chunk may be in any order
+        chunks = [samples.iloc[i:i + size].sample(frac=1, random_state=0) for i in range(0, len(samples), size)]
+        chunk_closed, chunk_open = _detect(chunks)
+        assert [(e.started_at, e.ended_at, round(e.energy_wh, 9)) for e in chunk_closed] == \
+            [(e.started_at, e.ended_at, round(e.energy_wh, 9)) for e in closed]
+        assert chunk_open[1].started_at == open_events[1].started_at
+
+def _store(engine, samples):
+    with engine.begin() as conn:
+        conn.execute(insert(ElectricalData), [
+            dict(row, voltage=230.0, current=1.0, real_power=row["real_power_watt"], reactive_power=0.0,
+                 apparent_power=row["real_power_watt"], power_factor=1.0, frequency=50.0, thd=1.0,
+                 timestamp=row["timestamp"].to_pydatetime())
+            for row in samples.to_dict("records")
+        ])
+
+def test_detector_persists_open_events_between_runs():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    detector = EventDetector(on_watts=10, off_watts=5, max_gap=60, min_duration=2, interval=0, batch_size=13)
+    samples = _samples()
+
+    _store(engine, samples)
+    assert detector.run_until_current(engine) == len(samples)
+    assert detector.run_until_current(engine) == 0
+
+    with engine.connect() as conn:
+        events = conn.execute(select(DeviceEvent).order_by(DeviceEvent.started_at)).all()
+    assert [(e.cluster, e.is_open, e.sample_count) for e in events] == [(1, False, 20), (1, True, 5)]
+
+def test_silent_meter_closes_its_event():
+    samples = _samples()
+    # Cluster 2 keeps reporting for two more minutes after cluster 1 goes silent
+    later = pd.DataFrame({
+        "timestamp": pd.date_range(samples["timestamp"].max(), periods=120, freq="s")[1:],
+        "cluster": 2, "device_state": "Laptop", "real_power_watt": 1.0,
+    })
+    closed, open_events = _detect([samples, later])
+    assert open_events == {}
+    assert [(e.cluster, e.sample_count) for e in closed] == [(1, 20), (1, 5)]
+
+def test_late_samples_are_detected_again():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    detector = EventDetector(on_watts=10, off_watts=5, max_gap=60, min_duration=2, interval=0, batch_size=1000)
+    samples = _samples()
+    # The heater's first on period is backfilled after newer samples were processed
+    backfill = (samples["cluster"] == 1) & samples["timestamp"].between("2024-01-01 00:00:10", "2024-01-01 00:00:29")
+
+    _store(engine, samples[~backfill])
+    detector.run_until_current(engine)
+    _store(engine, samples[backfill])
+    assert detector.run_until_current(engine) == 20
+
+    with engine.connect() as conn:
+        events = conn.execute(select(DeviceEvent).order_by(DeviceEvent.started_at)).all()
+    assert [(e.cluster, e.is_open, e.sample_count) for e in events] == [(1, False, 20), (1, True, 5)]
+    assert detector.get_stats()["replays"] == 1
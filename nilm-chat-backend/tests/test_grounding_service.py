@@ -0,0 +1,44 @@
+import sys
+import os
+import asyncio
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.grounding_service import GroundingContextProvider
+
+class _CountingProvider(GroundingContextProvider):
+    def __init__(self, bucket_seconds):
+        super().__init__(bucket_seconds=bucket_seconds, hours=24)
+        self.queries = 0
+
+    async def _load(self):
+        self.queries += 1
+        await asyncio.sleep(0.01)
+        return [{"cluster_id": 1, "name": "Heater", "avg_power": 100.0, "avg_thd": 2.0}]
+
+def test_concurrent_requests_share_one_query_per_bucket():
+    async def run():
+        provider = _CountingProvider(bucket_seconds=3600)
+        results = await asyncio.gather(*(provider.get() for _ in range(20)))
+        assert provider.queries == 1
+        assert all(result == results[0] for result in results)
+
+        await provider.get()
+        assert provider.queries == 1
+
+        provider.invalidate()
+        await provider.get()
+        assert provider.queries == 2
+        assert provider.get_stats()["shared"] == 19
+
+    asyncio.run(run())
+
+def test_zero_bucket_queries_every_time():
+    async def run():
+        provider = _CountingProvider(bucket_seconds=0)
+        await provider.get()
+        await provider.get()
+        assert provider.queries == 2
+
+    asyncio.run(run())
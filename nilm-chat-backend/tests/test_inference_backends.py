@@ -0,0 +1,58 @@
+import sys
+import os
+import pytest
+import torch
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import inference_backends
+from app.services.inference_backends import BackendStats, load_backend
+
+@pytest.fixture
+def tiny_model(monkeypatch):
+    """Replace the Hugging Face loaders with a single 4x4 Linear layer"""
+    loaded = []
+
+    def from_pretrained(model_name):
+        loaded.append(model_name)
+        return torch.nn.Sequential(torch.nn.Linear(4, 4))
+
+    monkeypatch.setattr(inference_backends.AutoTokenizer, "from_pretrained", lambda model_name: "tokenizer")
+    monkeypatch.setattr(inference_backends.AutoModelForSeq2SeqLM, "from_pretrained", from_pretrained)
+    return loaded
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown inference backend"):
+        load_backend("tensorrt", "tiny", torch.device("cpu"))
+
+def test_torch_backends_load_and_measure_the_model(tiny_model):
+    model, tokenizer, stats = load_backend("torch", "tiny", torch.device("cpu"))
+    assert tokenizer == "tokenizer" and tiny_model == ["tiny"]
+    assert not model.training
+    assert stats.backend == "torch"
+    assert stats.model_bytes == (4 * 4 + 4) * 4  # float32 weight and bias
+
+    model, _, stats = load_backend("torch-int8", "tiny", torch.device("cpu"))
+    assert stats.backend == "torch-int8"
+    assert 0 < stats.model_bytes < (4 * 4 + 4) * 4
+    assert model(torch.ones(1, 4)).shape == (1, 4)
+
+    with pytest.raises(ValueError, match="only runs on CPU"):
+        load_backend("torch-int8", "tiny", torch.device("cuda"))
+
+def test_onnx_backend_needs_optional_packages(tiny_model, monkeypatch):
+    monkeypatch.setitem(sys.modules, "onnxruntime", None)
+    with pytest.raises(ImportError, match="optimum"):
+        load_backend("onnx", "tiny", torch.device("cpu"))
+
+def test_backend_stats_track_throughput():
+    stats = BackendStats("torch", load_seconds=1.23456, model_bytes=80, rss_delta_bytes=None)
+    assert stats.to_dict()["tokens_per_second"] == 0.0
+
+    stats.record_generation(tokens=30, seconds=1.5)
+    stats.record_generation(tokens=10, seconds=0.5)
+    summary = stats.to_dict()
+    assert summary["generated_tokens"] == 40
+    assert summary["tokens_per_second"] == 20.0
+    assert summary["load_seconds"] == 1.235
@@ -0,0 +1,48 @@
+import sys
+import os
+import asyncio
+import time
+import pytest
+from fastapi import HTTPException
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.inference_executor import InferenceExecutor
+
+def test_executor_runs_job_off_loop():
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1, timeout=5)
+
+    async def main():
+        return await executor.run(lambda x: x * 2, 21)
+
+    assert asyncio.run(main()) == 42
+    assert executor.get_stats()["pending"] == 0
+    executor.shutdown()
+
+def test_executor_rejects_when_queue_full():
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1, timeout=5)
+
+    async def main():
+        jobs = [asyncio.ensure_future(executor.run(time.sleep, 0.2)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc:
+            await executor.run(time.sleep, 0.2)
+        await asyncio.gather(*jobs)
+        return exc.value
+
+    error = asyncio.run(main())
+    assert error.status_code == 503
+    assert executor.get_stats()["rejected"] == 1
+    executor.shutdown()
+
+def test_executor_times_out():
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1, timeout=0.05)
+
+    async def main():
+        with pytest.raises(HTTPException) as exc:
+            await executor.run(time.sleep, 0.3)
+        return exc.value
+
+    assert asyncio.run(main()).status_code == 504
+    executor.shutdown()
@@ -0,0 +1,58 @@
+import sys
+import os
+import asyncio
+import pytest
+import pandas as pd
+from fastapi import HTTPException
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.ingest_buffer import IngestBuffer
+
+class _FlakyBuffer(IngestBuffer):
+    """Fails the first `failures` writes, then keeps what it is given"""
+
+    def __init__(self, failures, **kwargs):
+        super().__init__(flush_rows=1, flush_interval=0.01, **kwargs)
+        self.failures = failures
+        self.written = []
+
+    def _write(self, df):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.written.append(df)
+        return len(df)
+
+def _frame(seconds):
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime([f'2024-01-01 00:00:{second:02d}' for second in seconds]),
+        'cluster': 1,
+        'real_power_watt': 100.0,
+        'power_factor': 1.0,
+        'thd': 1.0,
+    })
+
+def test_failed_flush_keeps_rows_and_retries():
+    async def run():
+        buffer = _FlakyBuffer(failures=2, max_pending_rows=3)
+        with pytest.raises(HTTPException) as error:
+            await buffer.submit(_frame([0, 1]), wait=True)
+        assert error.value.status_code == 503
+        assert "Retry-After" in error.value.headers
+
+        # The failed rows still count against the limit
+        with pytest.raises(HTTPException):
+            await buffer.submit(_frame([2, 3]))
+
+        for _ in range(100):
+            if buffer.written:
+                break
+            await asyncio.sleep(0.01)
+        assert sum(len(df) for df in buffer.written) == 2
+        stats = buffer.get_stats()
+        assert (stats["failures"], stats["inserted"], stats["buffered_rows"], stats["retry_delay"]) == (2, 2, 0, 0.0)
+        await buffer.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,105 @@
+import sys
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, func, insert, inspect, select
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.database import Base
+from app.models.electrical_data import ElectricalData
+from app.models.rollup import ElectricalDataRollup
+from app.services.ingest_service import prepare_frame, frame_to_records, ingest_frame, ensure_indexes, check_indexes, INSERT_COLUMNS
+from app.services.rollup_service import rebuild_rollups, refresh_rollups
+
+def _capture(rows=3):
+    return pd.DataFrame({
+        'DateTime': pd.date_range('2024-01-01', periods=rows, freq='s'),
+        'Voltage': [230.0] * rows,
+        'Current': [1.0] * rows,
+        'Real Power': [200.0] * rows,
+        'Reactive Power': [10.0] * rows,
+        'Apparent Power': [210.0] * rows,
+        'Power Factor': [1.5] + [0.9] * (rows - 1),
+        'Frequency': [50.0] * rows,
+        'THD': [3.0] * rows,
+        'Real Power (W)': [200.0, np.inf] + [200.0] * (rows - 2),
+        'Cluster': np.array([1] * rows, dtype='int32'),
+        'Device_State': [' Heater '] * rows,
+    })
+
+def test_prepare_frame_maps_and_cleans_columns():
+    df = prepare_frame(_capture())
+
+    assert list(df.columns) == INSERT_COLUMNS
+    assert len(df) == 2  # the infinite reading is dropped
+    assert df['power_factor'].max() <= 1
+    assert set(df['device_state']) == {'Heater'}
+
+def test_frame_to_records_uses_native_types():
+    record = frame_to_records(prepare_frame(_capture()))[0]
+
+    assert type(record['real_power_watt']) is float
+    assert type(record['cluster']) is int
+    assert record['timestamp'].year == 2024
+
+def test_ingest_frame_keeps_rollups_exact():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    df = prepare_frame(_capture(rows=10))
+    rollup_columns = select(
+        ElectricalDataRollup.resolution, ElectricalDataRollup.bucket_start,
+        ElectricalDataRollup.sample_count, ElectricalDataRollup.power_sum, ElectricalDataRollup.pf_max
+    ).order_by(ElectricalDataRollup.resolution, ElectricalDataRollup.bucket_start)
+
+    with engine.begin() as conn:
+        # New rows are merged into their buckets, a re-sent chunk triggers a rebuild
+        assert ingest_frame(conn, df.iloc[:6]) == 6
+        assert ingest_frame(conn, df.iloc[4:]) == 3
+        incremental = conn.execute(rollup_columns).all()
+        rebuild_rollups(conn)
+        assert conn.execute(rollup_columns).all() == incremental
+
+def test_ensure_indexes_removes_duplicates_from_old_databases():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    records = frame_to_records(prepare_frame(_capture(rows=4)))
+    with engine.begin() as conn:
+        # A database from before the unique index, holding a re-imported chunk
+        conn.exec_driver_sql("DROP INDEX ux_timestamp_cluster")
+        conn.exec_driver_sql("CREATE INDEX ix_timestamp ON electrical_data (timestamp)")
+        conn.execute(insert(ElectricalData), records + records[:2])
+        rebuild_rollups(conn)
+
+    # Until migrated, the app only detects the missing index and deduplicates with a query
+    assert check_indexes(engine) == ['ux_timestamp_cluster', 'ix_timestamp']
+    with engine.begin() as conn:
+        assert ingest_frame(conn, prepare_frame(_capture(rows=4))) == 0
+        assert ingest_frame(conn, prepare_frame(_capture(rows=5))) == 1
+
+    ensure_indexes(engine)
+    assert check_indexes(engine) == []
+
+    names = {index['name'] for index in inspect(engine).get_indexes('electrical_data')}
+    assert 'ux_timestamp_cluster' in names and 'ix_timestamp' not in names
+    with engine.begin() as conn:
+        assert conn.execute(select(ElectricalData.id).order_by(ElectricalData.id)).scalars().all() == [1, 2, 3, 6]
+        assert conn.execute(select(func.sum(ElectricalDataRollup.sample_count)).where(ElectricalDataRollup.resolution == 1)).scalar() == 4
+        # Conflict-skipping inserts work once the index exists
+        assert ingest_frame(conn, prepare_frame(_capture(rows=4))) == 0
+
+def test_refresh_rollups_only_touches_given_clusters():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    df = prepare_frame(_capture(rows=4))
+    with engine.begin() as conn:
+        ingest_frame(conn, pd.concat([df, df.assign(cluster=2)]))
+        conn.execute(ElectricalDataRollup.__table__.update().values(sample_count=0))
+
+        refresh_rollups(conn, df['timestamp'].min(), df['timestamp'].max(), clusters=[1])
+        counts = dict(conn.execute(
+            select(ElectricalDataRollup.cluster, func.sum(ElectricalDataRollup.sample_count))
+            .where(ElectricalDataRollup.resolution == 1).group_by(ElectricalDataRollup.cluster)
+        ).all())
+    assert counts == {1: 3, 2: 0}
@@ -0,0 +1,88 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.live_metrics import LiveMetricsState
+
+def _state():
+    state = LiveMetricsState(window_seconds=5, max_samples_per_cluster=100, mode="local", poll_interval=1)
+    state.ready = True
+    return state
+
+def test_summary_averages_latest_window_only():
+    state = _state()
+    start = datetime(2024, 1, 1)
+    state.add_samples([
+        (start, 1, 1000.0, 0.5, 10.0),  # Falls out of the window below
+        (start + timedelta(seconds=10), 1, 100.0, 0.9, 2.0),
+        (start + timedelta(seconds=12), 2, 300.0, 0.7, 4.0),
+    ])
+
+    summary = state.summary()
+    assert summary["total_devices"] == 2
+    assert summary["total_power"] == 200.0
+    assert abs(summary["avg_power_factor"] - 0.8) < 1e-9
+    assert summary["avg_thd"] == 3.0
+    assert summary["timestamp"] == start + timedelta(seconds=12)
+
+def test_ring_buffer_keeps_sums_consistent():
+    state = LiveMetricsState(window_seconds=60, max_samples_per_cluster=2, mode="local", poll_interval=1)
+    state.ready = True
+    start = datetime(2024, 1, 1)
+    state.add_samples((start + timedelta(seconds=i), 1, float(i), 1.0, 1.0) for i in range(5))
+
+    # Only the last two samples (3 W and 4 W) remain
+    assert state.summary()["total_power"] == 3.5
+
+def test_repeated_samples_count_once():
+    state = _state()
+    sample = (datetime(2024, 1, 1), 1, 100.0, 1.0, 1.0)
+    assert state.add_samples([sample, (datetime(2024, 1, 1), 2, 300.0, 1.0, 1.0)]) == 2
+    # A re-sent batch the database skipped as duplicates
+    assert state.add_samples([sample, (datetime(2024, 1, 1, 0, 0, 1), 1, 200.0, 1.0, 1.0)]) == 1
+    assert state.summary()["total_power"] == 200.0
+
+def test_summary_is_none_until_loaded():
+    state = LiveMetricsState(window_seconds=5, max_samples_per_cluster=10, mode="poll", poll_interval=1)
+    assert state.summary() is None
+
+def test_sample_tail_picks_up_ids_committed_late():
+    from sqlalchemy import create_engine, insert, select
+    from app.database import Base
+    from app.models.electrical_data import ElectricalData
+    from app.services.sample_tail import SampleTail
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+
+    def store(*ids):
+        with engine.begin() as conn:
+            conn.execute(insert(ElectricalData), [dict(
+                id=row_id, timestamp=datetime(2024, 1, 1) + timedelta(seconds=row_id), voltage=230.0, current=1.0,
+                real_power=1.0, reactive_power=0.0, apparent_power=1.0, power_factor=1.0, frequency=50.0,
+                thd=1.0, real_power_watt=1.0, cluster=1, device_state="A"
+            ) for row_id in ids])
+
+    def read(tail):
+        with engine.connect() as conn:
+            ids = conn.execute(select(ElectricalData.id).where(tail.condition()).order_by(ElectricalData.id)).scalars().all()
+        tail.advance(ids)
+        return ids
+
+    tail = SampleTail(lookback=100)
+    store(1, 2, 5)  # 3 and 4 are still in flight
+    assert read(tail) == [1, 2, 5]
+    assert str(tail) == "5:3,4"
+
+    store(4, 6)
+    resumed = SampleTail.parse(str(tail), lookback=100)
+    assert read(resumed) == [4, 6]
+    assert read(resumed) == []
+    assert str(resumed) == "6:3"
+
+    # Holes further back than the lookback are given up
+    store(200)
+    assert read(resumed) == [200] and min(resumed.holes) > 100
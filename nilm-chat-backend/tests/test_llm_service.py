@@ -0,0 +1,68 @@
+import sys
+import os
+import asyncio
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.llm_service import BatchScheduler, PromptPrefixCache, LLMService, MAX_INPUT_TOKENS
+
+class FakeTokenizer:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text, add_special_tokens=True):
+        self.calls += 1
+        return type("Encoding", (), {"input_ids": [len(word) for word in text.split()]})
+
+def test_concurrent_prompts_share_a_batch():
+    calls = []
+
+    async def run_batch(prompts):
+        calls.append(list(prompts))
+        return [p.upper() for p in prompts]
+
+    scheduler = BatchScheduler(run_batch, window_ms=10, max_batch_size=4)
+
+    async def main():
+        return await asyncio.gather(*[scheduler.submit(f"q{i}") for i in range(6)])
+
+    results = asyncio.run(main())
+    assert results == [f"Q{i}" for i in range(6)]
+    assert [len(batch) for batch in calls] == [4, 2]
+
+def test_batch_errors_reach_every_caller():
+    async def run_batch(prompts):
+        raise RuntimeError("boom")
+
+    scheduler = BatchScheduler(run_batch, window_ms=1, max_batch_size=4)
+
+    async def main():
+        return await asyncio.gather(
+            *[scheduler.submit("q") for _ in range(2)],
+            return_exceptions=True
+        )
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(main()))
+
+def test_prefix_is_tokenized_once_per_snapshot():
+    cache = PromptPrefixCache()
+    tokenizer = FakeTokenizer()
+
+    cache.get(tokenizer, "devices snapshot one")
+    cache.get(tokenizer, "devices snapshot one")
+    assert tokenizer.calls == 1
+
+    cache.get(tokenizer, "devices snapshot two")
+    assert tokenizer.calls == 2
+    assert cache.get_stats()["hits"] == 1
+
+def test_fit_input_ids_keeps_prefix_and_latest_suffix():
+    service = LLMService()
+    prefix = [1] * 100
+    suffix = list(range(MAX_INPUT_TOKENS))
+
+    ids = service._fit_input_ids(prefix, suffix)
+    assert len(ids) == MAX_INPUT_TOKENS
+    assert ids[:100] == prefix
+    assert ids[-1] == suffix[-1]
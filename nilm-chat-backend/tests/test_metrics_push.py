@@ -0,0 +1,77 @@
+import sys
+import os
+import asyncio
+from datetime import datetime, timedelta
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.live_metrics import LiveMetricsState
+from app.services.metrics_push import MetricsBroadcaster
+
+def _broadcaster(max_pending=100):
+    state = LiveMetricsState(window_seconds=5, max_samples_per_cluster=100, mode="local", poll_interval=1)
+    state.ready = True
+    broadcaster = MetricsBroadcaster(state, interval=1, min_interval=0.5, max_subscribers=2, max_pending=max_pending)
+    return state, broadcaster
+
+def test_fan_out_shares_payloads_and_filters_by_cluster():
+    async def run():
+        state, broadcaster = _broadcaster()
+        everything = broadcaster.subscribe()
+        cluster_2 = broadcaster.subscribe(cluster=2, interval=0.1)
+        broadcaster.stop()
+        # Clamped to the minimum interval
+        assert cluster_2.min_interval == 0.5
+
+        # Initial summary
+        assert (await everything.next_update(1))["summary"]["total_devices"] == 0
+        await cluster_2.next_update(1)
+
+        start = datetime(2024, 1, 1)
+        state.publish([(start, 1, 100.0, 0.9, 2.0), (start + timedelta(seconds=1), 2, 300.0, 0.7, 4.0)])
+        assert broadcaster.tick() == 2
+
+        update = await everything.next_update(1)
+        assert [s["cluster"] for s in update["samples"]] == [1, 2]
+        assert update["summary"]["total_power"] == 200.0
+
+        filtered = await cluster_2.next_update(1)
+        assert [s["cluster"] for s in filtered["samples"]] == [2]
+        # The sample dict is built once and shared
+        assert filtered["samples"][0] is update["samples"][1]
+
+        # Full house
+        try:
+            broadcaster.subscribe()
+            assert False, "expected 503"
+        except Exception as e:
+            assert e.status_code == 503
+
+    asyncio.run(run())
+
+def test_slow_subscriber_gets_coalesced_update():
+    async def run():
+        state, broadcaster = _broadcaster(max_pending=3)
+        subscriber = broadcaster.subscribe()
+        broadcaster.stop()
+        await subscriber.next_update(1)
+
+        start = datetime(2024, 1, 1)
+        for i in range(5):
+            state.publish([(start + timedelta(seconds=i), 1, float(i), 1.0, 1.0)])
+            broadcaster.tick()
+
+        update = await subscriber.next_update(1)
+        assert [s["real_power_watt"] for s in update["samples"]] == [2.0, 3.0, 4.0]
+        assert update["dropped"] == 2
+
+        # Only changed summary fields are sent
+        state.publish([(start + timedelta(seconds=5), 1, 10.0, 1.0, 1.0)])
+        broadcaster.tick()
+        update = await subscriber.next_update(1)
+        assert set(update["summary"]) == {"total_power", "timestamp"}
+
+        assert await subscriber.next_update(0.01) is None
+
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+import sys
+import os
+import time
+import asyncio
+import threading
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.model_manager import ModelManager
+
+class CountingLoader:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            version = self.calls
+        time.sleep(self.delay)
+        return f"model-{version}", "tokenizer", None
+
+def test_concurrent_cold_requests_share_one_load():
+    loader = CountingLoader()
+    manager = ModelManager(loader, refresh_after=0, idle_timeout=0)
+
+    async def main():
+        return await asyncio.gather(*[manager.get() for _ in range(5)])
+
+    results = asyncio.run(main())
+    assert loader.calls == 1
+    assert all(model == "model-1" for model, _ in results)
+
+def test_expired_model_is_swapped_in_background():
+    loader = CountingLoader(delay=0.1)
+    manager = ModelManager(loader, refresh_after=0.01, idle_timeout=0)
+
+    async def main():
+        await manager.get()
+        await asyncio.sleep(0.02)
+        # The stale model is served immediately while the refresh runs
+        started = time.monotonic()
+        model, _ = await manager.get()
+        assert model == "model-1"
+        assert time.monotonic() - started < 0.05
+        await asyncio.sleep(0.2)
+        return manager.model
+
+    assert asyncio.run(main()) == "model-2"
+    assert manager.get_stats()["swaps"] == 1
+
+def test_idle_model_is_unloaded():
+    manager = ModelManager(CountingLoader(delay=0), refresh_after=0, idle_timeout=0.01)
+    asyncio.run(manager.get())
+    time.sleep(0.02)
+    assert manager.unload_if_idle()
+    assert not manager.is_loaded
+    assert manager.get_stats()["unloads"] == 1
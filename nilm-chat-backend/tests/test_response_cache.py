@@ -0,0 +1,33 @@
+import sys
+import os
+import time
+
+# Add the parent directory to the path so we can import the app modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services.response_cache import ResponseCache
+
+def test_key_ignores_case_punctuation_and_current_message():
+    cache = ResponseCache(max_entries=4, ttl_seconds=60, history_turns=2)
+
+    key = cache.make_key("What's my power usage?", [("user", "What's my power usage?")], "v1")
+    assert key == cache.make_key("what s my power usage", [], "v1")
+    assert key != cache.make_key("what s my power usage", [], "v2")
+    assert key != cache.make_key("what s my power usage", [("assistant", "Hello")], "v1")
+
+def test_lru_eviction_ttl_and_invalidate():
+    cache = ResponseCache(max_entries=2, ttl_seconds=0.05, history_turns=0)
+    cache.set("a", {"response": "A"})
+    cache.set("b", {"response": "B"})
+    assert cache.get("a") == {"response": "A"}
+
+    cache.set("c", {"response": "C"})
+    assert cache.get("b") is None
+    assert cache.get_stats()["evictions"] == 1
+
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+    cache.set("d", {"response": "D"})
+    cache.invalidate()
+    assert cache.get("d") is None